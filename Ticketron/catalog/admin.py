@@ -1,8 +1,13 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 
 # Register your models here.
 
-from .models import Client, Status, Ticket, Task
+from .models import Client, Status, Ticket, Task, TicketTransition
+from .scheduling import auto_schedule
+from . import workflow
 
 """Minimal registration of Models.
 admin.site.register(Ticket)
@@ -15,6 +20,34 @@ admin.site.register(Employee)
 admin.site.register(Status)
 
 
+class EstimatedCountPaginator(Paginator):
+    """Paginator using PostgreSQL's planner row estimate for unfiltered lists of large tables.
+
+    An exact COUNT(*) over millions of rows costs a full scan; the estimate
+    from pg_class is free and close enough to size the page links.
+    """
+    ESTIMATE_THRESHOLD = 100000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if connection.vendor == 'postgresql' and query is not None and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s',
+                               [self.object_list.model._meta.db_table])
+                row = cursor.fetchone()
+            if row is not None and row[0] >= self.ESTIMATE_THRESHOLD:
+                return int(row[0])
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """ModelAdmin defaults for tables too big to count or list in full."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
 
 class TicketsInline(admin.TabularInline):
     """Defines format of inline ticket insertion (used in ClientAdmin)"""
@@ -22,7 +55,7 @@ class TicketsInline(admin.TabularInline):
 
 
 @admin.register(Client)
-class ClientAdmin(admin.ModelAdmin):
+class ClientAdmin(LargeTableAdmin):
     """Administration object for Client models.
     Defines:
      - fields to be displayed in list view (list_display)
@@ -33,6 +66,8 @@ class ClientAdmin(admin.ModelAdmin):
     #list_display = ('last_name','first_name', 'client_since')
     list_display = ('company_name', 'email_add', 'first_name', 'last_name', 'phone_number', 'address1',
                     'city', 'state', 'client_since')
+    # Prefix searches, served by the name indexes (see migrations 0002 and 0005).
+    search_fields = ('^company_name', '^last_name')
     #fields = ['first_name', 'last_name', ('client_since')]
     fields = [('company_name', 'email_add', 'first_name', 'last_name', 'phone_number', 'address1', 'city',
                'state', 'client_since')]
@@ -42,23 +77,60 @@ class ClientAdmin(admin.ModelAdmin):
 class TaskInline(admin.TabularInline):
     """Defines format of inline ticket instance insertion (used in TicketAdmin)"""
     model = Task
+    # Search-as-you-type instead of a <select> listing every user.
+    autocomplete_fields = ('employee',)
+
+
+class TicketTransitionInline(admin.TabularInline):
+    """Read-only status history of a ticket (used in TicketAdmin)"""
+    model = TicketTransition
+    fields = ('transitioned_at', 'from_status', 'to_status', 'user')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
 
+    def has_add_permission(self, request, obj=None):
+        return False
 
-class TicketAdmin(admin.ModelAdmin):
+
+class TicketAdmin(LargeTableAdmin):
     """Administration object for Ticket models.
     Defines:
      - fields to be displayed in list view (list_display)
      - adds inline addition of ticket instances in ticket view (inlines)
+     - one "Move selected tickets to ..." action per workflow status (get_actions)
     """
-    list_display = ('ticket_id', 'title', 'client', 'status')
-    inlines = [TaskInline]
+    list_display = ('ticket_id', 'title', 'client', 'display_status')
+    # Status names come from the in-memory status cache, so only the client is joined.
+    list_select_related = ('client',)
+    list_filter = ('status', 'severity')
+    search_fields = ('^title',)
+    autocomplete_fields = ('client',)
+    inlines = [TaskInline, TicketTransitionInline]
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if self.has_change_permission(request):
+            for status in workflow.target_statuses():
+                name = 'transition_to_{0}'.format(status.pk)
+                actions[name] = (self.transition_action(status), name,
+                                 'Move selected tickets to {0}'.format(status.name))
+        return actions
+
+    @staticmethod
+    def transition_action(status):
+        def action(modeladmin, request, queryset):
+            result = workflow.transition(queryset, status, user=request.user)
+            modeladmin.message_user(request, 'Moved {moved} tickets to {status}; {skipped} could not move there '
+                                             '({tasks_done} tasks marked done).'.format(status=status, **result))
+        return action
 
 
 admin.site.register(Ticket, TicketAdmin)
 
 
 @admin.register(Task)
-class Task(admin.ModelAdmin):
+class TaskAdmin(LargeTableAdmin):
     """Administration object for Task models.
     Defines:
      - fields to be displayed in list view (list_display)
@@ -66,7 +138,10 @@ class Task(admin.ModelAdmin):
      - grouping of fields into sections (fieldsets)
     """
     list_display = ('task_checker', 'ticket', 'employee', 'scheduled_day',)
+    list_select_related = ('ticket', 'employee')
     list_filter = ('task_checker', 'scheduled_day')
+    autocomplete_fields = ('ticket', 'employee')
+    actions = ['auto_schedule_tasks']
 
     fieldsets = (
         (None, {
@@ -76,3 +151,8 @@ class Task(admin.ModelAdmin):
             'fields': ('scheduled_day', 'employee')
         }),
     )
+
+    @admin.action(description='Auto-schedule selected unscheduled tasks', permissions=['change'])
+    def auto_schedule_tasks(self, request, queryset):
+        result = auto_schedule(tasks=queryset)
+        self.message_user(request, 'Scheduled {scheduled} tasks; {unscheduled} did not fit.'.format(**result))
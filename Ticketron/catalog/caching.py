@@ -0,0 +1,204 @@
+"""Version stamps and response caching for the ticket and client detail pages.
+
+Every cached ticket and client has a version stamp in the cache: the time of
+its last change, bumped by the save/delete receivers below. Rendered pages and
+template fragments are cached under keys that include the stamp, so a bump
+makes the old entries unreachable instead of having to find and delete them.
+The same stamp gives the pages their ETag and Last-Modified headers.
+
+Bumps happen when the writer's transaction commits: a stamp bumped earlier
+could be read by a request that still sees the old rows, and that request
+would cache the old page under the new stamp.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import Client, Ticket, Task
+
+TICKET = 'ticket'
+CLIENT = 'client'
+# Kinds whose stamps belong to rows: only existing rows get one.
+VERSIONED_MODELS = {TICKET: Ticket, CLIENT: Client}
+
+
+def _version_key(kind, pk):
+    return 'catalog:version:{0}:{1}'.format(kind, pk)
+
+
+def get_version(kind, pk):
+    """Returns the version stamp of an object, starting one if it has none yet.
+
+    Returns None for a ticket or client that does not exist, without stamping it.
+    """
+    key = _version_key(kind, pk)
+    if cache.get(key) is None:
+        model = VERSIONED_MODELS.get(kind)
+        if model is not None and not model.objects.filter(pk=pk).exists():
+            return None
+    return _stamped_version(key)
+
+
+def _stamped_version(key):
+    """The stamp under key, starting one now if there is none."""
+    version = cache.get(key)
+    if version is None:
+        now = time.time()
+        cache.add(key, now, None)
+        # A cache that keeps nothing (e.g. DummyCache) makes every request a fresh version.
+        version = cache.get(key, now)
+    return version
+
+
+def get_versions(kind, pks):
+    """get_version for many objects, as {pk: version}, with one cache lookup for those already stamped."""
+    keys = {pk: _version_key(kind, pk) for pk in pks}
+    found = cache.get_many(list(keys.values()))
+    return {pk: found[key] if key in found else get_version(kind, pk) for pk, key in keys.items()}
+
+
+def _ticket_client_key(pk):
+    return 'catalog:ticket-client:{0}'.format(pk)
+
+
+def get_ticket_page_version(pk):
+    """Returns the version of a ticket page: the later of the ticket's and its client's stamps.
+
+    The page shows the client, so saving a client bumps only the client's stamp
+    instead of every one of its tickets'. The ticket's client id is cached next
+    to its stamp. Returns None for a ticket that does not exist.
+    """
+    key = _ticket_client_key(pk)
+    client_id = cache.get(key)
+    if client_id is None:
+        found = list(Ticket.objects.filter(pk=pk).values_list('client_id', flat=True)[:1])
+        if not found:
+            return None
+        # '' for no client, as None is a cache miss.
+        client_id = found[0] or ''
+        cache.set(key, client_id, None)
+    # A cached client id means the ticket exists (ticket_changed drops it on
+    # delete) and references the client, so neither needs get_version()'s check.
+    versions = [_stamped_version(_version_key(TICKET, pk))]
+    if client_id != '':
+        versions.append(_stamped_version(_version_key(CLIENT, client_id)))
+    return max(versions)
+
+
+def bump_versions(kind, pks):
+    """Marks the given objects as changed when the current transaction commits (now outside one)."""
+    keys = [_version_key(kind, pk) for pk in pks if pk is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time()), None))
+
+
+# Saved values the post_save receivers compare an instance against: the page
+# versions need the parent it is moved away from, the counters (counters.py)
+# the old task state, the rollups and the transition history the old ticket
+# status, and the search index (search.py) the old ticket title.
+PREVIOUS_STATE_FIELDS = {
+    Ticket: ('client_id', 'status_id', 'title'),
+    Task: ('ticket_id', 'employee_id', 'task_checker', 'scheduled_day'),
+}
+
+
+def remember_previous_state(sender, instance, **kwargs):
+    """pre_save receiver stashing the stored values of a Ticket/Task (None for a new row)."""
+    instance._previous = None
+    # A new Ticket already has its UUID, but there is no stored row to read.
+    if not instance._state.adding and instance.pk is not None:
+        instance._previous = (sender.objects.filter(pk=instance.pk)
+                              .values(*PREVIOUS_STATE_FIELDS[sender]).first())
+
+
+def previous_state(instance):
+    """The values stashed by remember_previous_state, or None."""
+    return getattr(instance, '_previous', None)
+
+
+def _previous_parent(instance, field):
+    previous = previous_state(instance)
+    return previous[field] if previous else None
+
+
+def ticket_changed(sender, instance, **kwargs):
+    """Ticket save/delete: its page, and the pages of its old and new client."""
+    bump_versions(TICKET, [instance.pk])
+    bump_versions(CLIENT, {instance.client_id, _previous_parent(instance, 'client_id')})
+    # The ticket may have moved to another client: look it up again.
+    key = _ticket_client_key(instance.pk)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def tasks_changed(ticket_ids):
+    """Bumps the pages of the given tickets and of their clients (task counts); for bulk task writes."""
+    ticket_ids = set(ticket_ids) - {None}
+    bump_versions(TICKET, ticket_ids)
+    bump_versions(CLIENT, set(Ticket.objects.filter(pk__in=ticket_ids).values_list('client_id', flat=True)))
+
+
+def task_changed(sender, instance, **kwargs):
+    """Task save/delete: the pages of its ticket(s) and of their clients."""
+    tasks_changed({instance.ticket_id, _previous_parent(instance, 'ticket_id')})
+
+
+def client_changed(sender, instance, **kwargs):
+    """Client save/delete: its page, and so the pages of its tickets (see get_ticket_page_version)."""
+    bump_versions(CLIENT, [instance.pk])
+
+
+class VersionedCacheMixin:
+    """DetailView mixin caching the rendered page per user under the object's version stamp.
+
+    Responses carry an ETag and Last-Modified derived from the stamp, so a
+    browser revalidating an unchanged page gets a 304 without a database query
+    for the object. ``cache_version`` is added to the context for keying
+    {% cache %} fragments, which are shared between users.
+    """
+    cache_kind = None
+
+    def get_cache_version(self, pk):
+        return get_version(self.cache_kind, pk)
+
+    def get_cache_variant(self, request):
+        # The page shows the logged-in user in the sidebar, so it varies per user.
+        return request.user.pk or 'anon'
+
+    def get(self, request, *args, **kwargs):
+        version = self.get_cache_version(kwargs['pk'])
+        if version is None:
+            # No such object: let the view answer (404) without caching anything.
+            self.cache_version = None
+            return super().get(request, *args, **kwargs)
+        self.cache_version = version
+        variant = self.get_cache_variant(request)
+        etag = quote_etag('{0}-{1}-{2!r}-{3}'.format(self.cache_kind, kwargs['pk'], version, variant))
+        last_modified = int(version)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            page_key = 'catalog:page:{0}:{1}:{2!r}:{3}'.format(self.cache_kind, kwargs['pk'], version, variant)
+            content = cache.get(page_key)
+            if content is not None:
+                response = HttpResponse(content)
+            else:
+                response = super().get(request, *args, **kwargs)
+                response.add_post_render_callback(
+                    lambda rendered: cache.set(page_key, rendered.content, settings.CATALOG_DETAIL_CACHE_TIMEOUT))
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, max_age=0)
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cache_version'] = self.cache_version
+        context['fragment_cache_timeout'] = settings.CATALOG_DETAIL_CACHE_TIMEOUT
+        return context
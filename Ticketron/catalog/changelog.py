@@ -0,0 +1,157 @@
+"""Append-only change log of Ticket, Task, Client and Status writes.
+
+Every create, update and delete appends a ChangeLogEntry in the same
+transaction, numbered by its ``seq`` primary key. Consumers keep the last
+``seq`` they applied and ask only for the entries after it (changes_since,
+/catalog/changes/, ``manage.py changes_since``) instead of re-reading the
+tables.
+
+Entries are written by post_save/post_delete receivers, and by the bulk
+writers (import_tickets, apply_task_changes, auto_schedule), which send no
+signals and call log_changes() themselves. Rows set to NULL by a delete
+(a deleted ticket's tasks, a deleted client's tickets, ...) are logged as
+updates of that column just before the delete.
+
+Sequence numbers are handed out when an entry is inserted, but transactions
+commit in their own order, so a lower number can become visible after a
+higher one. Entries are stamped by the database (changed_at, txid), never by
+the web server's clock, and readers only return entries no open transaction
+can still precede:
+
+* On PostgreSQL each entry records its transaction id. Readers return only
+  entries of transactions older than the oldest one still running
+  (pg_snapshot_xmin), ordered by transaction and then ``seq``, so ``seq`` is
+  not always increasing; resume from the ``seq`` of the last entry applied.
+* SQLite runs one write transaction at a time, so entries commit in ``seq``
+  order anyway.
+* Elsewhere readers stop at the first entry younger than
+  CATALOG_CHANGES_SETTLE_SECONDS by the database clock, which must be
+  longer than any write transaction.
+"""
+
+import datetime
+import itertools
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, models
+from django.db.models import BooleanField, ExpressionWrapper, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Now
+
+from .models import ChangeLogEntry, Client, Status, Task, Ticket
+
+LOGGED_MODELS = (Ticket, Task, Client, Status)
+# Deleting these sets logged foreign keys to NULL (e.g. a user's tasks lose their employee).
+DETACHING_MODELS = (Ticket, Client, Status, User)
+# Entries per INSERT when logging bulk writes, and per fetch when reading.
+CHANGELOG_CHUNK_SIZE = 2000
+
+ACTION_NAMES = {
+    ChangeLogEntry.CREATED: 'create',
+    ChangeLogEntry.UPDATED: 'update',
+    ChangeLogEntry.DELETED: 'delete',
+}
+COLUMNS = ('seq', 'model', 'object_pk', 'action', 'data', 'changed_at')
+
+
+def snapshot(instance, fields=None):
+    """The instance's field values by column name, limited to ``fields`` (names) when given."""
+    counter_fields = getattr(instance, 'counter_fields', ())
+    return {field.attname: field.value_from_object(instance) for field in instance._meta.concrete_fields
+            if field.name not in counter_fields and (fields is None or field.name in fields)}
+
+
+def log_changes(model, action, rows):
+    """Appends entries for writes that send no signals; ``rows`` are (pk, data) pairs."""
+    entries = (ChangeLogEntry(model=model._meta.model_name, object_pk=str(pk), action=action, data=data)
+               for pk, data in rows)
+    while True:
+        batch = list(itertools.islice(entries, CHANGELOG_CHUNK_SIZE))
+        if not batch:
+            return
+        ChangeLogEntry.objects.bulk_create(batch)
+
+
+def object_saved(sender, instance, created, update_fields=None, **kwargs):
+    """post_save: the saved fields (all of them, bar counters, unless update_fields was given)."""
+    action = ChangeLogEntry.CREATED if created else ChangeLogEntry.UPDATED
+    log_changes(sender, action, [(instance.pk, snapshot(instance, update_fields))])
+
+
+def object_deleted(sender, instance, **kwargs):
+    log_changes(sender, ChangeLogEntry.DELETED, [(instance.pk, None)])
+
+
+def dependents_detached(sender, instance, **kwargs):
+    """pre_delete: logs the logged rows whose foreign key the delete is about to set to NULL."""
+    for relation in instance._meta.related_objects:
+        field = relation.field
+        if relation.related_model not in LOGGED_MODELS or field.remote_field.on_delete is not models.SET_NULL:
+            continue
+        pks = (relation.related_model._base_manager.filter(**{field.name: instance.pk})
+               .order_by().values_list('pk', flat=True))
+        log_changes(relation.related_model, ChangeLogEntry.UPDATED,
+                    ((pk, {field.attname: None}) for pk in pks.iterator(chunk_size=CHANGELOG_CHUNK_SIZE)))
+
+
+def _oldest_running_txid():
+    if connection.pg_version >= 130000:
+        return RawSQL('pg_snapshot_xmin(pg_current_snapshot())::text::bigint', [])
+    return RawSQL('txid_snapshot_xmin(txid_current_snapshot())', [])
+
+
+def settle_window():
+    """Whether an entry is CATALOG_CHANGES_SETTLE_SECONDS old by the database clock."""
+    settled_before = Now() - datetime.timedelta(seconds=settings.CATALOG_CHANGES_SETTLE_SECONDS)
+    return ExpressionWrapper(Q(changed_at__lte=settled_before), output_field=BooleanField())
+
+
+def _settled():
+    # See the module docstring for why PostgreSQL and SQLite need no window.
+    if connection.vendor in ('postgresql', 'sqlite'):
+        return Value(True)
+    return settle_window()
+
+
+def _settled_entries(after, reverse=False):
+    """The entries after ``after`` that are safe to return, in the order readers page through them."""
+    if connection.vendor == 'postgresql':
+        # The position of ``after`` in (txid, seq) order.
+        txid = ChangeLogEntry.objects.filter(seq__lte=after).order_by('-seq').values_list('txid', flat=True).first()
+        queryset = ChangeLogEntry.objects.filter(txid__lt=_oldest_running_txid())
+        if txid is not None:
+            queryset = queryset.filter(Q(txid__gt=txid) | Q(txid=txid, seq__gt=after))
+        order = ('txid', 'seq')
+    else:
+        queryset = ChangeLogEntry.objects.filter(seq__gt=after)
+        order = ('seq',)
+    return queryset.annotate(settled=_settled()).order_by(*('-' + field if reverse else field for field in order))
+
+
+def changes_since(after=0, limit=None):
+    """Yields the entries after sequence number ``after`` as dicts.
+
+    Stops before entries that an open transaction could still precede (see the
+    module docstring), so the last ``seq`` yielded is safe to resume from.
+    """
+    queryset = _settled_entries(after).values_list(*COLUMNS, 'settled')
+    if limit is not None:
+        queryset = queryset[:limit]
+    for seq, model, object_pk, action, data, changed_at, settled in queryset.iterator(
+            chunk_size=CHANGELOG_CHUNK_SIZE):
+        if not settled:
+            return
+        yield {'seq': seq, 'model': model, 'pk': object_pk, 'action': ACTION_NAMES[action],
+               'data': data, 'changed_at': changed_at}
+
+
+def latest_seq():
+    """The sequence number of the last entry changes_since() would return (0 if none).
+
+    A new consumer reads it before copying the tables, then applies the
+    changes after it; replaying the few entries already in its copy is harmless.
+    """
+    # Walks the index backwards past the few unsettled entries.
+    seqs = _settled_entries(0, reverse=True).filter(settled=True).values_list('seq', flat=True)
+    return seqs.first() or 0
@@ -0,0 +1,131 @@
+"""Denormalized counters: open tasks per ticket, tickets per client, open tasks per employee.
+
+Ticket.open_task_count, Client.ticket_count and EmployeeWorkload are kept
+current by the Task/Ticket save and delete receivers below, with atomic F()
+updates, so reading them is O(1). Writes that send no signals (bulk_create,
+bulk_update) add their changes to a CounterDeltas themselves.
+
+Overdue counts are not stored: tasks become overdue as days pass without any
+write, so they are counted with Task.objects.overdue() instead.
+
+``manage.py reconcile_counters`` recomputes all counters in bulk.
+"""
+
+import collections
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .caching import previous_state
+from .dbutils import add_grouped
+from .models import Client, EmployeeWorkload, Task, Ticket
+
+
+def task_state(task):
+    """The fields of a Task the counters depend on."""
+    return {'ticket_id': task.ticket_id, 'employee_id': task.employee_id, 'task_checker': task.task_checker}
+
+
+class CounterDeltas:
+    """Collects the counter changes of some task/ticket writes and applies them together."""
+
+    def __init__(self):
+        self.tickets = collections.Counter()
+        self.clients = collections.Counter()
+        self.employees = collections.Counter()
+
+    def add_task(self, state, sign):
+        """Counts (sign=1) or uncounts (sign=-1) a task state; None is a task that does not exist."""
+        if state is None or state['task_checker']:
+            return
+        if state['ticket_id'] is not None:
+            self.tickets[state['ticket_id']] += sign
+        if state['employee_id'] is not None:
+            self.employees[state['employee_id']] += sign
+
+    def add_ticket(self, client_id, sign):
+        if client_id is not None:
+            self.clients[client_id] += sign
+
+    def apply(self):
+        add_grouped(Ticket, 'open_task_count', self.tickets)
+        add_grouped(Client, 'ticket_count', self.clients)
+        for employee_id, delta in self.employees.items():
+            if not delta:
+                continue
+            changes = {'open_tasks': F('open_tasks') + delta}
+            if not EmployeeWorkload.objects.filter(employee_id=employee_id).update(**changes):
+                workload, created = EmployeeWorkload.objects.get_or_create(
+                    employee_id=employee_id, defaults={'open_tasks': delta})
+                if not created:
+                    EmployeeWorkload.objects.filter(employee_id=employee_id).update(**changes)
+
+
+def task_saved(sender, instance, raw=False, **kwargs):
+    """post_save receiver for Task (needs the pre_save state from caching.remember_previous_state)."""
+    if raw:
+        return
+    deltas = CounterDeltas()
+    deltas.add_task(previous_state(instance), -1)
+    deltas.add_task(task_state(instance), 1)
+    deltas.apply()
+
+
+def task_deleted(sender, instance, **kwargs):
+    """post_delete receiver for Task."""
+    deltas = CounterDeltas()
+    deltas.add_task(task_state(instance), -1)
+    deltas.apply()
+
+
+def ticket_saved(sender, instance, raw=False, **kwargs):
+    """post_save receiver for Ticket: moves the ticket between client counts."""
+    if raw:
+        return
+    previous = previous_state(instance)
+    deltas = CounterDeltas()
+    deltas.add_ticket(previous['client_id'] if previous else None, -1)
+    deltas.add_ticket(instance.client_id, 1)
+    deltas.apply()
+
+
+def ticket_deleted(sender, instance, **kwargs):
+    """post_delete receiver for Ticket."""
+    deltas = CounterDeltas()
+    deltas.add_ticket(instance.client_id, -1)
+    deltas.apply()
+
+
+def reconcile():
+    """Recomputes every counter from the task and ticket tables.
+
+    Only rows whose stored value is wrong are written. Returns the number of
+    corrected rows as {'tickets': n, 'clients': n, 'employees': n}.
+    """
+    open_tasks = Coalesce(Subquery(
+        Task.objects.filter(ticket=OuterRef('pk'), task_checker=False).order_by()
+        .values('ticket').annotate(n=Count('pk')).values('n')), 0)
+    tickets = Coalesce(Subquery(
+        Ticket.objects.filter(client=OuterRef('pk')).order_by()
+        .values('client').annotate(n=Count('pk')).values('n')), 0)
+
+    with transaction.atomic():
+        fixed = {
+            'tickets': Ticket.objects.exclude(open_task_count=open_tasks).update(open_task_count=open_tasks),
+            'clients': Client.objects.exclude(ticket_count=tickets).update(ticket_count=tickets),
+        }
+
+        actual = dict(Task.objects.filter(task_checker=False, employee__isnull=False).order_by()
+                      .values('employee').annotate(n=Count('pk')).values_list('employee', 'n'))
+        stale = []
+        for workload in EmployeeWorkload.objects.all():
+            count = actual.pop(workload.employee_id, 0)
+            if workload.open_tasks != count:
+                workload.open_tasks = count
+                stale.append(workload)
+        EmployeeWorkload.objects.bulk_update(stale, ['open_tasks'])
+        EmployeeWorkload.objects.bulk_create(
+            [EmployeeWorkload(employee_id=employee_id, open_tasks=count) for employee_id, count in actual.items()])
+        fixed['employees'] = len(stale) + len(actual)
+    return fixed
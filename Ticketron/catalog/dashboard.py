@@ -0,0 +1,74 @@
+"""Cached record counters for the catalog home page.
+
+The counters are cached for CATALOG_DASHBOARD_CACHE_TIMEOUT seconds and may
+lag single writes by that long; dropping them on every save would make a busy
+site recompute them on nearly every visit. Bulk writes (imports, the daily
+overdue snapshot) call invalidate_dashboard_counts() once they are done.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models
+from django.db.models import Subquery, Sum
+
+from .models import Ticket, Task, Client, OverdueSnapshot
+
+DASHBOARD_CACHE_KEY = 'catalog:dashboard-counts'
+
+
+def _count_sql(queryset):
+    """Returns (sql, params) for a COUNT(*) over the given queryset."""
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    return 'SELECT COUNT(*) FROM ({0}) AS counted'.format(sql), params
+
+
+def _latest_snapshot_day():
+    return OverdueSnapshot.objects.order_by('-day').values('day')[:1]
+
+
+def _latest_snapshot_sql():
+    """Returns (sql, params) for the total of the latest daily overdue snapshot (NULL if none)."""
+    queryset = (OverdueSnapshot.objects.filter(day=Subquery(_latest_snapshot_day())).order_by()
+                .values('day').annotate(total=Sum('overdue_tasks')).values('total'))
+    return queryset.query.sql_with_params()
+
+
+def compute_dashboard_counts():
+    """Computes all home page counters in a single database round-trip."""
+    counters = (
+        ('num_tickets', _count_sql(Ticket.objects.all())),
+        ('num_instances', _count_sql(Task.objects.all())),
+        ('num_tasks_done', _count_sql(Task.objects.filter(task_checker=True))),
+        ('num_authors', _count_sql(Client.objects.all())),
+        # Overdue tasks as of the start of the day (snapshot_overdue), rather than a scan of open tasks.
+        ('num_overdue', _latest_snapshot_sql()),
+        # The day of that snapshot, which is older than today if snapshot_overdue has not run yet.
+        ('overdue_day', _latest_snapshot_day().query.sql_with_params()),
+    )
+    selects = []
+    params = []
+    for name, (sql, query_params) in counters:
+        selects.append('({0})'.format(sql))
+        params.extend(query_params)
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(selects), params)
+        row = cursor.fetchone()
+    counts = dict(zip([name for name, sql in counters], row))
+    # Raw cursors return dates as strings on some databases.
+    counts['overdue_day'] = models.DateField().to_python(counts['overdue_day'])
+    return counts
+
+
+def get_dashboard_counts():
+    """Returns the home page counters, served from the cache when possible."""
+    counts = cache.get(DASHBOARD_CACHE_KEY)
+    if counts is None:
+        counts = compute_dashboard_counts()
+        cache.set(DASHBOARD_CACHE_KEY, counts, settings.CATALOG_DASHBOARD_CACHE_TIMEOUT)
+    return counts
+
+
+def invalidate_dashboard_counts():
+    """Drops the cached counters, after a bulk write changed them."""
+    cache.delete(DASHBOARD_CACHE_KEY)
@@ -0,0 +1,20 @@
+"""Database helpers shared by the catalog modules that batch their writes."""
+
+import collections
+
+from django.db.models import F
+
+# Largest number of primary keys in one "pk IN (...)" update.
+UPDATE_CHUNK_SIZE = 500
+
+
+def add_grouped(model, field, deltas):
+    """Applies {pk: delta} to ``field`` with one UPDATE per distinct delta (per chunk of pks)."""
+    by_delta = collections.defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        for start in range(0, len(pks), UPDATE_CHUNK_SIZE):
+            model.objects.filter(pk__in=pks[start:start + UPDATE_CHUNK_SIZE]).update(
+                **{field: F(field) + delta})
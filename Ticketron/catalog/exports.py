@@ -0,0 +1,91 @@
+"""Row sources for the streaming ticket and task exports.
+
+Rows are read with values_list().iterator(chunk_size=...) so the database
+cursor is consumed in chunks and no model instances are built; the
+response writes each chunk out as soon as it is fetched.
+"""
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef
+
+from .models import Task, Ticket
+
+EXPORT_CHUNK_SIZE = 2000
+
+TICKET_COLUMNS = ('ticket_id', 'title', 'client_id', 'client__company_name', 'status__name',
+                  'severity', 'summary')
+TASK_COLUMNS = ('id', 'ticket_id', 'ticket__title', 'employee__username', 'scheduled_day',
+                'task_checker', 'Work_Summary', 'Completion_Notes')
+
+
+def _day_range(prefix, filters):
+    lookups = {}
+    if filters.get('scheduled_from'):
+        lookups[prefix + 'scheduled_day__gte'] = filters['scheduled_from']
+    if filters.get('scheduled_to'):
+        lookups[prefix + 'scheduled_day__lte'] = filters['scheduled_to']
+    return lookups
+
+
+def ticket_rows(filters):
+    """Returns an iterator of ticket tuples matching the cleaned ExportFilterForm data."""
+    queryset = Ticket.objects.all()
+    if filters.get('client'):
+        queryset = queryset.filter(client_id=filters['client'])
+    if filters.get('status'):
+        queryset = queryset.filter(status__name=filters['status'])
+    if filters.get('severity'):
+        queryset = queryset.filter(severity=filters['severity'])
+    day_range = _day_range('', filters)
+    if day_range:
+        # Tickets with at least one task in the range, without duplicating ticket rows.
+        tasks = Task.objects.filter(ticket=OuterRef('pk'), **day_range)
+        queryset = queryset.annotate(has_task=Exists(tasks)).filter(has_task=True)
+    return (queryset.order_by('pk').values_list(*TICKET_COLUMNS)
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE))
+
+
+def task_rows(filters):
+    """Returns an iterator of task tuples matching the cleaned ExportFilterForm data."""
+    queryset = Task.objects.filter(**_day_range('', filters))
+    if filters.get('client'):
+        queryset = queryset.filter(ticket__client=filters['client'])
+    if filters.get('status'):
+        queryset = queryset.filter(ticket__status__name=filters['status'])
+    if filters.get('severity'):
+        queryset = queryset.filter(ticket__severity=filters['severity'])
+    return (queryset.order_by('pk').values_list(*TASK_COLUMNS)
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE))
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer over a stream."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_json(columns, rows):
+    """Yields a JSON array of objects one element at a time."""
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder)
+        separator = ','
+    yield ']'
+
+
+def stream_ndjson(objects):
+    """Yields one JSON document per line (application/x-ndjson)."""
+    for obj in objects:
+        yield json.dumps(obj, cls=DjangoJSONEncoder) + '\n'
@@ -1,8 +1,21 @@
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
 import datetime  # for checking renewal date range.
+import uuid
 
 from django import forms
+from django.conf import settings
+
+
+def validate_schedule_date(data):
+    """Raises ValidationError unless data is between today and 4 weeks ahead."""
+    # Check date is not in past.
+    if data < datetime.date.today():
+        raise ValidationError(_('Invalid date - assignment in past'))
+    # Check date is in range librarian allowed to change (+4 weeks)
+    if data > datetime.date.today() + datetime.timedelta(weeks=4):
+        raise ValidationError(
+            _('Invalid date - assignment more than 4 weeks ahead'))
 
 
 class RenewTicketForm(forms.Form):
@@ -12,14 +25,134 @@ class RenewTicketForm(forms.Form):
 
     def clean_renewal_date(self):
         data = self.cleaned_data['renewal_date']
-
-        # Check date is not in past.
-        if data < datetime.date.today():
-            raise ValidationError(_('Invalid date - assignment in past'))
-        # Check date is in range librarian allowed to change (+4 weeks)
-        if data > datetime.date.today() + datetime.timedelta(weeks=4):
-            raise ValidationError(
-                _('Invalid date - assignment more than 4 weeks ahead'))
+        validate_schedule_date(data)
 
         # Remember to always return the cleaned data.
         return data
+
+
+class TaskChangeForm(forms.Form):
+    """One row of a bulk reschedule/assign request; scheduled_day follows the RenewTicketForm rule."""
+    id = forms.IntegerField()
+    scheduled_day = forms.DateField(required=False)
+    employee = forms.IntegerField(required=False, help_text="User id of the new assignee.")
+
+    def clean_scheduled_day(self):
+        data = self.cleaned_data['scheduled_day']
+        if data is not None:
+            validate_schedule_date(data)
+        return data
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.errors and cleaned_data['scheduled_day'] is None and cleaned_data['employee'] is None:
+            raise ValidationError(_('Nothing to change - give a scheduled_day or an employee'))
+        return cleaned_data
+
+
+class CalendarRangeForm(forms.Form):
+    """Range of the task calendar endpoint; defaults to the current week."""
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    employee = forms.CharField(required=False, help_text="Comma-separated user ids (default: everyone).")
+
+    def clean_employee(self):
+        data = self.cleaned_data['employee']
+        if not data:
+            return None
+        try:
+            return {int(value) for value in data.split(',')}
+        except ValueError:
+            raise ValidationError(_('Invalid employee - expected comma-separated user ids'))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+        today = datetime.date.today()
+        start = cleaned_data['start'] or today - datetime.timedelta(days=today.weekday())
+        end = cleaned_data['end'] or start + datetime.timedelta(days=6)
+        if start > end:
+            raise ValidationError(_('Invalid range - start is after end'))
+        if (end - start).days >= settings.CATALOG_CALENDAR_MAX_DAYS:
+            raise ValidationError(
+                _('Invalid range - at most %(days)d days'), params={'days': settings.CATALOG_CALENDAR_MAX_DAYS})
+        cleaned_data['start'], cleaned_data['end'] = start, end
+        return cleaned_data
+
+
+from catalog.models import Status, Ticket
+
+
+class ExportFilterForm(forms.Form):
+    """Filters accepted by the ticket and task export endpoints (all optional)."""
+    client = forms.UUIDField(required=False)
+    status = forms.CharField(required=False, help_text="Status name.")
+    severity = forms.ChoiceField(required=False, choices=(('', '---------'),) + Ticket.ticket_severity)
+    scheduled_from = forms.DateField(required=False)
+    scheduled_to = forms.DateField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get('scheduled_from')
+        end = cleaned_data.get('scheduled_to')
+        if start and end and start > end:
+            raise ValidationError(_('Invalid range - scheduled_from is after scheduled_to'))
+        return cleaned_data
+
+
+class ChangeFeedForm(forms.Form):
+    """Query of the change log endpoint: entries after ``since``, at most ``limit`` of them."""
+    since = forms.IntegerField(required=False, min_value=0, help_text="Last sequence number already applied.")
+    limit = forms.IntegerField(required=False, min_value=1, max_value=settings.CATALOG_CHANGES_MAX_LIMIT)
+
+
+class ThroughputReportForm(forms.Form):
+    """Range of the throughput report; defaults to the last twelve weeks."""
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    client = forms.UUIDField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+        end = cleaned_data['end'] or datetime.date.today()
+        start = cleaned_data['start'] or end - datetime.timedelta(weeks=11)
+        if start > end:
+            raise ValidationError(_('Invalid range - start is after end'))
+        if (end - start).days >= settings.CATALOG_REPORT_MAX_WEEKS * 7:
+            raise ValidationError(
+                _('Invalid range - at most %(weeks)d weeks'), params={'weeks': settings.CATALOG_REPORT_MAX_WEEKS})
+        cleaned_data['start'], cleaned_data['end'] = start, end
+        return cleaned_data
+
+
+class TicketTransitionForm(forms.Form):
+    """Body of the bulk ticket transition request: the new status, and a client or a list of ticket ids."""
+    status = forms.CharField(help_text="Name of the status to move the tickets to.")
+    client = forms.UUIDField(required=False, help_text="Move this client's tickets.")
+    tickets = forms.Field(required=False, help_text="List of ticket ids.")
+
+    def clean_status(self):
+        status = Status.objects.get_by_name(self.cleaned_data['status'])
+        if status is None:
+            raise ValidationError(_('Unknown status'))
+        return status
+
+    def clean_tickets(self):
+        data = self.cleaned_data['tickets']
+        if data in self.fields['tickets'].empty_values:
+            return None
+        if not isinstance(data, list):
+            raise ValidationError(_('Invalid tickets - expected a list of ticket ids'))
+        try:
+            return [uuid.UUID(str(value)) for value in data]
+        except ValueError:
+            raise ValidationError(_('Invalid tickets - expected a list of ticket ids'))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.errors and (cleaned_data['client'] is None) == (cleaned_data['tickets'] is None):
+            raise ValidationError(_('Give either a client or a list of tickets'))
+        return cleaned_data
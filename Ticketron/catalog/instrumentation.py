@@ -0,0 +1,252 @@
+"""Per-view request metrics: SQL query count, DB time, template time and view time.
+
+RequestMetricsMiddleware times every request that resolves to a URL name and
+adds it to an in-process registry, keyed by the namespaced view name
+(``tickets``, ``ticket-detail``, ``admin:index``, ...). Template time is
+measured by the TimedDjangoTemplates backend (the TEMPLATES backend in
+settings), so it covers render() and TemplateResponse alike. ``metrics_view``
+serves the registry, plus the
+connection pool gauges, in the Prometheus text format. Requests over
+CATALOG_SLOW_REQUEST_QUERIES queries or CATALOG_SLOW_REQUEST_SECONDS seconds
+are logged to ``catalog.performance`` with their SQL.
+
+The registry lives in the worker process, so scrape every worker.
+"""
+
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.utils.crypto import constant_time_compare
+
+from locallibrary.dbpool import pool_stats
+
+logger = logging.getLogger('catalog.performance')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Statements kept per request for the slow request log.
+MAX_LOGGED_QUERIES = 100
+
+
+class RequestRecord:
+    """Timings of one request; the query recorder is installed on every connection with execute_wrapper()."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.rendering = False
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.db_seconds += duration
+            if len(self.statements) < MAX_LOGGED_QUERIES:
+                self.statements.append((duration, sql))
+
+
+# The RequestRecord of the request being served, for the template backend.
+_current_record = contextvars.ContextVar('catalog_request_record', default=None)
+
+
+class TimedTemplate(Template):
+    """A Django template adding its render time to the current request's record."""
+
+    def render(self, context=None, request=None):
+        record = _current_record.get()
+        if record is None or record.rendering:
+            # Outside a request, or a template rendered while another one is (already timed).
+            return super().render(context, request)
+        record.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record.template_seconds += time.perf_counter() - started
+            record.rendering = False
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, returning TimedTemplates."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class ViewMetrics:
+    """Running totals and a duration histogram for one view."""
+
+    def __init__(self):
+        self.requests = 0
+        self.slow_requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.view_seconds = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, name, record, view_seconds, slow):
+        with self._lock:
+            metrics = self._views.setdefault(name, ViewMetrics())
+            metrics.requests += 1
+            metrics.slow_requests += slow
+            metrics.queries += record.queries
+            metrics.max_queries = max(metrics.max_queries, record.queries)
+            metrics.db_seconds += record.db_seconds
+            metrics.template_seconds += record.template_seconds
+            metrics.view_seconds += view_seconds
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if view_seconds <= bound:
+                    metrics.buckets[index] += 1
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def snapshot(self):
+        """Returns {view_name: ViewMetrics} (copies, safe to read without the lock)."""
+        with self._lock:
+            snapshot = {}
+            for name, metrics in self._views.items():
+                copy = ViewMetrics()
+                copy.__dict__.update(metrics.__dict__, buckets=list(metrics.buckets))
+                snapshot[name] = copy
+            return snapshot
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """Records query count, DB, template and total view time for each resolved request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        record = RequestRecord()
+        token = _current_record.set(record)
+        started = time.perf_counter()
+        try:
+            # Every alias, so queries sent to a replica are counted too.
+            with contextlib.ExitStack() as stack:
+                for alias_connection in connections.all():
+                    stack.enter_context(alias_connection.execute_wrapper(record))
+                response = self.get_response(request)
+        finally:
+            _current_record.reset(token)
+        view_seconds = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.url_name:
+            # view_name includes the namespace, so admin:index and index are kept apart.
+            slow = (record.queries > settings.CATALOG_SLOW_REQUEST_QUERIES
+                    or view_seconds > settings.CATALOG_SLOW_REQUEST_SECONDS)
+            registry.record(match.view_name, record, view_seconds, slow)
+            if slow:
+                self.log_slow_request(request, match.view_name, record, view_seconds)
+        return response
+
+    def log_slow_request(self, request, name, record, view_seconds):
+        statements = '\n'.join('  {0:.1f}ms {1}'.format(duration * 1000, sql)
+                               for duration, sql in record.statements)
+        logger.warning(
+            'Slow request %s %s (%s): %.1fms, %d queries, %.1fms in SQL, %.1fms rendering\n%s',
+            request.method, request.path, name, view_seconds * 1000, record.queries,
+            record.db_seconds * 1000, record.template_seconds * 1000, statements)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics():
+    """Returns the registry and connection pool statistics in the Prometheus text format."""
+    views = sorted(registry.snapshot().items())
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append('# HELP {0} {1}'.format(name, help_text))
+        lines.append('# TYPE {0} {1}'.format(name, kind))
+        lines.extend(samples)
+
+    def per_view(metric, attribute):
+        return ['{0}{{view="{1}"}} {2}'.format(metric, _escape(view), getattr(metrics, attribute))
+                for view, metrics in views]
+
+    family('catalog_requests_total', 'counter', 'Requests served, by view name.',
+           per_view('catalog_requests_total', 'requests'))
+    family('catalog_slow_requests_total', 'counter', 'Requests over the query or time budget.',
+           per_view('catalog_slow_requests_total', 'slow_requests'))
+    family('catalog_request_queries_total', 'counter', 'SQL queries executed.',
+           per_view('catalog_request_queries_total', 'queries'))
+    family('catalog_request_queries_max', 'gauge', 'Most SQL queries executed by one request.',
+           per_view('catalog_request_queries_max', 'max_queries'))
+    family('catalog_request_db_seconds_total', 'counter', 'Time spent executing SQL.',
+           per_view('catalog_request_db_seconds_total', 'db_seconds'))
+    family('catalog_request_template_seconds_total', 'counter', 'Time spent rendering templates.',
+           per_view('catalog_request_template_seconds_total', 'template_seconds'))
+
+    samples = []
+    for view, metrics in views:
+        label = _escape(view)
+        for bound, count in zip(DURATION_BUCKETS, metrics.buckets):
+            samples.append('catalog_request_duration_seconds_bucket{{view="{0}",le="{1}"}} {2}'.format(
+                label, bound, count))
+        samples.append('catalog_request_duration_seconds_bucket{{view="{0}",le="+Inf"}} {1}'.format(
+            label, metrics.requests))
+        samples.append('catalog_request_duration_seconds_sum{{view="{0}"}} {1}'.format(label, metrics.view_seconds))
+        samples.append('catalog_request_duration_seconds_count{{view="{0}"}} {1}'.format(label, metrics.requests))
+    family('catalog_request_duration_seconds', 'histogram', 'Time to produce the response.', samples)
+
+    pools = sorted(pool_stats().items())
+    for stat, kind, help_text in (
+            ('in_use', 'gauge', 'Connections lent out.'),
+            ('idle', 'gauge', 'Connections waiting in the pool.'),
+            ('saturation', 'gauge', 'Share of the pool capacity lent out.'),
+            ('waits', 'counter', 'Checkouts that had to wait for a connection.'),
+            ('wait_seconds_total', 'counter', 'Time spent waiting for a connection.'),
+            ('timeouts', 'counter', 'Checkouts that gave up waiting.'),
+            ('health_check_failures', 'counter', 'Idle connections found broken on checkout.')):
+        if pools:
+            metric = 'db_pool_{0}'.format(stat)
+            family(metric, kind, help_text,
+                   ['{0}{{alias="{1}"}} {2}'.format(metric, _escape(alias), stats[stat]) for alias, stats in pools])
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; open to staff, or to a bearer token when CATALOG_METRICS_TOKEN is set."""
+    token = settings.CATALOG_METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    authorized = request.user.is_staff or (
+        token and constant_time_compare(authorization, 'Bearer {0}'.format(token)))
+    if not authorized:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
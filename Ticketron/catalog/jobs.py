@@ -0,0 +1,188 @@
+"""A small database-backed job queue.
+
+Jobs are rows of the Job table, written in the same transaction as the change
+that causes them, and run by ``manage.py run_jobs``::
+
+    @register('catalog.send_assignment_emails')
+    def send_assignment_emails(payloads):
+        ...
+
+    enqueue('catalog.send_assignment_emails', {'task_ids': [1, 2]})
+
+A handler receives the payloads of a batch of due jobs of its name at once,
+so it can batch the work (e.g. one SMTP session for many emails). When a batch
+fails, its jobs are run again one at a time, so only the jobs that fail on
+their own are retried. A handler that fails after finishing part of the work
+(e.g. emails already sent) raises PartialBatchFailure naming the payloads it
+finished; those are marked done and the rest retried, without running them
+again now. Failed jobs are retried with exponential backoff up to
+``max_attempts`` times; a worker that dies mid-job has its jobs requeued once
+CATALOG_JOBS_LOCK_TIMEOUT has passed. Done jobs are deleted after
+CATALOG_JOBS_KEEP_DONE_DAYS (prune_done).
+"""
+
+import datetime
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger('catalog.jobs')
+
+_handlers = {}
+
+
+class PartialBatchFailure(Exception):
+    """Raised by a handler that finished only the payloads at the indexes in ``done``.
+
+    Raise it ``from`` the error that stopped the handler.
+    """
+
+    def __init__(self, done):
+        self.done = set(done)
+        super().__init__('Finished {0} of the batch\'s payloads.'.format(len(self.done)))
+
+
+def register(name):
+    """Decorator registering ``handler(payloads)`` for jobs called ``name``."""
+    def decorator(handler):
+        _handlers[name] = handler
+        return handler
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=None):
+    """Queues a job; it commits (or rolls back) with the surrounding transaction."""
+    if name not in _handlers:
+        raise ValueError('No job handler registered as "{0}".'.format(name))
+    return Job.objects.create(
+        name=name, payload=payload or {},
+        run_at=timezone.now() + datetime.timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.CATALOG_JOBS_MAX_ATTEMPTS)
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number ``attempts`` (1, 2, ...): doubling, capped, with jitter."""
+    delay = min(settings.CATALOG_JOBS_BACKOFF_SECONDS * 2 ** (attempts - 1), settings.CATALOG_JOBS_BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def default_worker_id():
+    return '{0}:{1}:{2}'.format(socket.gethostname(), os.getpid(), threading.get_ident())
+
+
+def requeue_stale(now=None):
+    """Puts back jobs whose worker has held them longer than CATALOG_JOBS_LOCK_TIMEOUT."""
+    now = now or timezone.now()
+    stale_before = now - datetime.timedelta(seconds=settings.CATALOG_JOBS_LOCK_TIMEOUT)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=stale_before).update(
+        status=Job.QUEUED, locked_by='', locked_at=None)
+
+
+def claim(worker_id, limit):
+    """Marks up to ``limit`` due jobs as running for this worker and returns them, oldest first."""
+    now = timezone.now()
+    with transaction.atomic():
+        due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('pk', flat=True)[:limit])
+        # The status condition makes the claim safe without row locks (SQLite): a job
+        # another worker took in between is simply not updated here.
+        Job.objects.filter(pk__in=ids, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1)
+    return list(Job.objects.filter(pk__in=ids, status=Job.RUNNING, locked_by=worker_id, locked_at=now)
+                .order_by('run_at', 'pk'))
+
+
+def finish(jobs, error=None):
+    """Records the outcome of a batch of jobs run together."""
+    if error is None:
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=Job.DONE, locked_by='', locked_at=None, last_error='')
+        return
+    now = timezone.now()
+    for job in jobs:
+        if job.attempts >= job.max_attempts:
+            changes = {'status': Job.FAILED}
+            logger.error('Job %s failed for good after %d attempts:\n%s', job, job.attempts, error)
+        else:
+            changes = {'status': Job.QUEUED, 'run_at': now + datetime.timedelta(seconds=backoff(job.attempts))}
+        Job.objects.filter(pk=job.pk).update(locked_by='', locked_at=None, last_error=error, **changes)
+
+
+def run_batch(jobs):
+    """Runs a batch of claimed jobs of one name through their handler."""
+    try:
+        handler = _handlers.get(jobs[0].name)
+        if handler is None:
+            raise LookupError('No job handler registered as "{0}".'.format(jobs[0].name))
+        handler([job.payload for job in jobs])
+    except PartialBatchFailure as failure:
+        error = traceback.format_exc()
+        finish([job for index, job in enumerate(jobs) if index in failure.done])
+        finish([job for index, job in enumerate(jobs) if index not in failure.done], error)
+    except Exception:
+        if len(jobs) == 1:
+            finish(jobs, traceback.format_exc())
+        else:
+            # Find the jobs that fail on their own (e.g. a malformed payload) instead of failing them all.
+            for job in jobs:
+                run_batch([job])
+    else:
+        finish(jobs)
+
+
+def prune_done(now=None):
+    """Deletes the jobs done more than CATALOG_JOBS_KEEP_DONE_DAYS ago; returns how many."""
+    now = now or timezone.now()
+    keep_after = now - datetime.timedelta(days=settings.CATALOG_JOBS_KEEP_DONE_DAYS)
+    # run_at is when a job last became due, so done jobs are pruned by it (job_status_run_at_idx).
+    deleted, _ = Job.objects.filter(status=Job.DONE, run_at__lt=keep_after).delete()
+    return deleted
+
+
+def _run_in_thread(jobs):
+    # Worker threads have their own database connections; release them between batches.
+    close_old_connections()
+    try:
+        run_batch(jobs)
+    finally:
+        connection.close()
+
+
+def run_pending(worker_id=None, concurrency=1, batch_size=50, executor=None):
+    """Claims due jobs and runs them, at most ``concurrency`` batches at a time.
+
+    Jobs of the same name are handed to their handler in batches of up to
+    ``batch_size``. Long-running workers pass their own thread pool as
+    ``executor`` so threads (and what they hold open) are reused. Returns the
+    number of jobs run.
+    """
+    worker_id = worker_id or default_worker_id()
+    requeue_stale()
+    jobs = claim(worker_id, concurrency * batch_size)
+    by_name = {}
+    for job in jobs:
+        by_name.setdefault(job.name, []).append(job)
+    batches = [group[start:start + batch_size]
+               for group in by_name.values() for start in range(0, len(group), batch_size)]
+    if concurrency <= 1 or len(batches) <= 1:
+        for batch in batches:
+            run_batch(batch)
+    elif executor is not None:
+        list(executor.map(_run_in_thread, batches))
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(_run_in_thread, batches))
+    return len(jobs)
@@ -0,0 +1,48 @@
+"""Schedules open tasks that have no scheduled_day (see catalog.scheduling.plan_schedule).
+
+Tasks get the earliest day with a free slot within the horizon, high severity
+first; unassigned tasks also get the least loaded employee. Tasks that do not
+fit stay unscheduled and are picked up by the next run::
+
+    python manage.py auto_schedule --days 14 --capacity 6 --employee alice --employee bob
+"""
+
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.scheduling import auto_schedule
+
+
+class Command(BaseCommand):
+    help = 'Assigns a day, and an employee where missing, to every unscheduled open task.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=datetime.date.fromisoformat, default=None,
+                            help='First day to schedule on, as YYYY-MM-DD (default: today).')
+        parser.add_argument('--days', type=int, default=None,
+                            help='Number of days to fill (default CATALOG_SCHEDULE_HORIZON_DAYS).')
+        parser.add_argument('--capacity', type=int, default=None,
+                            help='Tasks per employee per day (default CATALOG_SCHEDULE_DAILY_CAPACITY).')
+        parser.add_argument('--employee', action='append', default=[], metavar='USERNAME',
+                            help='Employee to give unassigned tasks to (repeatable; default: '
+                                 'every active user with a workload).')
+
+    def handle(self, *args, **options):
+        for option in ('days', 'capacity'):
+            if options[option] is not None and options[option] < 1:
+                raise CommandError('--{0} must be positive.'.format(option))
+        employees = None
+        if options['employee']:
+            employees = User.objects.filter(username__in=options['employee'])
+            missing = set(options['employee']) - set(employees.values_list('username', flat=True))
+            if missing:
+                raise CommandError('No such user: {0}.'.format(', '.join(sorted(missing))))
+        try:
+            result = auto_schedule(employees=employees, start=options['start'], horizon=options['days'],
+                                   capacity=options['capacity'])
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            'Scheduled {scheduled} tasks; {unscheduled} did not fit.'.format(**result)))
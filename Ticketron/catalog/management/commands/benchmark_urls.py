@@ -0,0 +1,145 @@
+"""Measures p50/p99 latency and query counts for every URL in catalog/urls.py.
+
+Requests go through the full middleware stack in-process (django.test.Client),
+against whatever data is in the database, typically after seed_benchmark::
+
+    python manage.py seed_benchmark --scale 0.1
+    python manage.py benchmark_urls --output baseline.json
+    ... change the code ...
+    python manage.py benchmark_urls --baseline baseline.json
+
+With ``--baseline`` the command fails if any URL now runs more queries than
+the baseline, or its p99 latency grew by more than ``--tolerance``.
+URL parameters are filled from the first matching row in the database: ticket
+and client ids for the ``<uuid:pk>`` URLs, a task id for ``<int:pk>``, and
+``csv`` for the export format. Pages are fetched as a superuser that exists
+only while the command runs.
+"""
+
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client as TestClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import converters, reverse
+
+from catalog import urls as catalog_urls
+from catalog.models import Client, Task, Ticket
+from .loadtest import percentile
+
+BENCHMARK_USERNAME = 'bench-superuser'
+
+
+def sample_value(url_name, converter):
+    """Returns a value for one URL parameter, or None if the database has no row to use."""
+    if isinstance(converter, converters.UUIDConverter):
+        model = Ticket if 'ticket' in url_name else Client
+        return model.objects.order_by('pk').values_list('pk', flat=True).first()
+    if isinstance(converter, converters.IntConverter):
+        return Task.objects.order_by('pk').values_list('pk', flat=True).first()
+    return 'csv'
+
+
+def catalog_url_paths():
+    """Yields (url name, path or None when no sample row exists) for each catalog URL."""
+    for pattern in catalog_urls.urlpatterns:
+        kwargs = {name: sample_value(pattern.name, converter)
+                  for name, converter in pattern.pattern.converters.items()}
+        if any(value is None for value in kwargs.values()):
+            yield pattern.name, None
+        else:
+            yield pattern.name, reverse(pattern.name, kwargs=kwargs)
+
+
+def measure(client, path, requests):
+    """Returns a result dict for ``requests`` GETs of path, after one warm-up request."""
+    client.get(path)
+    timings = []
+    queries = []
+    statuses = set()
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(path)
+            if response.streaming:
+                for chunk in response.streaming_content:
+                    pass
+            timings.append(time.perf_counter() - started)
+        queries.append(len(captured))
+        statuses.add(response.status_code)
+    timings.sort()
+    return {
+        'path': path,
+        'status': sorted(statuses),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+        'queries': max(queries),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks every catalog URL in-process and optionally compares against a saved baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--requests', type=int, default=20, help='Timed requests per URL.')
+        parser.add_argument('--skip', action='append', default=[], metavar='URL_NAME',
+                            help='URL name to leave out (repeatable), e.g. the full exports.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', help='JSON file from an earlier --output run to compare against.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative p99 increase over the baseline (default 0.25).')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive.')
+        # Left over if an earlier run was killed.
+        User.objects.filter(username=BENCHMARK_USERNAME).delete()
+        user = User.objects.create_superuser(BENCHMARK_USERNAME, email=None, password=None)
+        client = TestClient(SERVER_NAME='127.0.0.1')
+        client.force_login(user)
+        try:
+            results = self.benchmark(client, options)
+        finally:
+            client.logout()
+            user.delete()
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2, sort_keys=True)
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['tolerance'])
+
+    def benchmark(self, client, options):
+        results = {}
+        self.stdout.write('{0:<24} {1:>9} {2:>9} {3:>8}  {4}'.format('url', 'p50 ms', 'p99 ms', 'queries', 'status'))
+        for name, path in catalog_url_paths():
+            if name in options['skip']:
+                continue
+            if path is None:
+                self.stdout.write('{0:<24} skipped: no row to build the URL from'.format(name))
+                continue
+            result = results[name] = measure(client, path, options['requests'])
+            self.stdout.write('{0:<24} {1:>9.2f} {2:>9.2f} {3:>8}  {4}'.format(
+                name, result['p50_ms'], result['p99_ms'], result['queries'],
+                ','.join(str(status) for status in result['status'])))
+        return results
+
+    def compare(self, results, path, tolerance):
+        with open(path) as handle:
+            baseline = json.load(handle)
+        regressions = []
+        for name, result in sorted(results.items()):
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result['queries'] > before['queries']:
+                regressions.append('{0}: {1} queries (baseline {2})'.format(name, result['queries'], before['queries']))
+            if result['p99_ms'] > before['p99_ms'] * (1 + tolerance):
+                regressions.append('{0}: p99 {1:.2f}ms (baseline {2:.2f}ms)'.format(
+                    name, result['p99_ms'], before['p99_ms']))
+        if regressions:
+            raise CommandError('Performance regressions:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against {0}.'.format(path)))
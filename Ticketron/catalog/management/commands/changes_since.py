@@ -0,0 +1,29 @@
+"""Writes the change log after a sequence number as NDJSON (see catalog/changelog.py).
+
+A consumer runs it with the last ``seq`` it applied and saves the ``seq`` of
+the last line for the next run. ``--latest`` prints the sequence number to
+start from after copying the tables.
+"""
+
+from django.core.management.base import BaseCommand
+
+from catalog.changelog import changes_since, latest_seq
+from catalog.exports import stream_ndjson
+
+
+class Command(BaseCommand):
+    help = 'Writes the Ticket, Task, Client and Status changes after a sequence number, one JSON object per line.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('since', nargs='?', type=int, default=0,
+                            help='Last sequence number already applied (default: 0, everything).')
+        parser.add_argument('--limit', type=int, default=None, help='Write at most this many changes.')
+        parser.add_argument('--latest', action='store_true',
+                            help='Only print the last sequence number that is safe to start from.')
+
+    def handle(self, *args, **options):
+        if options['latest']:
+            self.stdout.write(str(latest_seq()))
+            return
+        for line in stream_ndjson(changes_since(options['since'], options['limit'])):
+            self.stdout.write(line, ending='')
@@ -0,0 +1,77 @@
+"""Shows the query plan and timing of the catalog's hot list queries.
+
+Run it before and after the index migration to compare plans, e.g.::
+
+    python manage.py migrate catalog 0001
+    python manage.py explain_hot_queries --seed 20000
+    python manage.py migrate catalog
+    python manage.py explain_hot_queries --seed 20000
+"""
+
+import datetime
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from catalog.models import Client, Task, Ticket
+
+
+def hot_queries(employee):
+    """Returns (label, queryset) pairs shaped like the queries the catalog views run."""
+    return (
+        ('all-borrowed', Task.objects.filter(task_checker=False).order_by('scheduled_day', 'id')[:11]),
+        ('my-borrowed', Task.objects.filter(employee=employee, task_checker=False)
+            .order_by('scheduled_day', 'id')[:11]),
+        ('authors', Client.objects.order_by('last_name', 'first_name', 'company_id')[:11]),
+        ('tickets', Ticket.objects.order_by('title', 'ticket_id')[:11]),
+        ('tickets-by-client-status', Ticket.objects.filter(client=Client.objects.order_by('pk').first(),
+                                                           status=None)),
+    )
+
+
+class Command(BaseCommand):
+    help = "Prints EXPLAIN output and timings for the catalog's hot list queries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed this many tickets (rolled back afterwards) before explaining.')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed executions per query.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['seed'])
+            employee = User.objects.order_by('pk').first()
+            for label, queryset in hot_queries(employee):
+                self.stdout.write(self.style.MIGRATE_HEADING(label))
+                self.stdout.write(queryset.explain())
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    list(queryset.all())
+                elapsed = (time.perf_counter() - started) / options['repeat']
+                self.stdout.write('{0:.3f} ms per execution\n'.format(elapsed * 1000))
+            # Never keep the seeded rows.
+            transaction.set_rollback(True)
+
+    def seed(self, num_tickets):
+        rng = random.Random(0)
+        employees = [User.objects.create(username='explain-{0}'.format(i)) for i in range(10)]
+        clients = Client.objects.bulk_create(
+            [Client(first_name='First {0}'.format(i), last_name='Last {0}'.format(rng.randrange(1000)))
+             for i in range(max(1, num_tickets // 20))])
+        tickets = Ticket.objects.bulk_create(
+            [Ticket(title='Ticket {0}'.format(rng.randrange(num_tickets)), summary=' ',
+                    client=rng.choice(clients), status=None)
+             for _ in range(num_tickets)], batch_size=500)
+        today = datetime.date.today()
+        Task.objects.bulk_create(
+            [Task(ticket=ticket, Work_Summary=' ', employee=rng.choice(employees),
+                  scheduled_day=today + datetime.timedelta(days=rng.randrange(-60, 60)),
+                  task_checker=rng.random() < 0.9)
+             for ticket in tickets for _ in range(2)], batch_size=500)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write('Seeded {0} tickets.\n'.format(num_tickets))
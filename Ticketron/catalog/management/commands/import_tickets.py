@@ -0,0 +1,213 @@
+"""Bulk import of tickets (and optionally one task per ticket) from CSV or JSONL.
+
+Each input row describes a ticket::
+
+    title, summary, client, status, severity, ticket_id,
+    work_summary, scheduled_day, employee, task_checker
+
+Only ``title`` is required. ``client`` is matched on Client.company_name and
+``status`` on Status.name (both are created if missing), ``employee`` on
+User.username. A Task is written for the row when ``work_summary`` is set.
+
+Rows are written with bulk_create, one transaction per batch, which also
+creates the batch's new clients and statuses. After each batch the number of
+rows done is written to a checkpoint file, and ``--resume`` skips those rows
+on the next run. A row that cannot be read or imported stops the command with
+its row number.
+"""
+
+import csv
+import datetime
+import json
+import os
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from catalog import changelog, search, timeline
+from catalog.counters import CounterDeltas, task_state
+from catalog.dashboard import invalidate_dashboard_counts
+from catalog.models import ChangeLogEntry, Client, Status, Task, Ticket
+from catalog.rollups import RollupDeltas, ticket_state
+
+SEVERITIES = {code: code for code, label in Ticket.ticket_severity}
+SEVERITIES.update({label.lower(): code for code, label in Ticket.ticket_severity})
+TRUE_VALUES = ('1', 'true', 'yes', 'y')
+
+
+def read_rows(path, input_format):
+    """Yields one dict per input row without loading the whole file."""
+    with open(path, newline='', encoding='utf-8') as handle:
+        if input_format == 'csv':
+            yield from csv.DictReader(handle)
+            return
+        lines = (line for line in handle if line.strip())
+        for row_number, line in enumerate(lines, 1):
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as error:
+                raise CommandError('Row {0}: invalid JSON ({1})'.format(row_number, error))
+            if not isinstance(row, dict):
+                raise CommandError('Row {0}: expected a JSON object'.format(row_number))
+            yield row
+
+
+class LookupCache:
+    """Resolves names to model instances, querying (or creating) each name only once."""
+
+    def __init__(self, model, field, create=True):
+        self.model = model
+        self.field = field
+        self.create = create
+        self._cache = {}
+
+    def get(self, name):
+        if not name:
+            return None
+        if name not in self._cache:
+            obj = self.model.objects.filter(**{self.field: name}).first()
+            if obj is None:
+                if not self.create:
+                    raise ValueError('unknown {0} "{1}"'.format(self.model._meta.verbose_name, name))
+                obj = self.model.objects.create(**{self.field: name})
+            self._cache[name] = obj
+        return self._cache[name]
+
+
+class Command(BaseCommand):
+    help = 'Streams tickets and tasks from a CSV or JSONL file into the database in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import.')
+        parser.add_argument('--format', choices=('csv', 'jsonl'),
+                            help='Input format (default: from the file extension).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert/transaction.')
+        parser.add_argument('--checkpoint', help='Progress file (default: <path>.checkpoint).')
+        parser.add_argument('--resume', action='store_true',
+                            help='Skip the rows recorded in the checkpoint by an earlier run.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError('No such file: {0}'.format(path))
+        input_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        checkpoint = options['checkpoint'] or path + '.checkpoint'
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        skip = 0
+        if options['resume'] and os.path.exists(checkpoint):
+            with open(checkpoint) as handle:
+                skip = int(handle.read().strip() or 0)
+            self.stdout.write('Resuming after row {0}.'.format(skip))
+
+        self.clients = LookupCache(Client, 'company_name')
+        self.statuses = LookupCache(Status, 'name')
+        self.employees = LookupCache(User, 'username', create=False)
+
+        started = time.perf_counter()
+        done = skip
+        imported = 0
+        batch = []
+        for row_number, row in enumerate(read_rows(path, input_format), 1):
+            if row_number <= skip:
+                continue
+            batch.append((row_number, row))
+            if len(batch) >= batch_size:
+                imported += self.write_batch(batch)
+                done = row_number
+                self.save_checkpoint(checkpoint, done)
+                self.report(imported, started)
+                batch = []
+        if batch:
+            imported += self.write_batch(batch)
+            done = batch[-1][0]
+            self.save_checkpoint(checkpoint, done)
+
+        invalidate_dashboard_counts()
+        self.report(imported, started)
+        self.stdout.write(self.style.SUCCESS('Imported {0} tickets ({1} rows processed).'.format(imported, done)))
+
+    def write_batch(self, batch):
+        """Builds and inserts the tickets and tasks of one batch in a single transaction."""
+        tickets = []
+        tasks = []
+        with transaction.atomic():
+            # Inside the transaction, so a failed batch leaves no clients or statuses behind.
+            for row_number, row in batch:
+                try:
+                    ticket, task = self.build(row)
+                except (AttributeError, KeyError, TypeError, ValueError) as error:
+                    raise CommandError('Row {0}: {1}'.format(row_number, error))
+                tickets.append(ticket)
+                if task is not None:
+                    tasks.append(task)
+            Ticket.objects.bulk_create(tickets)
+            Task.objects.bulk_create(tasks)
+            if tasks and tasks[0].pk is None:
+                # The backend did not return the new ids (SQLite); each new ticket has one task.
+                ids = dict(Task.objects.filter(ticket__in=[task.ticket_id for task in tasks])
+                           .values_list('ticket_id', 'pk'))
+                for task in tasks:
+                    task.pk = ids[task.ticket_id]
+            # bulk_create sends no post_save, so log, index and count the batch here.
+            for model, rows in ((Ticket, tickets), (Task, tasks)):
+                changelog.log_changes(model, ChangeLogEntry.CREATED,
+                                      ((row.pk, changelog.snapshot(row)) for row in rows))
+            search.index_tickets(tickets)
+            search.index_tasks(tasks)
+            deltas = CounterDeltas()
+            for ticket in tickets:
+                deltas.add_ticket(ticket.client_id, 1)
+            for task in tasks:
+                deltas.add_task(task_state(task), 1)
+            deltas.apply()
+            opened = RollupDeltas()
+            today = timezone.localdate()
+            for ticket in tickets:
+                opened.add(today, ticket_state(ticket), created=True)
+            opened.apply()
+            timeline.days_changed({task.scheduled_day for task in tasks})
+        return len(tickets)
+
+    def build(self, row):
+        """Returns an unsaved (Ticket, Task or None) for an input row."""
+        title = (row.get('title') or '').strip()
+        if not title:
+            raise ValueError('title is required')
+        severity = (row.get('severity') or 'm').strip().lower()
+        if severity not in SEVERITIES:
+            raise ValueError('unknown severity "{0}"'.format(row['severity']))
+        ticket = Ticket(
+            ticket_id=uuid.UUID(row['ticket_id']) if row.get('ticket_id') else uuid.uuid4(),
+            title=title,
+            summary=row.get('summary') or '',
+            client=self.clients.get(row.get('client')),
+            status=self.statuses.get(row.get('status')),
+            severity=SEVERITIES[severity],
+        )
+        task = None
+        if row.get('work_summary'):
+            scheduled_day = row.get('scheduled_day')
+            task = Task(
+                ticket=ticket,
+                Work_Summary=row['work_summary'],
+                scheduled_day=datetime.date.fromisoformat(scheduled_day) if scheduled_day else None,
+                employee=self.employees.get(row.get('employee')),
+                task_checker=str(row.get('task_checker', '')).strip().lower() in TRUE_VALUES,
+            )
+        return ticket, task
+
+    def save_checkpoint(self, checkpoint, done):
+        with open(checkpoint, 'w') as handle:
+            handle.write(str(done))
+
+    def report(self, imported, started):
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write('{0} tickets in {1:.1f}s ({2:.0f} rows/sec)'.format(imported, elapsed, rate))
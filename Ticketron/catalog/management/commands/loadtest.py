@@ -0,0 +1,63 @@
+"""Fires concurrent GET requests at a running server and reports throughput and latency.
+
+Used to compare deployments, e.g.::
+
+    gunicorn locallibrary.wsgi -w 4 -b 127.0.0.1:8000
+    python manage.py loadtest http://127.0.0.1:8000/catalog/tickets/ -c 64 -n 2000
+"""
+
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def fetch(url, timeout):
+    """Returns (status, seconds) for one GET."""
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    except (urllib.error.URLError, OSError):
+        status = None
+    return status, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = 'Measures requests/sec and p50/p99 latency of GETs against a running server.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='URLs to request (round-robin).')
+        parser.add_argument('-c', '--concurrency', type=int, default=32, help='Requests in flight.')
+        parser.add_argument('-n', '--requests', type=int, default=1000, help='Total requests.')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds.')
+
+    def handle(self, *args, **options):
+        urls = options['urls']
+        total = options['requests']
+        if total < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive.')
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(lambda i: fetch(urls[i % len(urls)], options['timeout']), range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(seconds for status, seconds in results)
+        failures = sum(1 for status, seconds in results if status is None or status >= 400)
+        self.stdout.write('{0} requests, concurrency {1}, {2:.2f}s'.format(total, options['concurrency'], elapsed))
+        self.stdout.write('{0:.1f} requests/sec, {1} failed'.format(total / elapsed, failures))
+        self.stdout.write('latency p50 {0:.1f} ms, p99 {1:.1f} ms, max {2:.1f} ms'.format(
+            percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000, latencies[-1] * 1000))
@@ -0,0 +1,18 @@
+"""Recomputes the ticket throughput rollups from the change log (see catalog/rollups.py).
+
+Run it once after deploying the rollups, and after any bulk write that
+bypassed them. Writes made while it runs may be counted twice or not at all,
+so run it when tickets are not being edited.
+"""
+
+from django.core.management.base import BaseCommand
+
+from catalog.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily tickets opened/closed rollups from the change log.'
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS('Wrote {0} rollup rows.'.format(rows)))
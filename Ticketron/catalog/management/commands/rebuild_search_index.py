@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index from every Ticket and Task.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Documents written per batch.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            written = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Indexed {0} documents.'.format(written)))
@@ -0,0 +1,17 @@
+"""Recomputes the denormalized task and ticket counters (see catalog/counters.py).
+
+Run it after any bulk write that bypassed the counters.
+"""
+
+from django.core.management.base import BaseCommand
+
+from catalog.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the open task and ticket counters in bulk, fixing any drift.'
+
+    def handle(self, *args, **options):
+        fixed = reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            'Corrected {tickets} ticket, {clients} client and {employees} employee counters.'.format(**fixed)))
@@ -0,0 +1,58 @@
+"""Runs queued background jobs (see catalog/jobs.py) until stopped.
+
+    python manage.py run_jobs --concurrency 4
+
+Several workers can run side by side; each claims its own jobs. Done jobs
+older than CATALOG_JOBS_KEEP_DONE_DAYS are deleted every
+CATALOG_JOBS_PRUNE_INTERVAL seconds.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.jobs import default_worker_id, prune_done, run_pending
+from catalog.notifications import mail_pool
+
+
+class Command(BaseCommand):
+    help = 'Processes the background job queue: notification emails and other deferred work.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.CATALOG_JOBS_CONCURRENCY,
+                            help='Job batches run at the same time.')
+        parser.add_argument('--batch-size', type=int, default=50, help='Jobs of one kind handled together.')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due.')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1 or options['batch_size'] < 1:
+            raise CommandError('--concurrency and --batch-size must be positive.')
+        worker_id = default_worker_id()
+        total = 0
+        pruned_at = None
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                while True:
+                    if pruned_at is None or time.monotonic() - pruned_at > settings.CATALOG_JOBS_PRUNE_INTERVAL:
+                        pruned = prune_done()
+                        pruned_at = time.monotonic()
+                        if pruned:
+                            self.stdout.write('Deleted {0} done jobs.'.format(pruned))
+                    done = run_pending(worker_id, concurrency, options['batch_size'], executor)
+                    total += done
+                    if done:
+                        self.stdout.write('Ran {0} jobs.'.format(done))
+                    elif options['once']:
+                        break
+                    else:
+                        time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            mail_pool.close_all()
+        self.stdout.write(self.style.SUCCESS('Worker {0} ran {1} jobs.'.format(worker_id, total)))
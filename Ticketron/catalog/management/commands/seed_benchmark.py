@@ -0,0 +1,154 @@
+"""Fills the database with a large, reproducible synthetic dataset for benchmarking.
+
+The defaults match the production volumes we plan for::
+
+    python manage.py seed_benchmark                      # 100k clients, 5M tickets, 20M tasks
+    python manage.py seed_benchmark --scale 0.01         # 1k clients, 50k tickets, 200k tasks
+
+The data is skewed the way real traffic is: a few clients own most tickets,
+a few employees carry most tasks, and most tickets are resolved. The same
+``--seed`` always produces the same rows.
+
+Rows are written with bulk_create, one transaction per batch, and never kept
+in memory: ticket and client primary keys are derived from their row number,
+so tasks can point at any ticket without holding millions of ids. Signals do
+not fire: the counters are recomputed at the end, but run
+``manage.py rebuild_search_index`` afterwards if search is part of the benchmark.
+The rows are not written to the change log.
+"""
+
+import datetime
+import itertools
+import random
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from catalog.counters import reconcile
+from catalog.dashboard import invalidate_dashboard_counts
+from catalog.models import Client, Status, Task, Ticket
+
+# Distinct high bits keep benchmark keys apart from each other and from uuid4 keys.
+CLIENT_ID_PREFIX = 0xbe0c << 112
+TICKET_ID_PREFIX = 0xbe07 << 112
+
+STATUS_WEIGHTS = (('New', 10), ('In progress', 15), ('Waiting on client', 5), ('Resolved', 55), ('Closed', 15))
+SEVERITY_WEIGHTS = (('l', 50), ('m', 35), ('h', 15))
+WORDS = ('printer', 'network', 'outage', 'login', 'invoice', 'backup', 'email', 'server', 'laptop',
+         'firewall', 'upgrade', 'license', 'disk', 'slow', 'error', 'install', 'vpn', 'phone', 'database')
+FIRST_NAMES = ('Ada', 'Grace', 'Alan', 'Edsger', 'Barbara', 'Donald', 'Frances', 'Ken', 'Radia', 'Niklaus')
+LAST_NAMES = ('Lovelace', 'Hopper', 'Turing', 'Dijkstra', 'Liskov', 'Knuth', 'Allen', 'Thompson', 'Perlman',
+              'Wirth', 'Ritchie', 'Hamilton', 'Kay', 'Lamport', 'Backus')
+
+
+def client_id(index):
+    return uuid.UUID(int=CLIENT_ID_PREFIX | index)
+
+
+def ticket_id(index):
+    return uuid.UUID(int=TICKET_ID_PREFIX | index)
+
+
+def zipf_weights(count, exponent=1.1):
+    """Cumulative weights giving item i a share proportional to 1 / (i + 1) ** exponent."""
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Generates a large skewed dataset of clients, tickets and tasks with bulk inserts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100000)
+        parser.add_argument('--tickets', type=int, default=5000000)
+        parser.add_argument('--tasks', type=int, default=20000000)
+        parser.add_argument('--employees', type=int, default=200)
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Multiplies the client, ticket and task counts (e.g. 0.01 for a quick run).')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert/transaction.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data.')
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        num_clients = max(1, int(options['clients'] * scale))
+        num_tickets = int(options['tickets'] * scale)
+        num_tasks = int(options['tasks'] * scale)
+        self.batch_size = options['batch_size']
+        if self.batch_size < 1 or options['employees'] < 1:
+            raise CommandError('--batch-size and --employees must be positive.')
+        if Client.objects.filter(pk=client_id(0)).exists():
+            raise CommandError('Benchmark data is already loaded; seed an empty database.')
+
+        rng = random.Random(options['seed'])
+        today = datetime.date.today()
+        self.started = time.perf_counter()
+
+        existing = User.objects.filter(username__startswith='bench-employee-').count()
+        User.objects.bulk_create([User(username='bench-employee-{0}'.format(i), password='!')
+                                  for i in range(existing, options['employees'])])
+        employee_ids = list(User.objects.filter(username__startswith='bench-employee-')
+                            .order_by('pk').values_list('pk', flat=True))
+        rng.shuffle(employee_ids)
+        employee_weights = zipf_weights(len(employee_ids))
+
+        statuses = [Status.objects.get_or_create(name=name)[0].pk for name, weight in STATUS_WEIGHTS]
+        status_weights = list(itertools.accumulate(weight for name, weight in STATUS_WEIGHTS))
+        severities = [code for code, weight in SEVERITY_WEIGHTS]
+        severity_weights = list(itertools.accumulate(weight for code, weight in SEVERITY_WEIGHTS))
+        client_weights = zipf_weights(num_clients, exponent=0.8)
+
+        self.write('clients', Client, num_clients, (
+            Client(company_id=client_id(i), company_name='Company {0}'.format(i),
+                   first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                   email_add='contact{0}@example.com'.format(i),
+                   client_since=today - datetime.timedelta(days=rng.randrange(3650)))
+            for i in range(num_clients)))
+
+        self.write('tickets', Ticket, num_tickets, (
+            Ticket(ticket_id=ticket_id(i),
+                   title=' '.join(rng.sample(WORDS, 3)).capitalize(),
+                   summary=' '.join(rng.choices(WORDS, k=12)),
+                   client_id=client_id(rng.choices(range(num_clients), cum_weights=client_weights)[0]),
+                   status_id=rng.choices(statuses, cum_weights=status_weights)[0],
+                   severity=rng.choices(severities, cum_weights=severity_weights)[0])
+            for i in range(num_tickets)))
+
+        if num_tickets:
+            self.write('tasks', Task, num_tasks, (
+                Task(ticket_id=ticket_id(rng.randrange(num_tickets)),
+                     Work_Summary=' '.join(rng.choices(WORDS, k=6)),
+                     employee_id=rng.choices(employee_ids, cum_weights=employee_weights)[0],
+                     scheduled_day=today + datetime.timedelta(days=rng.randrange(-180, 60)),
+                     task_checker=rng.random() < 0.85)
+                for i in range(num_tasks)))
+
+        self.stdout.write('Computing counters...')
+        reconcile()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        invalidate_dashboard_counts()
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded {0} clients, {1} tickets and {2} tasks for {3} employees in {4:.0f}s.'.format(
+                num_clients, num_tickets, num_tasks if num_tickets else 0, len(employee_ids),
+                time.perf_counter() - self.started)))
+
+    def write(self, label, model, total, objects):
+        written = 0
+        for batch in batched(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            written += len(batch)
+            if written % (self.batch_size * 20) < self.batch_size or written == total:
+                elapsed = time.perf_counter() - self.started
+                self.stdout.write('{0}: {1}/{2} ({3:.0f}s)'.format(label, written, total, elapsed))
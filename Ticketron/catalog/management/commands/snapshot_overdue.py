@@ -0,0 +1,48 @@
+"""Records the number of overdue tasks per employee for the day (see OverdueSnapshot).
+
+Run it daily, just after midnight; the home page shows the latest snapshot
+instead of counting overdue tasks itself. With ``--notify`` it also queues
+the overdue reminder emails.
+"""
+
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from catalog.dashboard import invalidate_dashboard_counts
+from catalog.jobs import enqueue
+from catalog.models import OverdueSnapshot, Task
+from catalog.notifications import OVERDUE_JOB
+
+
+def snapshot_overdue(day):
+    """Replaces the snapshot rows of ``day``; returns the total number of overdue tasks."""
+    counts = (Task.objects.overdue(day).order_by().values('employee')
+              .annotate(overdue_tasks=Count('pk')).values_list('employee', 'overdue_tasks'))
+    with transaction.atomic():
+        OverdueSnapshot.objects.filter(day=day).delete()
+        rows = OverdueSnapshot.objects.bulk_create(
+            [OverdueSnapshot(day=day, employee_id=employee_id, overdue_tasks=overdue_tasks)
+             for employee_id, overdue_tasks in counts])
+    invalidate_dashboard_counts()
+    return sum(row.overdue_tasks for row in rows)
+
+
+class Command(BaseCommand):
+    help = 'Snapshots the number of overdue tasks per employee for today (or --day).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--day', type=datetime.date.fromisoformat, default=None,
+                            help='Day to snapshot as YYYY-MM-DD (default: today).')
+        parser.add_argument('--notify', action='store_true',
+                            help='Also queue the overdue reminder emails (sent by run_jobs).')
+
+    def handle(self, *args, **options):
+        day = options['day'] or datetime.date.today()
+        total = snapshot_overdue(day)
+        self.stdout.write(self.style.SUCCESS('{0}: {1} overdue tasks.'.format(day, total)))
+        if options['notify']:
+            enqueue(OVERDUE_JOB)
+            self.stdout.write('Queued the overdue reminder emails.')
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Client',
+            fields=[
+                ('company_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('company_name', models.CharField(default='Bogus Inc', max_length=100)),
+                ('first_name', models.CharField(default='Jon', max_length=100)),
+                ('last_name', models.CharField(default='Smith', max_length=100)),
+                ('email_add', models.EmailField(default='bogus@test.com', max_length=100)),
+                ('phone_number', models.CharField(default='5555555555', max_length=100)),
+                ('address1', models.CharField(default='123 Bogus Ave', max_length=100)),
+                ('city', models.CharField(default='Midland', max_length=100)),
+                ('state', models.CharField(default='Texas', max_length=100)),
+                ('client_since', models.DateField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['last_name', 'first_name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Status',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Enter a ticket status (e.g. In Progress, Resolved)', max_length=200)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Ticket',
+            fields=[
+                ('title', models.CharField(max_length=200)),
+                ('ticket_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('summary', models.TextField(help_text='Enter a brief description of what needs to be done', max_length=1000)),
+                ('severity', models.CharField(blank=True, choices=[('h', 'High'), ('m', 'Medium'), ('l', 'Low')], default='m', help_text='Ticket Severity', max_length=1)),
+                ('client', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='catalog.Client')),
+                ('status', models.ForeignKey(default='new', help_text='Select a status for this ticket', null=True, on_delete=django.db.models.deletion.SET_NULL, to='catalog.Status')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Work_Summary', models.TextField(max_length=500)),
+                ('Completion_Notes', models.TextField(blank=True, max_length=500)),
+                ('scheduled_day', models.DateField(blank=True, null=True)),
+                ('task_checker', models.BooleanField(default=False, verbose_name='Done Yet?')),
+                ('employee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('ticket', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='catalog.Ticket')),
+            ],
+            options={
+                'ordering': ['scheduled_day'],
+                'permissions': (('can_mark_returned', 'Set ticket as returned'),),
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# The search tables of catalog/search.py as they were when this migration was
+# written, per database vendor. Other vendors have no full-text search.
+CREATE_SEARCH_TABLES = {
+    'postgresql': [
+        'CREATE TABLE IF NOT EXISTS catalog_search (kind varchar(10) NOT NULL, object_id varchar(36) NOT NULL, '
+        'document tsvector NOT NULL, PRIMARY KEY (kind, object_id))',
+        'CREATE INDEX IF NOT EXISTS catalog_search_document_idx ON catalog_search USING GIN (document)',
+    ],
+    'sqlite': [
+        'CREATE TABLE IF NOT EXISTS catalog_search_key (id integer PRIMARY KEY AUTOINCREMENT, '
+        'kind varchar(10) NOT NULL, object_id varchar(36) NOT NULL, UNIQUE (kind, object_id))',
+        "CREATE VIRTUAL TABLE IF NOT EXISTS catalog_search USING fts5(title, body, tokenize='porter')",
+    ],
+}
+DROP_SEARCH_TABLES = {
+    'postgresql': ['DROP TABLE IF EXISTS catalog_search'],
+    'sqlite': ['DROP TABLE IF EXISTS catalog_search', 'DROP TABLE IF EXISTS catalog_search_key'],
+}
+
+
+def create_search_tables(apps, schema_editor):
+    for sql in CREATE_SEARCH_TABLES.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+def drop_search_tables(apps, schema_editor):
+    for sql in DROP_SEARCH_TABLES.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
@@ -0,0 +1,18 @@
+import catalog.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ticket',
+            name='status',
+            field=models.ForeignKey(default=catalog.models.default_status, help_text='Select a status for this ticket', null=True, on_delete=django.db.models.deletion.SET_NULL, to='catalog.Status'),
+        ),
+    ]
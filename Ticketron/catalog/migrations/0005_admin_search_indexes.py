@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+# The admin's prefix searches (^title, ^company_name, ^last_name) run
+# UPPER("column"::text) LIKE UPPER('term%') on PostgreSQL, which only an
+# expression index with text_pattern_ops can serve.
+SEARCH_INDEXES = (
+    ('ticket_title_upper_idx', 'catalog_ticket', 'title'),
+    ('client_company_upper_idx', 'catalog_client', 'company_name'),
+    ('client_last_name_upper_idx', 'catalog_client', 'last_name'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in SEARCH_INDEXES:
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS "{0}" ON "{1}" (UPPER("{2}"::text) text_pattern_ops)'
+                              .format(name, table, column))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in SEARCH_INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS "{0}"'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_status_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['company_name'], name='client_company_name_idx'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Ticket = apps.get_model('catalog', 'Ticket')
+    Client = apps.get_model('catalog', 'Client')
+    Task = apps.get_model('catalog', 'Task')
+    EmployeeWorkload = apps.get_model('catalog', 'EmployeeWorkload')
+    Ticket.objects.update(open_task_count=Coalesce(Subquery(
+        Task.objects.filter(ticket=OuterRef('pk'), task_checker=False).order_by()
+        .values('ticket').annotate(n=Count('pk')).values('n')), 0))
+    Client.objects.update(ticket_count=Coalesce(Subquery(
+        Ticket.objects.filter(client=OuterRef('pk')).order_by()
+        .values('client').annotate(n=Count('pk')).values('n')), 0))
+    EmployeeWorkload.objects.bulk_create(
+        [EmployeeWorkload(employee_id=row['employee'], open_tasks=row['n']) for row in
+         Task.objects.filter(task_checker=False, employee__isnull=False).order_by()
+         .values('employee').annotate(n=Count('pk'))])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0005_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeWorkload',
+            fields=[
+                ('employee', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='workload', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('open_tasks', models.IntegerField(default=0)),
+                ('overdue_tasks', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='ticket_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='open_task_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0006_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('overdue_tasks', models.IntegerField()),
+            ],
+            options={
+                'ordering': ['-day', '-overdue_tasks'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('task_checker', False)), fields=['scheduled_day', 'employee'], name='task_open_day_employee_idx'),
+        ),
+        migrations.AddField(
+            model_name='overduesnapshot',
+            name='employee',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
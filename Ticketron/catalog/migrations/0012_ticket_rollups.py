@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('client_key', models.CharField(blank=True, max_length=36)),
+                ('severity', models.CharField(blank=True, max_length=1)),
+                ('status_key', models.IntegerField(default=0)),
+                ('opened', models.IntegerField(default=0)),
+                ('closed', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['model', 'object_pk', 'seq'], name='changelog_object_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ticketrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'client_key', 'severity', 'status_key'), name='ticket_rollup_key'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:21
+
+import catalog.models
+from django.db import migrations, models
+import django.db.models.functions.datetime
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_ticket_transitions'),
+    ]
+
+    operations = [
+        # Existing entries are all committed, so they get 0 and sort first.
+        migrations.AddField(
+            model_name='changelogentry',
+            name='txid',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='changelogentry',
+            name='txid',
+            field=models.BigIntegerField(default=catalog.models.CurrentTransactionId, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='changelogentry',
+            name='changed_at',
+            field=models.DateTimeField(default=django.db.models.functions.datetime.Now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['txid', 'seq'], name='changelog_txid_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:39
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_change_log_db_clock'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='employeeworkload',
+            name='overdue_tasks',
+        ),
+    ]
@@ -1,11 +1,85 @@
+import time
 import uuid
-from django.db import models
+from types import MappingProxyType
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models.functions import Now
 
 # Create your models here.
 
 from django.urls import reverse  # To generate URLS by reversing URL patterns
 
 
+class StatusManager(models.Manager):
+    """Manager serving the small Status reference table from process memory.
+
+    The whole table is read once into a local cache. Changes bump a generation
+    number in the shared Django cache (see clear_cache), which every process
+    checks at most once per STATUS_CACHE_CHECK_INTERVAL seconds before reusing
+    its local copy.
+
+    The copy is one immutable (by_pk, by_name) snapshot, replaced as a whole,
+    so threads reading it while another reloads or clears it never see it
+    half-built.
+    """
+    GENERATION_KEY = 'catalog:status-generation'
+    STATUS_CACHE_CHECK_INTERVAL = 5
+
+    _snapshot = None
+    _generation = None
+    _checked_at = 0
+
+    def _load(self):
+        """Returns the current (by_pk, by_name) snapshot, reloading it if it is stale."""
+        from django.core.cache import cache
+        now = time.monotonic()
+        cls = type(self)
+        snapshot = cls._snapshot
+        if snapshot is not None and now - cls._checked_at < self.STATUS_CACHE_CHECK_INTERVAL:
+            return snapshot
+        generation = cache.get(self.GENERATION_KEY, 0)
+        if snapshot is None or generation != cls._generation:
+            statuses = list(self.get_queryset().order_by('pk'))
+            by_name = {}
+            for status in statuses:
+                by_name.setdefault(status.name.lower(), status)
+            snapshot = (MappingProxyType({status.pk: status for status in statuses}), MappingProxyType(by_name))
+            cls._snapshot = snapshot
+            cls._generation = generation
+        cls._checked_at = now
+        return snapshot
+
+    def get_cached(self, pk):
+        """Returns the Status with this pk (or None) without a query once the cache is warm."""
+        if pk is None:
+            return None
+        by_pk, by_name = self._load()
+        return by_pk.get(pk)
+
+    def get_by_name(self, name):
+        """Returns the Status with this name, case-insensitively (or None)."""
+        by_pk, by_name = self._load()
+        return by_name.get(name.lower())
+
+    def all_cached(self):
+        by_pk, by_name = self._load()
+        return list(by_pk.values())
+
+    def clear_cache(self, **kwargs):
+        """Drops this process's copy and tells other processes to reload."""
+        from django.core.cache import cache
+        type(self)._snapshot = None
+        try:
+            cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            cache.set(self.GENERATION_KEY, 1, None)
+
+    def status_changed(self, **kwargs):
+        """Signal receiver running clear_cache once the write commits, so no process reloads the old rows."""
+        transaction.on_commit(self.clear_cache)
+
+
 class Status(models.Model):
     """Model representing a ticket status (e.g. In Progress, Resolved)."""
     name = models.CharField(
@@ -13,11 +87,22 @@ class Status(models.Model):
         help_text="Enter a ticket status (e.g. In Progress, Resolved)"
         )
 
+    objects = StatusManager()
+
     def __str__(self):
         """String for representing the Model object (in Admin site etc.)"""
         return self.name
 
 
+DEFAULT_STATUS_NAME = 'New'
+
+
+def default_status():
+    """Default for Ticket.status: the pk of the status named 'New', if there is one."""
+    status = Status.objects.get_by_name(DEFAULT_STATUS_NAME)
+    return status.pk if status is not None else None
+
+
 #NO LONGER NEEDED.
 #class Employee(models.Model):
  #   """Model representing a Employee (e.g. Tom, Vladan etc.)"""
@@ -29,7 +114,23 @@ class Status(models.Model):
    #     return self.name
 
 
-class Ticket(models.Model):
+class CounterFieldsMixin:
+    """Model mixin keeping save() from writing the denormalized counter columns.
+
+    Counters only change through F() updates (see counters.py); a plain save()
+    of an instance loaded earlier would write its stale values back. The
+    columns are left out of the UPDATE only, so a save() whose row is gone
+    still inserts it, and an explicit update_fields is honoured as given.
+    """
+    counter_fields = ()
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if update_fields is None:
+            values = [value for value in values if value[0].name not in self.counter_fields]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+
+class Ticket(CounterFieldsMixin, models.Model):
     """Model representing a ticket (but not a specific copy of a ticket)."""
     title = models.CharField(max_length=200)
     client = models.ForeignKey('Client', on_delete=models.SET_NULL, null=True)
@@ -37,7 +138,7 @@ class Ticket(models.Model):
     # Foreign Key used because ticket can only have one client, but authors can have multiple tickets
     # Client as a string rather than object because it hasn't been declared yet in file.
     summary = models.TextField(max_length=1000, help_text="Enter a brief description of what needs to be done")
-    status = models.ForeignKey('Status', default='new', on_delete=models.SET_NULL, null=True, help_text="Select a status for this ticket")
+    status = models.ForeignKey('Status', default=default_status, on_delete=models.SET_NULL, null=True, help_text="Select a status for this ticket")
     # ManyToManyField used because a status can contain many tickets and a Ticket can cover many status.
     # Status class has already been defined so we can specify the object above.
 
@@ -55,13 +156,43 @@ class Ticket(models.Model):
         default='m',
         help_text='Ticket Severity')
 
+    # Tasks of this ticket not done yet (maintained by catalog.counters).
+    open_task_count = models.IntegerField(default=0, editable=False)
+    counter_fields = ('open_task_count',)
+
+    def get_status(self):
+        """Returns the Status from the in-memory status cache instead of querying it."""
+        return Status.objects.get_cached(self.status_id)
 
     def display_status(self):
         """Creates a string for the Status. This is required to display status in Admin."""
-        return ', '.join([status.name for status in self.status.all()[:3]])
+        status = self.get_status()
+        return status.name if status is not None else ''
 
     display_status.short_description = 'Status'
 
+    def clean(self):
+        """Rejects a status change CATALOG_TICKET_WORKFLOW does not allow (forms and the admin call this)."""
+        from django.core.exceptions import ValidationError
+        from .workflow import allowed_sources
+        if self._state.adding or self.status_id is None:
+            return
+        stored = Ticket.objects.filter(pk=self.pk).values_list('status_id', flat=True).first()
+        if stored == self.status_id:
+            return
+        if stored not in allowed_sources(self.get_status()):
+            previous = Status.objects.get_cached(stored)
+            raise ValidationError({'status': 'A ticket cannot move from {0} to {1}.'.format(
+                previous.name if previous is not None else 'no status', self.display_status())})
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order of TicketListView.
+            models.Index(fields=['title', 'ticket_id'], name='ticket_title_idx'),
+            models.Index(fields=['client', 'status'], name='ticket_client_status_idx'),
+            models.Index(fields=['status', 'severity'], name='ticket_status_severity_idx'),
+        ]
+
     def get_absolute_url(self):
         """Returns the url to access a particular ticket instance."""
         return reverse('ticket-detail', args=[str(self.ticket_id)])
@@ -77,6 +208,19 @@ from datetime import date
 from django.contrib.auth.models import User  # Required to assign User as a employee
 
 
+class TaskQuerySet(models.QuerySet):
+    """Overdue = not done and scheduled before today, evaluated in SQL rather than per row."""
+
+    def overdue(self, today=None):
+        """Open tasks whose scheduled_day has passed."""
+        return self.filter(task_checker=False, scheduled_day__lt=today or date.today())
+
+    def with_overdue(self, today=None):
+        """Annotates ``overdue`` (read by Task.is_overdue) on every row."""
+        condition = models.Q(task_checker=False, scheduled_day__lt=today or date.today())
+        return self.annotate(overdue=models.ExpressionWrapper(condition, output_field=models.BooleanField()))
+
+
 class Task(models.Model):
     """Model representing a specific copy of a ticket (i.e. that can be borrowed from the library)."""
     ticket = models.ForeignKey('Ticket', on_delete=models.SET_NULL, null=True)
@@ -87,9 +231,13 @@ class Task(models.Model):
     employee = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     task_checker = models.BooleanField('Done Yet?', default=False)
 
+    objects = TaskQuerySet.as_manager()
 
     @property
     def is_overdue(self):
+        # Lists annotate this in SQL with TaskQuerySet.with_overdue().
+        if 'overdue' in self.__dict__:
+            return bool(self.overdue)
         if self.scheduled_day and date.today() > self.scheduled_day:
             return True
         return False
@@ -99,13 +247,29 @@ class Task(models.Model):
     class Meta:
         ordering = ['scheduled_day']
         permissions = (("can_mark_returned", "Set ticket as returned"),)
+        indexes = [
+            # Open/done tasks of one employee in schedule order (my-borrowed).
+            models.Index(fields=['employee', 'task_checker', 'scheduled_day', 'id'], name='task_employee_sched_idx'),
+            # Open/done tasks of everyone in schedule order (all-borrowed).
+            models.Index(fields=['task_checker', 'scheduled_day', 'id'], name='task_checker_sched_idx'),
+            # The same two orders over open tasks only, which is all the task lists ever read.
+            models.Index(fields=['scheduled_day', 'id'], name='task_open_sched_idx',
+                         condition=models.Q(task_checker=False)),
+            models.Index(fields=['employee', 'scheduled_day', 'id'], name='task_open_employee_sched_idx',
+                         condition=models.Q(task_checker=False)),
+            # Overdue tasks grouped by employee (TaskQuerySet.overdue); open tasks only.
+            models.Index(fields=['scheduled_day', 'employee'], name='task_open_day_employee_idx',
+                         condition=models.Q(task_checker=False)),
+            # Every task of a date range, done or not (the calendar, catalog/timeline.py).
+            models.Index(fields=['scheduled_day', 'employee', 'id'], name='task_day_employee_idx'),
+        ]
 
     def __str__(self):
         """String for representing the Model object."""
         return '{0} ({1})'.format(self.id, self.ticket.title)
 
 
-class Client(models.Model):
+class Client(CounterFieldsMixin, models.Model):
     """Model representing an client."""
     company_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     company_name = models.CharField(max_length=100, default='Bogus Inc')
@@ -118,15 +282,184 @@ class Client(models.Model):
     city = models.CharField(max_length=100, default='Midland')
     state = models.CharField(max_length=100, default='Texas')
     client_since = models.DateField(null=True, blank=True)
-
+    # Tickets of this client (maintained by catalog.counters).
+    ticket_count = models.IntegerField(default=0, editable=False)
+    counter_fields = ('ticket_count',)
 
     class Meta:
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['last_name', 'first_name', 'company_id'], name='client_name_idx'),
+            models.Index(fields=['company_name'], name='client_company_name_idx'),
+        ]
 
     def get_absolute_url(self):
         """Returns the url to access a particular client instance."""
-        return reverse('client-detail', args=[str(self.id)])
+        return reverse('client-detail', args=[str(self.pk)])
 
     def __str__(self):
         """String for representing the Model object."""
         return '{0}, {1}'.format(self.company_name, self.client_since)
+
+
+class EmployeeWorkload(models.Model):
+    """Open task count of one employee (maintained by catalog.counters)."""
+    employee = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='workload')
+    open_tasks = models.IntegerField(default=0)
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return '{0}: {1} open'.format(self.employee, self.open_tasks)
+
+
+class OverdueSnapshot(models.Model):
+    """Number of overdue tasks of one employee (None: unassigned) at the start of a day."""
+    day = models.DateField(db_index=True)
+    employee = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    overdue_tasks = models.IntegerField()
+
+    class Meta:
+        ordering = ['-day', '-overdue_tasks']
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return '{0} {1}: {2}'.format(self.day, self.employee or 'unassigned', self.overdue_tasks)
+
+
+class Job(models.Model):
+    """A unit of background work run by ``manage.py run_jobs`` (see catalog/jobs.py)."""
+    QUEUED = 'q'
+    RUNNING = 'r'
+    DONE = 'd'
+    FAILED = 'f'
+    job_status = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=100, help_text='Registered handler name.')
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=1, choices=job_status, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField(help_text='Not run before this time (pushed back after each failure).')
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # The worker's "next due jobs" query.
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return '{0} #{1} ({2})'.format(self.name, self.pk, self.get_status_display())
+
+
+class VisitCount(models.Model):
+    """Number of visits to a page, or to a page by one user (see catalog/visits.py)."""
+    name = models.CharField(max_length=64, primary_key=True)
+    visits = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return '{0}: {1}'.format(self.name, self.visits)
+
+
+class CurrentTransactionId(models.Func):
+    """The id of the writing transaction on PostgreSQL (as txid_current() numbers it), 0 elsewhere."""
+    template = '0'
+    output_field = models.BigIntegerField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        if connection.pg_version >= 130000:
+            template = 'pg_current_xact_id()::text::bigint'
+        else:
+            template = 'txid_current()'
+        return self.as_sql(compiler, connection, template=template, **extra_context)
+
+
+class ChangeLogEntry(models.Model):
+    """One create, update or delete of a Ticket, Task, Client or Status (see catalog/changelog.py)."""
+    CREATED = 'c'
+    UPDATED = 'u'
+    DELETED = 'd'
+    change_action = (
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    )
+
+    # The sequence number consumers resume from.
+    seq = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=20, help_text='ticket, task, client or status.')
+    object_pk = models.CharField(max_length=36)
+    action = models.CharField(max_length=1, choices=change_action)
+    # Field values by column name: every field on save, only the written ones for bulk
+    # updates, nothing for deletes. Counter fields are left out.
+    data = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    # Both stamped by the database when the row is inserted: the time by its clock, not the
+    # web server's, and the transaction so that readers can wait for it (see changelog.py).
+    changed_at = models.DateTimeField(default=Now, editable=False)
+    txid = models.BigIntegerField(default=CurrentTransactionId, editable=False)
+
+    class Meta:
+        ordering = ['seq']
+        verbose_name_plural = 'change log entries'
+        indexes = [
+            # The history of one object, in order (rollups.rebuild reads it ticket by ticket).
+            models.Index(fields=['model', 'object_pk', 'seq'], name='changelog_object_idx'),
+            # The order PostgreSQL readers page through (changelog.changes_since).
+            models.Index(fields=['txid', 'seq'], name='changelog_txid_idx'),
+        ]
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return '#{0} {1} {2} {3}'.format(self.seq, self.get_action_display().lower(), self.model, self.object_pk)
+
+
+class TicketRollup(models.Model):
+    """Tickets opened and closed on one day, per client, severity and status (see catalog/rollups.py)."""
+    day = models.DateField()
+    # Plain values rather than foreign keys, so rows outlive deleted clients and statuses;
+    # '' (no client) and 0 (no status) take part in the unique constraint where NULL would not.
+    client_key = models.CharField(max_length=36, blank=True)
+    severity = models.CharField(max_length=1, blank=True)
+    status_key = models.IntegerField(default=0)
+    opened = models.IntegerField(default=0)
+    # Tickets that entered a CATALOG_CLOSED_STATUSES status (``status_key``) that day.
+    closed = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'client_key', 'severity', 'status_key'],
+                                    name='ticket_rollup_key'),
+        ]
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return '{0} {1}/{2}/{3}: {4} opened, {5} closed'.format(
+            self.day, self.client_key or '-', self.severity or '-', self.status_key, self.opened, self.closed)
+
+
+class TicketTransition(models.Model):
+    """A ticket's move from one status to another (see catalog/workflow.py)."""
+    ticket = models.ForeignKey('Ticket', on_delete=models.CASCADE, related_name='transitions')
+    from_status = models.ForeignKey('Status', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    to_status = models.ForeignKey('Status', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Who made a bulk transition (None for single-ticket saves, which do not know).
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    transitioned_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-transitioned_at', '-id']
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return '{0}: {1} -> {2}'.format(self.ticket_id, Status.objects.get_cached(self.from_status_id) or '-',
+                                        Status.objects.get_cached(self.to_status_id) or '-')
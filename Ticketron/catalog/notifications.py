@@ -0,0 +1,144 @@
+"""Task assignment and overdue emails, sent in batches by the job worker.
+
+Requests only queue a job (see jobs.py); the worker groups the tasks per
+employee, renders one email each and sends them CATALOG_EMAIL_BATCH_SIZE at a
+time over SMTP connections kept open in a small pool, instead of one
+connection per message. If sending stops part way, the jobs whose emails all
+went out are reported done (jobs.PartialBatchFailure), so their retries do
+not send them again.
+"""
+
+import itertools
+import smtplib
+import threading
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+
+from .caching import previous_state
+from .jobs import PartialBatchFailure, enqueue, register
+from .models import Task
+
+ASSIGNMENT_JOB = 'catalog.send_assignment_emails'
+OVERDUE_JOB = 'catalog.send_overdue_emails'
+
+
+class MailConnectionPool:
+    """Open mail backend connections shared by the worker's threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        mail_connection = get_connection()
+        mail_connection.open()
+        return mail_connection
+
+    def release(self, mail_connection):
+        with self._lock:
+            self._idle.append(mail_connection)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for mail_connection in idle:
+            mail_connection.close()
+
+
+mail_pool = MailConnectionPool()
+
+
+class MailBatchError(Exception):
+    """Sending stopped after the first ``sent`` messages (the cause is chained)."""
+
+    def __init__(self, sent):
+        super().__init__('Sent {0} messages before failing.'.format(sent))
+        self.sent = sent
+
+
+def send_batch(messages):
+    """Sends the messages in chunks over a pooled connection.
+
+    Raises MailBatchError if a chunk fails; the chunks before it were sent.
+    """
+    if not messages:
+        return
+    mail_connection = mail_pool.acquire()
+    sent = 0
+    try:
+        for start in range(0, len(messages), settings.CATALOG_EMAIL_BATCH_SIZE):
+            chunk = messages[start:start + settings.CATALOG_EMAIL_BATCH_SIZE]
+            try:
+                mail_connection.send_messages(chunk)
+            except smtplib.SMTPServerDisconnected:
+                # The server closed the idle connection; reconnect once and resend.
+                mail_connection.close()
+                mail_connection.open()
+                mail_connection.send_messages(chunk)
+            sent += len(chunk)
+    except Exception as error:
+        mail_connection.close()
+        raise MailBatchError(sent) from error
+    mail_pool.release(mail_connection)
+
+
+def _messages(tasks, subject, template_name):
+    """One (email, task ids) per employee listing their tasks; tasks must be ordered by employee."""
+    messages = []
+    for employee_id, employee_tasks in itertools.groupby(tasks, key=lambda task: task.employee_id):
+        employee_tasks = list(employee_tasks)
+        employee = employee_tasks[0].employee
+        body = render_to_string(template_name, {'employee': employee, 'tasks': employee_tasks})
+        messages.append((EmailMessage(subject, body, to=[employee.email]), {task.pk for task in employee_tasks}))
+    return messages
+
+
+def _emailable(tasks):
+    return (tasks.filter(employee__isnull=False).exclude(employee__email='')
+            .select_related('ticket', 'employee').order_by('employee', 'scheduled_day', 'pk'))
+
+
+@register(ASSIGNMENT_JOB)
+def send_assignment_emails(payloads):
+    """Job handler: one email per employee for all tasks assigned in the batch of jobs."""
+    task_ids = {task_id for payload in payloads for task_id in payload['task_ids']}
+    messages = _messages(_emailable(Task.objects.filter(pk__in=task_ids)),
+                         'Tasks assigned to you', 'catalog/email/tasks_assigned.txt')
+    try:
+        send_batch([message for message, message_task_ids in messages])
+    except MailBatchError as error:
+        unsent = set().union(*(message_task_ids for message, message_task_ids in messages[error.sent:]))
+        raise PartialBatchFailure(index for index, payload in enumerate(payloads)
+                                  if not unsent.intersection(payload['task_ids'])) from error
+
+
+@register(OVERDUE_JOB)
+def send_overdue_emails(payloads):
+    """Job handler: one email per employee with open overdue tasks (once however many jobs were queued)."""
+    messages = _messages(_emailable(Task.objects.overdue()), 'Overdue tasks', 'catalog/email/tasks_overdue.txt')
+    try:
+        send_batch([message for message, task_ids in messages])
+    except MailBatchError as error:
+        # The jobs are interchangeable: retry one, so the reminders are not sent once per job.
+        raise PartialBatchFailure(range(1, len(payloads))) from error
+
+
+def notify_assigned(task_ids):
+    """Queues the assignment emails for these tasks (sent with the surrounding transaction's commit)."""
+    task_ids = sorted(task_ids)
+    if task_ids and settings.CATALOG_NOTIFICATIONS:
+        enqueue(ASSIGNMENT_JOB, {'task_ids': task_ids})
+
+
+def task_assigned(sender, instance, raw=False, **kwargs):
+    """post_save receiver for Task queuing an email when the task gets a new employee."""
+    if raw or instance.employee_id is None:
+        return
+    previous = previous_state(instance)
+    if previous is None or previous['employee_id'] != instance.employee_id:
+        notify_assigned([instance.pk])
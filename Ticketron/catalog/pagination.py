@@ -0,0 +1,171 @@
+"""Keyset (cursor) pagination for the catalog list views.
+
+Offset pagination (``?page=N``) makes the database scan and discard every row
+before the requested page and count the whole table on every request. Keyset
+pagination instead remembers the ordering key of the last row shown and asks
+for the rows after it, which an index on the ordering columns answers directly.
+"""
+
+import base64
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, values):
+    """Returns an opaque, URL-safe token for a page boundary."""
+    payload = json.dumps([direction, values], cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, fields):
+    """Returns (direction, values) from a token, raising ValueError if it is malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Malformed cursor')
+    if direction not in (NEXT, PREVIOUS) or len(values) != len(fields):
+        raise ValueError('Malformed cursor')
+    return direction, [None if value is None else field.to_python(value)
+                       for field, value in zip(fields, values)]
+
+
+def _keyset_filter(fields, values, forward):
+    """Builds the WHERE clause selecting rows strictly after (or before) the given key.
+
+    Rows are ordered ascending with NULLs last, so for a nullable column every
+    NULL sorts after every value.
+    """
+    condition = Q(pk__in=[])
+    equal_so_far = Q()
+    for field, value in zip(fields, values):
+        if forward:
+            if value is None:
+                beyond = Q(pk__in=[])
+            elif field.null:
+                beyond = Q(**{field.attname + '__gt': value}) | Q(**{field.attname + '__isnull': True})
+            else:
+                beyond = Q(**{field.attname + '__gt': value})
+        else:
+            if value is None:
+                beyond = Q(**{field.attname + '__isnull': False})
+            else:
+                beyond = Q(**{field.attname + '__lt': value})
+        condition |= equal_so_far & beyond
+        if value is None:
+            equal_so_far &= Q(**{field.attname + '__isnull': True})
+        else:
+            equal_so_far &= Q(**{field.attname: value})
+    return condition
+
+
+class CursorPaginator:
+    """Stands in for Django's Paginator; the total is only counted if asked for."""
+
+    def __init__(self, queryset, per_page, count_total, known_count=None):
+        self._queryset = queryset
+        self.per_page = per_page
+        self.count_total = count_total
+        self.known_count = known_count
+
+    @cached_property
+    def count(self):
+        if not self.count_total:
+            return None
+        if self.known_count is not None:
+            return self.known_count
+        return self._queryset.count()
+
+
+class CursorPage:
+    """A page of results with opaque tokens for the neighbouring pages."""
+    cursor_based = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginationMixin:
+    """ListView mixin paginating on a unique ordering key instead of OFFSET.
+
+    Views declare ``cursor_ordering``, a tuple of field names ending with a
+    unique column, and pages are requested with ``?cursor=<token>``. Legacy
+    ``?page=N`` links fall back to Django's offset pagination.
+    Set ``cursor_count_total = False`` to skip the ``COUNT(*)`` of the full list,
+    or override get_cursor_count() to supply the total from elsewhere.
+    """
+    cursor_ordering = ('pk',)
+    cursor_query_param = 'cursor'
+    cursor_count_total = True
+
+    def get_cursor_count(self):
+        """Returns the list total if it is known without counting (e.g. from a counter column), else None."""
+        return None
+
+    def get_cursor_fields(self, queryset):
+        opts = queryset.model._meta
+        return [opts.pk if name == 'pk' else opts.get_field(name) for name in self.cursor_ordering]
+
+    def paginate_queryset(self, queryset, page_size):
+        token = self.request.GET.get(self.cursor_query_param)
+        if token is None and self.page_kwarg in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+
+        fields = self.get_cursor_fields(queryset)
+        paginator = CursorPaginator(queryset, page_size, self.cursor_count_total,
+                                    self.get_cursor_count() if self.cursor_count_total else None)
+        forward = True
+        if token:
+            try:
+                direction, values = decode_cursor(token, fields)
+            except ValueError:
+                raise Http404('Invalid cursor.')
+            forward = direction == NEXT
+            queryset = queryset.filter(_keyset_filter(fields, values, forward))
+
+        if forward:
+            ordering = [F(field.attname).asc(nulls_last=True) if field.null else F(field.attname).asc()
+                        for field in fields]
+        else:
+            ordering = [F(field.attname).desc(nulls_first=True) if field.null else F(field.attname).desc()
+                        for field in fields]
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if not forward:
+            rows.reverse()
+
+        def key(obj):
+            return [getattr(obj, field.attname) for field in fields]
+
+        has_next = has_more if forward else True
+        has_previous = bool(token) if forward else has_more
+        next_cursor = encode_cursor(NEXT, key(rows[-1])) if rows and has_next else None
+        previous_cursor = encode_cursor(PREVIOUS, key(rows[0])) if rows and has_previous else None
+        page = CursorPage(rows, paginator, next_cursor, previous_cursor)
+        return (paginator, page, rows, page.has_other_pages())
@@ -0,0 +1,176 @@
+"""Read-replica routing for the catalog's read views.
+
+Replicas are the DATABASE_REPLICAS aliases (configured from
+DATABASE_REPLICA_URLS in settings). ReplicaRoutingMiddleware lets the views in
+CATALOG_REPLICA_VIEWS (the lists and exports) read from a replica; everything
+else, including all writes, uses ``default``. The detail pages are left out:
+they are cached under version stamps bumped on the primary (caching.py), and a
+page read from a lagging replica would be cached as the new version.
+
+A request that writes (ticket creation, client updates, renewals, ...) sets a
+short-lived cookie that keeps that browser on the primary for
+DATABASE_REPLICA_PIN_SECONDS, so users see their own changes. Replicas more
+than DATABASE_REPLICA_MAX_LAG seconds behind the primary, or unreachable, are
+skipped until the next lag check; with none left, reads go to the primary.
+"""
+
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger('catalog.replicas')
+
+PIN_COOKIE = 'primary_pin'
+# Writes that do not pin the user to the primary (the session is saved on most requests).
+PIN_IGNORED_APPS = {'sessions'}
+
+# Seconds the replica is behind the primary; 0 when it has replayed everything it received.
+POSTGRESQL_LAG_SQL = """
+    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END
+"""
+
+
+class RoutingState:
+    """What the router may do for the current request."""
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.replica_reads = False
+        self.replica = None
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('catalog_replica_routing', default=None)
+
+
+class ReplicaLagMonitor:
+    """Measures each replica's lag, at most once per DATABASE_REPLICA_LAG_CHECK_INTERVAL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lags = {}
+
+    def record(self, alias, lag, checked_at=None):
+        """Stores a measurement; ``lag`` None marks the replica unavailable."""
+        with self._lock:
+            self._lags[alias] = (checked_at if checked_at is not None else time.monotonic(), lag)
+
+    def lag(self, alias):
+        with self._lock:
+            checked_at, lag = self._lags.get(alias, (None, None))
+        if checked_at is None or time.monotonic() - checked_at > settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL:
+            lag = self.measure(alias)
+            self.record(alias, lag)
+        return lag
+
+    def measure(self, alias):
+        """Returns the replica's lag in seconds, or None if it cannot be reached."""
+        replica = connections[alias]
+        try:
+            if replica.vendor != 'postgresql':
+                # Nothing to measure (e.g. a SQLite copy): it is as current as it is kept.
+                replica.ensure_connection()
+                return 0.0
+            with replica.cursor() as cursor:
+                cursor.execute(POSTGRESQL_LAG_SQL)
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            logger.warning('Replica %s is unavailable; reading from the primary.', alias, exc_info=True)
+            return None
+
+    def reset(self):
+        with self._lock:
+            self._lags.clear()
+
+
+lag_monitor = ReplicaLagMonitor()
+
+
+def healthy_replicas():
+    """The replicas currently within DATABASE_REPLICA_MAX_LAG of the primary."""
+    healthy = []
+    for alias in settings.DATABASE_REPLICAS:
+        lag = lag_monitor.lag(alias)
+        if lag is None:
+            continue
+        if lag > settings.DATABASE_REPLICA_MAX_LAG:
+            logger.info('Replica %s is %.1fs behind; reading from the primary.', alias, lag)
+            continue
+        healthy.append(alias)
+    return healthy
+
+
+class ReplicaRouter:
+    """Sends reads to a replica inside replica-enabled views, everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica_reads or state.pinned or state.wrote:
+            return None
+        if state.replica is None:
+            # One replica per request, so paginated counts and pages agree.
+            healthy = healthy_replicas()
+            state.replica = random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.app_label not in PIN_IGNORED_APPS:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Enables replica reads for CATALOG_REPLICA_VIEWS and pins writers to the primary."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if response.streaming and state.replica_reads:
+            # Exports run their queries while the response is sent, after this returns.
+            response.streaming_content = self.stream(state, response.streaming_content)
+        if state.wrote:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if (state is not None and request.method in ('GET', 'HEAD')
+                and request.resolver_match.url_name in settings.CATALOG_REPLICA_VIEWS):
+            state.replica_reads = True
+
+    @staticmethod
+    def stream(state, content):
+        token = _state.set(state)
+        try:
+            yield from content
+        finally:
+            _state.reset(token)
@@ -0,0 +1,141 @@
+"""Daily ticket throughput rollups, the only table the throughput report reads.
+
+TicketRollup holds, per day, client, severity and status, the number of
+tickets opened and the number that entered one of CATALOG_CLOSED_STATUSES.
+Ticket saves add to the current day's rows as they happen (one UPDATE per row
+touched, none for saves that open or close nothing); bulk writers collect
+their counts in a RollupDeltas themselves. A report costs one grouped query
+over the days it covers, however many tickets there are.
+
+``manage.py rebuild_rollups`` recomputes every row from the change log
+(catalog/changelog.py), the record of when each ticket was opened and when
+its status changed. Run it once after deploying, and to repair the rows
+after writes that bypassed them. Tickets created before the change log
+existed are not counted as opened; their first logged change only tells
+where they stand.
+"""
+
+import collections
+import datetime
+import itertools
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from .caching import previous_state
+from .changelog import CHANGELOG_CHUNK_SIZE
+from .models import ChangeLogEntry, Client, Status, Ticket, TicketRollup
+from .timeline import week_start
+
+SEVERITY_NAMES = dict(Ticket.ticket_severity)
+
+
+def closed_status_ids():
+    """Pks of the CATALOG_CLOSED_STATUSES statuses, from the in-memory status table."""
+    statuses = (Status.objects.get_by_name(name) for name in settings.CATALOG_CLOSED_STATUSES)
+    return {status.pk for status in statuses if status is not None}
+
+
+def ticket_state(ticket):
+    """The fields of a Ticket the rollups are broken down by."""
+    return {'client_id': ticket.client_id, 'severity': ticket.severity, 'status_id': ticket.status_id}
+
+
+class RollupDeltas:
+    """Collects the opened/closed counts of some ticket writes and adds them together."""
+
+    def __init__(self, closed_ids=None):
+        self.closed_ids = closed_status_ids() if closed_ids is None else closed_ids
+        self.rows = collections.defaultdict(lambda: [0, 0])
+
+    def add(self, day, state, created, previous_status_id=None):
+        """Counts one ticket write on ``day``; ``state`` holds the ticket's values after it."""
+        status_id = state.get('status_id')
+        closing = status_id in self.closed_ids and (created or previous_status_id not in self.closed_ids)
+        if not created and not closing:
+            return
+        client_id = state.get('client_id')
+        counts = self.rows[day, str(client_id) if client_id else '', state.get('severity') or '', status_id or 0]
+        counts[0] += created
+        counts[1] += closing
+
+    def apply(self):
+        for (day, client_key, severity, status_key), (opened, closed) in self.rows.items():
+            key = {'day': day, 'client_key': client_key, 'severity': severity, 'status_key': status_key}
+            changes = {'opened': F('opened') + opened, 'closed': F('closed') + closed}
+            if not TicketRollup.objects.filter(**key).update(**changes):
+                rollup, created = TicketRollup.objects.get_or_create(
+                    **key, defaults={'opened': opened, 'closed': closed})
+                if not created:
+                    TicketRollup.objects.filter(**key).update(**changes)
+
+
+def ticket_saved(sender, instance, created, raw=False, **kwargs):
+    """post_save receiver for Ticket (needs the pre_save state from caching.remember_previous_state)."""
+    if raw:
+        return
+    previous = previous_state(instance)
+    deltas = RollupDeltas()
+    deltas.add(timezone.localdate(), ticket_state(instance), created, previous['status_id'] if previous else None)
+    deltas.apply()
+
+
+def rebuild():
+    """Replaces every TicketRollup row with counts replayed from the change log; returns the rows written.
+
+    Reads the log one ticket at a time (changelog_object_idx), so memory only
+    grows with the number of rows written.
+    """
+    deltas = RollupDeltas()
+    entries = (ChangeLogEntry.objects.filter(model=Ticket._meta.model_name).order_by('object_pk', 'seq')
+               .values_list('object_pk', 'action', 'data', 'changed_at').iterator(chunk_size=CHANGELOG_CHUNK_SIZE))
+    for object_pk, history in itertools.groupby(entries, key=lambda entry: entry[0]):
+        state = None
+        for _, action, data, changed_at in history:
+            day = timezone.localdate(changed_at)
+            if action == ChangeLogEntry.CREATED:
+                state = data
+                deltas.add(day, state, created=True)
+            elif action == ChangeLogEntry.DELETED:
+                state = None
+            elif state is None:
+                # Created before the change log began.
+                state = data
+            else:
+                previous_status_id = state.get('status_id')
+                state = dict(state, **data)
+                deltas.add(day, state, created=False, previous_status_id=previous_status_id)
+    rows = [TicketRollup(day=day, client_key=client_key, severity=severity, status_key=status_key,
+                         opened=opened, closed=closed)
+            for (day, client_key, severity, status_key), (opened, closed) in deltas.rows.items()]
+    with transaction.atomic():
+        TicketRollup.objects.all().delete()
+        TicketRollup.objects.bulk_create(rows, batch_size=CHANGELOG_CHUNK_SIZE)
+    return len(rows)
+
+
+def throughput(start, end, client_id=None):
+    """Tickets opened and closed per week from ``start`` to ``end``, by client, severity and status.
+
+    Returns a list of dicts ordered by week, then client name, severity and
+    status name. Weeks are whole, Monday to Sunday.
+    """
+    rows = TicketRollup.objects.filter(
+        day__range=(week_start(start), week_start(end) + datetime.timedelta(days=6)))
+    if client_id is not None:
+        rows = rows.filter(client_key=str(client_id))
+    rows = list(rows.annotate(week=TruncWeek('day')).order_by()
+                .values('week', 'client_key', 'severity', 'status_key')
+                .annotate(opened=Sum('opened'), closed=Sum('closed')))
+    clients = {str(pk): name for pk, name in Client.objects.filter(
+        pk__in={row['client_key'] for row in rows if row['client_key']}).values_list('pk', 'company_name')}
+    for row in rows:
+        client = clients.get(row['client_key'])
+        status = Status.objects.get_cached(row['status_key'] or None)
+        row.update(client=client, severity=SEVERITY_NAMES.get(row['severity'], ''),
+                   status=status.name if status is not None else '')
+    rows.sort(key=lambda row: (row['week'], row['client'] is None, row['client'] or '', row['severity'], row['status']))
+    return rows
@@ -0,0 +1,222 @@
+"""Bulk rescheduling and reassignment of tasks, and the automatic scheduler."""
+
+import collections
+import datetime
+import heapq
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count
+
+from . import caching, changelog, timeline
+from .counters import CounterDeltas, task_state
+from .forms import TaskChangeForm
+from .models import ChangeLogEntry, EmployeeWorkload, Task
+from .notifications import notify_assigned
+
+# Largest number of rows accepted by one bulk request.
+MAX_BULK_TASK_CHANGES = 1000
+
+# Order in which auto_schedule places tasks, by Ticket.severity (tasks without one go last).
+SEVERITY_PRIORITY = {'h': 0, 'm': 1, 'l': 2}
+# Tasks per UPDATE, and tickets/tasks per cache/notification call, when writing a schedule.
+SCHEDULE_CHUNK_SIZE = 500
+
+
+def _not_found(task_id, field, message):
+    return {'id': task_id, 'status': 'error', 'errors': {field: [{'message': message, 'code': 'not_found'}]}}
+
+
+def apply_task_changes(rows):
+    """Validates and applies [{id, scheduled_day?, employee?}, ...] with one bulk_update.
+
+    Valid rows are written together in one transaction; invalid rows are left
+    untouched. Returns one result per input row, in order:
+    ``{'id': ..., 'status': 'updated'}`` or ``{'id': ..., 'status': 'error', 'errors': {...}}``.
+    """
+    forms = [TaskChangeForm(row if isinstance(row, dict) else {}) for row in rows]
+    results = [None] * len(forms)
+    valid = {}
+    for index, form in enumerate(forms):
+        if form.is_valid():
+            if form.cleaned_data['id'] in valid:
+                form.add_error('id', 'Task listed more than once.')
+            else:
+                valid[form.cleaned_data['id']] = index
+        if form.errors:
+            results[index] = {'id': form.data.get('id'), 'status': 'error', 'errors': form.errors.get_json_data()}
+
+    employee_ids = {forms[index].cleaned_data['employee'] for index in valid.values()} - {None}
+    employees = User.objects.in_bulk(employee_ids)
+
+    with transaction.atomic():
+        tasks = Task.objects.select_for_update().in_bulk(list(valid))
+        changed = []
+        fields = set()
+        deltas = CounterDeltas()
+        reassigned = []
+        days = set()
+        for task_id, index in valid.items():
+            data = forms[index].cleaned_data
+            task = tasks.get(task_id)
+            if task is None:
+                results[index] = _not_found(task_id, 'id', 'No such task.')
+                continue
+            if data['employee'] is not None and data['employee'] not in employees:
+                results[index] = _not_found(task_id, 'employee', 'No such user.')
+                continue
+            deltas.add_task(task_state(task), -1)
+            days.add(task.scheduled_day)
+            if data['employee'] is not None and data['employee'] != task.employee_id:
+                reassigned.append(task_id)
+            if data['employee'] is not None:
+                task.employee_id = data['employee']
+                fields.add('employee')
+            if data['scheduled_day'] is not None:
+                task.scheduled_day = data['scheduled_day']
+                fields.add('scheduled_day')
+            deltas.add_task(task_state(task), 1)
+            days.add(task.scheduled_day)
+            changed.append(task)
+            results[index] = {'id': task_id, 'status': 'updated'}
+        if changed:
+            # bulk_update sends no signals, so log it and update the counters and cached pages here.
+            Task.objects.bulk_update(changed, sorted(fields))
+            changelog.log_changes(Task, ChangeLogEntry.UPDATED,
+                                  ((task.pk, changelog.snapshot(task, fields)) for task in changed))
+            deltas.apply()
+            caching.tasks_changed(task.ticket_id for task in changed)
+            timeline.days_changed(days)
+            notify_assigned(reassigned)
+    return results
+
+
+def plan_schedule(tasks, employees, days, capacity, booked=None, workload=None):
+    """Places tasks on (employee, day) slots; returns {task_id: (employee_id, day)}.
+
+    ``tasks`` are (task_id, employee_id or None, severity) tuples. Tasks are
+    placed in severity order, then by id, each on the earliest day with a free
+    slot: tasks with an employee keep that employee; the others go to the
+    candidate ``employees`` with the fewest tasks that day, then the fewest
+    open tasks overall (``workload``). Nobody gets more than ``capacity`` tasks
+    a day, counting the tasks already ``booked`` ({(employee_id, day): n}).
+    Tasks that do not fit within ``days`` are left out.
+
+    A min-heap holds one (day, load that day, workload, employee) entry per
+    candidate, so each task costs O(log employees).
+    """
+    day_index = {day: index for index, day in enumerate(days)}
+    load = collections.Counter()
+    for (employee_id, day), count in (booked or {}).items():
+        if day in day_index:
+            load[employee_id, day_index[day]] += count
+    workload = collections.Counter(workload or {})
+    next_day = collections.Counter()
+
+    def first_free_day(employee_id):
+        index = next_day[employee_id]
+        while index < len(days) and load[employee_id, index] >= capacity:
+            index += 1
+        next_day[employee_id] = index
+        return index
+
+    def entry(employee_id):
+        index = first_free_day(employee_id)
+        return index, load[employee_id, index], workload[employee_id], employee_id
+
+    heap = [entry(employee_id) for employee_id in set(employees)]
+    heapq.heapify(heap)
+    plan = {}
+    for task_id, employee_id, severity in sorted(tasks, key=lambda task: (SEVERITY_PRIORITY.get(task[2], 3), task[0])):
+        if employee_id is None:
+            while heap:
+                top = heap[0]
+                current = entry(top[3])
+                if current == top:
+                    break
+                # The employee got a task of their own since this entry was pushed.
+                heapq.heapreplace(heap, current)
+            if not heap or heap[0][0] == len(days):
+                continue
+            employee_id = heap[0][3]
+        index = first_free_day(employee_id)
+        if index == len(days):
+            continue
+        load[employee_id, index] += 1
+        workload[employee_id] += 1
+        plan[task_id] = (employee_id, days[index])
+        if heap and heap[0][3] == employee_id:
+            heapq.heapreplace(heap, entry(employee_id))
+    return plan
+
+
+def auto_schedule(tasks=None, employees=None, start=None, horizon=None, capacity=None):
+    """Gives open tasks without a scheduled_day a day, and an employee if they have none.
+
+    ``tasks`` is a Task queryset (default: all); ``employees`` a User queryset
+    of candidates for unassigned tasks (default: active users with a
+    workload). Days run from ``start`` (default today) for ``horizon`` days
+    (CATALOG_SCHEDULE_HORIZON_DAYS) with at most ``capacity`` tasks per
+    employee per day (CATALOG_SCHEDULE_DAILY_CAPACITY); see plan_schedule.
+    Returns {'scheduled': n, 'unscheduled': n}.
+    """
+    start = start or datetime.date.today()
+    if start < datetime.date.today():
+        raise ValueError('Cannot schedule tasks in the past.')
+    horizon = horizon or settings.CATALOG_SCHEDULE_HORIZON_DAYS
+    capacity = capacity or settings.CATALOG_SCHEDULE_DAILY_CAPACITY
+    days = [start + datetime.timedelta(days=offset) for offset in range(horizon)]
+    if tasks is None:
+        tasks = Task.objects.all()
+    if employees is None:
+        employees = User.objects.filter(is_active=True, workload__isnull=False)
+    candidates = list(employees.values_list('pk', flat=True))
+
+    with transaction.atomic():
+        rows = list(tasks.filter(scheduled_day__isnull=True, task_checker=False)
+                    .select_for_update(of=('self',)).order_by()
+                    .values_list('pk', 'employee_id', 'ticket__severity', 'ticket_id'))
+        employee_ids = set(candidates) | {row[1] for row in rows} - {None}
+        booked = {(row['employee'], row['scheduled_day']): row['n'] for row in
+                  Task.objects.filter(task_checker=False, employee__in=employee_ids,
+                                      scheduled_day__range=(days[0], days[-1]))
+                  .order_by().values('employee', 'scheduled_day').annotate(n=Count('pk'))}
+        workload = dict(EmployeeWorkload.objects.filter(employee__in=employee_ids)
+                        .values_list('employee_id', 'open_tasks'))
+        plan = plan_schedule([row[:3] for row in rows], candidates, days, capacity, booked, workload)
+
+        by_slot = collections.defaultdict(list)
+        ticket_ids = set()
+        deltas = CounterDeltas()
+        reassigned = []
+        for task_id, employee_id, severity, ticket_id in rows:
+            if task_id not in plan:
+                continue
+            new_employee_id, day = plan[task_id]
+            # Counter states (see counters.task_state), without building 100k model instances.
+            before = {'ticket_id': ticket_id, 'employee_id': employee_id, 'task_checker': False}
+            deltas.add_task(before, -1)
+            deltas.add_task(dict(before, employee_id=new_employee_id), 1)
+            if new_employee_id != employee_id:
+                reassigned.append(task_id)
+            by_slot[new_employee_id, day].append(task_id)
+            ticket_ids.add(ticket_id)
+        # Every task of a slot gets the same values: one plain UPDATE per slot (per chunk)
+        # is much cheaper than bulk_update's per-row CASE expressions.
+        for (employee_id, day), task_ids in by_slot.items():
+            for offset in range(0, len(task_ids), SCHEDULE_CHUNK_SIZE):
+                Task.objects.filter(pk__in=task_ids[offset:offset + SCHEDULE_CHUNK_SIZE]).update(
+                    employee_id=employee_id, scheduled_day=day)
+        # Updates send no signals, so log them and update the counters and cached pages here.
+        changelog.log_changes(Task, ChangeLogEntry.UPDATED, (
+            (task_id, {'employee_id': employee_id, 'scheduled_day': day})
+            for (employee_id, day), task_ids in by_slot.items() for task_id in task_ids))
+        deltas.apply()
+        timeline.days_changed({day for employee_id, day in by_slot})
+        ticket_ids = list(ticket_ids)
+        for offset in range(0, len(ticket_ids), SCHEDULE_CHUNK_SIZE):
+            caching.tasks_changed(ticket_ids[offset:offset + SCHEDULE_CHUNK_SIZE])
+        for offset in range(0, len(reassigned), SCHEDULE_CHUNK_SIZE):
+            notify_assigned(reassigned[offset:offset + SCHEDULE_CHUNK_SIZE])
+    return {'scheduled': len(plan), 'unscheduled': len(rows) - len(plan)}
@@ -0,0 +1,264 @@
+"""Full-text search over ticket titles/summaries and task work summaries.
+
+Documents live in a side table, ``catalog_search`` (created by migration 0003):
+
+- on PostgreSQL a regular table with a weighted ``tsvector`` column and a GIN index,
+- on SQLite an FTS5 virtual table ranked with bm25().
+
+The table is kept in sync by post_save/post_delete receivers on Ticket and
+Task (see signals.py); bulk writes call index_tickets()/index_tasks() directly
+and ``manage.py rebuild_search_index`` rebuilds it from scratch.
+"""
+
+from django.db import connection
+
+from .caching import previous_state
+from .models import Task, Ticket
+
+SEARCH_TABLE = 'catalog_search'
+TICKET = 'ticket'
+TASK = 'task'
+
+
+class SearchHit:
+    """One ranked search result, with the matching Ticket or Task in ``obj``."""
+
+    def __init__(self, kind, obj, rank):
+        self.kind = kind
+        self.obj = obj
+        self.rank = rank
+
+    @property
+    def ticket(self):
+        return self.obj if self.kind == TICKET else self.obj.ticket
+
+
+def _ticket_document(ticket):
+    return (TICKET, str(ticket.pk), ticket.title, ticket.summary)
+
+
+def _task_document(task):
+    return (TASK, str(task.pk), task.ticket.title if task.ticket_id else '', task.Work_Summary)
+
+
+class BaseSearchBackend:
+    """Writes and queries documents of (kind, object_id, title, body)."""
+    tables = (SEARCH_TABLE,)
+    search_sql = None
+
+    def create_tables(self, cursor):
+        raise NotImplementedError
+
+    def drop_tables(self, cursor):
+        for table in self.tables:
+            cursor.execute('DROP TABLE IF EXISTS {0}'.format(table))
+
+    def insert_documents(self, cursor, documents):
+        raise NotImplementedError
+
+    def remove_documents(self, cursor, documents):
+        raise NotImplementedError
+
+    def query_param(self, query):
+        return query
+
+    def index(self, documents):
+        documents = list(documents)
+        if not documents:
+            return
+        with connection.cursor() as cursor:
+            self.remove_documents(cursor, documents)
+            self.insert_documents(cursor, documents)
+
+    def remove(self, documents):
+        with connection.cursor() as cursor:
+            self.remove_documents(cursor, documents)
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            for table in self.tables:
+                cursor.execute('DELETE FROM {0}'.format(table))
+
+    def search(self, query, limit, offset):
+        """Returns [(kind, object_id, rank)] best match first."""
+        with connection.cursor() as cursor:
+            cursor.execute(self.search_sql, [self.query_param(query), limit, offset])
+            return cursor.fetchall()
+
+
+def _ids_by_kind(documents):
+    """Yields (kind, [object_id, ...]) for the kinds present in documents."""
+    for kind in (TICKET, TASK):
+        ids = [document[1] for document in documents if document[0] == kind]
+        if ids:
+            yield kind, ids
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    search_sql = (
+        "SELECT kind, object_id, ts_rank(document, query) AS rank "
+        "FROM {0}, plainto_tsquery('english', %s) query "
+        "WHERE document @@ query ORDER BY rank DESC, kind, object_id LIMIT %s OFFSET %s"
+    ).format(SEARCH_TABLE)
+
+    def create_tables(self, cursor):
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS {0} (kind varchar(10) NOT NULL, object_id varchar(36) NOT NULL, '
+            'document tsvector NOT NULL, PRIMARY KEY (kind, object_id))'.format(SEARCH_TABLE))
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS {0}_document_idx ON {0} USING GIN (document)'.format(SEARCH_TABLE))
+
+    def insert_documents(self, cursor, documents):
+        # Titles are weighted A and bodies B, so ts_rank prefers title matches.
+        cursor.executemany(
+            "INSERT INTO {0} (kind, object_id, document) VALUES (%s, %s, "
+            "setweight(to_tsvector('english', %s), 'A') || setweight(to_tsvector('english', %s), 'B'))"
+            .format(SEARCH_TABLE), documents)
+
+    def remove_documents(self, cursor, documents):
+        for kind, ids in _ids_by_kind(documents):
+            cursor.execute('DELETE FROM {0} WHERE kind = %s AND object_id = ANY(%s)'.format(SEARCH_TABLE),
+                           [kind, ids])
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """FTS5 table keyed by rowid, plus a key table mapping rowids to (kind, object_id)."""
+    key_table = SEARCH_TABLE + '_key'
+    tables = (SEARCH_TABLE, key_table)
+    # Title matches weigh ten times as much as body matches; bm25() is lower for better matches.
+    search_sql = (
+        'SELECT k.kind, k.object_id, bm25({0}, 10.0, 1.0) AS rank FROM {0} '
+        'JOIN {1} k ON k.id = {0}.rowid '
+        'WHERE {0} MATCH %s ORDER BY rank, k.kind, k.object_id LIMIT %s OFFSET %s'
+    ).format(SEARCH_TABLE, SEARCH_TABLE + '_key')
+
+    def create_tables(self, cursor):
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS {0} (id integer PRIMARY KEY AUTOINCREMENT, kind varchar(10) NOT NULL, '
+            'object_id varchar(36) NOT NULL, UNIQUE (kind, object_id))'.format(self.key_table))
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS {0} USING fts5(title, body, tokenize='porter')".format(SEARCH_TABLE))
+
+    def insert_documents(self, cursor, documents):
+        for kind, object_id, title, body in documents:
+            cursor.execute('INSERT INTO {0} (kind, object_id) VALUES (%s, %s)'.format(self.key_table),
+                           [kind, object_id])
+            cursor.execute('INSERT INTO {0} (rowid, title, body) VALUES (%s, %s, %s)'.format(SEARCH_TABLE),
+                           [cursor.lastrowid, title, body])
+
+    def remove_documents(self, cursor, documents):
+        for kind, ids in _ids_by_kind(documents):
+            keys = 'SELECT id FROM {0} WHERE kind = %s AND object_id IN ({1})'.format(
+                self.key_table, ', '.join(['%s'] * len(ids)))
+            cursor.execute('DELETE FROM {0} WHERE rowid IN ({1})'.format(SEARCH_TABLE, keys), [kind] + ids)
+            cursor.execute('DELETE FROM {0} WHERE id IN ({1})'.format(self.key_table, keys), [kind] + ids)
+
+    def query_param(self, query):
+        # Quote every term so user input is never parsed as FTS5 query syntax.
+        return ' '.join('"{0}"'.format(term.replace('"', '""')) for term in query.split())
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_backend(vendor=None):
+    """Returns the backend for the database in use, or None if search is unsupported there."""
+    backend = BACKENDS.get(vendor or connection.vendor)
+    return backend() if backend is not None else None
+
+
+def index_tickets(tickets):
+    backend = get_backend()
+    if backend is not None:
+        backend.index(_ticket_document(ticket) for ticket in tickets)
+
+
+def index_tasks(tasks):
+    backend = get_backend()
+    if backend is not None:
+        backend.index(_task_document(task) for task in tasks)
+
+
+def remove(kind, object_id):
+    backend = get_backend()
+    if backend is not None:
+        backend.remove([(kind, str(object_id), None, None)])
+
+
+def available():
+    """Whether full-text search works on the database in use."""
+    return connection.vendor in BACKENDS
+
+
+def _require_backend():
+    backend = get_backend()
+    if backend is None:
+        raise NotImplementedError('Full-text search is not available on {0}.'.format(connection.vendor))
+    return backend
+
+
+def search(query, limit=10, offset=0):
+    """Returns a list of SearchHit for the query, best match first."""
+    if not query.split():
+        return []
+    rows = _require_backend().search(query, limit, offset)
+    ticket_ids = [object_id for kind, object_id, rank in rows if kind == TICKET]
+    task_ids = [int(object_id) for kind, object_id, rank in rows if kind == TASK]
+    tickets = Ticket.objects.select_related('client').in_bulk(ticket_ids) if ticket_ids else {}
+    tasks = Task.objects.select_related('ticket').in_bulk(task_ids) if task_ids else {}
+    objects = {TICKET: {str(pk): obj for pk, obj in tickets.items()},
+               TASK: {str(pk): obj for pk, obj in tasks.items()}}
+    return [SearchHit(kind, objects[kind][str(object_id)], rank)
+            for kind, object_id, rank in rows if str(object_id) in objects[kind]]
+
+
+def rebuild(batch_size=2000):
+    """Reindexes every Ticket and Task; returns the number of documents written."""
+    backend = _require_backend()
+    backend.clear()
+    written = 0
+    batch = []
+    for ticket in Ticket.objects.only('ticket_id', 'title', 'summary').iterator(chunk_size=batch_size):
+        batch.append(_ticket_document(ticket))
+        if len(batch) >= batch_size:
+            backend.index(batch)
+            written += len(batch)
+            batch = []
+    for task in Task.objects.select_related('ticket').only(
+            'id', 'Work_Summary', 'ticket', 'ticket__title').iterator(chunk_size=batch_size):
+        batch.append(_task_document(task))
+        if len(batch) >= batch_size:
+            backend.index(batch)
+            written += len(batch)
+            batch = []
+    backend.index(batch)
+    return written + len(batch)
+
+
+def index_ticket(sender, instance, created, **kwargs):
+    """post_save receiver for Ticket (needs the pre_save state from caching.remember_previous_state).
+
+    Task documents carry the ticket title, so a renamed ticket's tasks are reindexed too.
+    """
+    index_tickets([instance])
+    previous = previous_state(instance)
+    if not created and (previous is None or previous['title'] != instance.title):
+        index_tasks(instance.task_set.select_related('ticket'))
+
+
+def index_task(sender, instance, **kwargs):
+    """post_save receiver for Task."""
+    index_tasks([instance])
+
+
+def remove_ticket(sender, instance, **kwargs):
+    """post_delete receiver for Ticket."""
+    remove(TICKET, instance.pk)
+
+
+def remove_task(sender, instance, **kwargs):
+    """post_delete receiver for Task."""
+    remove(TASK, instance.pk)
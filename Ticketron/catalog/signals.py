@@ -0,0 +1,67 @@
+"""Signal wiring for the catalog application (connected in CatalogConfig.ready)."""
+
+from django.contrib.auth.models import User
+from django.core.signals import request_finished
+from django.db.models.signals import pre_save, pre_delete, post_save, post_delete
+
+from .models import Ticket, Task, Client, Status
+from . import caching, changelog, counters, notifications, rollups, search, timeline, visits, workflow
+
+
+def connect_signals():
+    """Connects the catalog cache, page version, search index, counter, rollup, workflow, email, visit and change log receivers."""
+    # Reload the in-memory status table whenever a status change commits.
+    post_save.connect(Status.objects.status_changed, sender=Status, dispatch_uid='status-cache-save')
+    post_delete.connect(Status.objects.status_changed, sender=Status, dispatch_uid='status-cache-delete')
+
+    # Keep the full-text search index in sync.
+    post_save.connect(search.index_ticket, sender=Ticket, dispatch_uid='search-save-Ticket')
+    post_delete.connect(search.remove_ticket, sender=Ticket, dispatch_uid='search-delete-Ticket')
+    post_save.connect(search.index_task, sender=Task, dispatch_uid='search-save-Task')
+    post_delete.connect(search.remove_task, sender=Task, dispatch_uid='search-delete-Task')
+
+    # Bump the version stamps of the cached detail pages.
+    for model, receiver in ((Ticket, caching.ticket_changed), (Task, caching.task_changed),
+                            (Client, caching.client_changed)):
+        post_save.connect(receiver, sender=model, dispatch_uid='version-save-{0}'.format(model.__name__))
+        post_delete.connect(receiver, sender=model, dispatch_uid='version-delete-{0}'.format(model.__name__))
+    for model in (Ticket, Task):
+        pre_save.connect(caching.remember_previous_state, sender=model,
+                         dispatch_uid='version-pre-save-{0}'.format(model.__name__))
+
+    # Bump the version stamps of the cached calendar weeks.
+    post_save.connect(timeline.task_changed, sender=Task, dispatch_uid='calendar-save-Task')
+    post_delete.connect(timeline.task_changed, sender=Task, dispatch_uid='calendar-delete-Task')
+    post_save.connect(timeline.ticket_changed, sender=Ticket, dispatch_uid='calendar-save-Ticket')
+    # Before the delete, while its tasks still point at the ticket.
+    pre_delete.connect(timeline.ticket_changed, sender=Ticket, dispatch_uid='calendar-delete-Ticket')
+    post_save.connect(timeline.employee_changed, sender=User, dispatch_uid='calendar-save-User')
+    pre_delete.connect(timeline.employee_changed, sender=User, dispatch_uid='calendar-delete-User')
+
+    # Maintain the denormalized counters.
+    post_save.connect(counters.task_saved, sender=Task, dispatch_uid='counters-save-Task')
+    post_delete.connect(counters.task_deleted, sender=Task, dispatch_uid='counters-delete-Task')
+    post_save.connect(counters.ticket_saved, sender=Ticket, dispatch_uid='counters-save-Ticket')
+    post_delete.connect(counters.ticket_deleted, sender=Ticket, dispatch_uid='counters-delete-Ticket')
+
+    # Count opened and closed tickets in the daily throughput rollups.
+    post_save.connect(rollups.ticket_saved, sender=Ticket, dispatch_uid='rollups-save-Ticket')
+
+    # Record status changes in the ticket transition history.
+    post_save.connect(workflow.ticket_saved, sender=Ticket, dispatch_uid='workflow-save-Ticket')
+
+    # Queue an email to the employee a task is assigned to.
+    post_save.connect(notifications.task_assigned, sender=Task, dispatch_uid='notify-assigned-Task')
+
+    # Save the batched home page visit counts after a response, at most once per interval.
+    request_finished.connect(visits.visit_counter.flush_if_due, dispatch_uid='flush-visit-counts')
+
+    # Append every write of the synced models to the change log.
+    for model in changelog.LOGGED_MODELS:
+        post_save.connect(changelog.object_saved, sender=model,
+                          dispatch_uid='changelog-save-{0}'.format(model.__name__))
+        post_delete.connect(changelog.object_deleted, sender=model,
+                            dispatch_uid='changelog-delete-{0}'.format(model.__name__))
+    for model in changelog.DETACHING_MODELS:
+        pre_delete.connect(changelog.dependents_detached, sender=model,
+                           dispatch_uid='changelog-detach-{0}'.format(model.__name__))
@@ -0,0 +1,30 @@
+"""Shared helpers for the catalog tests."""
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    """TestCase mixin for asserting how many SQL queries a view issues."""
+
+    def get_view_queries(self, url, data=None):
+        """Requests the url and returns (response, captured queries)."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        return response, context.captured_queries
+
+    def assertViewQueries(self, url, num, data=None):
+        """Asserts the view issues exactly num queries and returns the response."""
+        response, queries = self.get_view_queries(url, data)
+        self.assertEqual(
+            len(queries), num,
+            '{0} executed {1} queries, expected {2}:\n{3}'.format(
+                url, len(queries), num, '\n'.join(query['sql'] for query in queries)))
+        return response
+
+    def assertConstantQueries(self, url, grow, data=None):
+        """Asserts the view's query count does not change after calling grow() to add rows."""
+        response, before = self.get_view_queries(url, data)
+        grow()
+        return self.assertViewQueries(url, len(before), data)
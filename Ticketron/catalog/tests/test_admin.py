@@ -0,0 +1,60 @@
+from django.test import TestCase, override_settings
+
+# Create your tests here.
+
+import datetime
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from catalog.models import Client, Status, Task, Ticket
+from catalog.tests.helpers import QueryCountMixin
+
+
+# The committed staticfiles manifest predates the admin's current assets.
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AdminChangelistTest(QueryCountMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_superuser(username='admin', email='admin@test.com', password='1X<ISRUkw+tuK')
+        cls.status = Status.objects.create(name='In Progress')
+
+    def setUp(self):
+        self.client.login(username='admin', password='1X<ISRUkw+tuK')
+        Status.objects.all_cached()
+
+    def add_rows(self):
+        for number in range(3):
+            test_client = Client.objects.create(company_name='Acme {0}'.format(number))
+            ticket = Ticket.objects.create(title='Ticket {0}'.format(number), summary=' ',
+                                           client=test_client, status=self.status)
+            Task.objects.create(ticket=ticket, Work_Summary=' ', employee=User.objects.first(),
+                                scheduled_day=datetime.date.today())
+
+    def test_ticket_changelist_queries_constant(self):
+        self.add_rows()
+        response = self.assertConstantQueries(reverse('admin:catalog_ticket_changelist'), self.add_rows)
+        self.assertContains(response, 'In Progress')
+
+    def test_task_changelist_queries_constant(self):
+        self.add_rows()
+        self.assertConstantQueries(reverse('admin:catalog_task_changelist'), self.add_rows)
+
+    def test_client_changelist_search(self):
+        self.add_rows()
+        response = self.client.get(reverse('admin:catalog_client_changelist'), {'q': 'acme'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 3)
+        # Searches are prefix matches, which the name indexes can serve.
+        response = self.client.get(reverse('admin:catalog_client_changelist'), {'q': 'cme'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    def test_ticket_change_form_uses_autocomplete(self):
+        self.add_rows()
+        ticket = Ticket.objects.first()
+        response = self.client.get(reverse('admin:catalog_ticket_change', args=[ticket.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertEqual(response.context['adminform'].form.fields['client'].widget.widget.__class__.__name__,
+                         'AutocompleteSelect')
@@ -0,0 +1,121 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.caching import TICKET, get_version
+from catalog.models import Client, Task, Ticket
+
+
+class DetailPageCachingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        self.test_client = Client.objects.create(company_name='Acme')
+        self.ticket = Ticket.objects.create(title='Printer jammed', summary=' ', client=self.test_client,
+                                            status=None)
+        Task.objects.create(ticket=self.ticket, Work_Summary='Clear the tray')
+        self.ticket_url = reverse('ticket-detail', args=[self.ticket.pk])
+        self.client_url = reverse('client-detail', args=[self.test_client.pk])
+
+    def test_repeat_request_served_from_cache(self):
+        first = self.client.get(self.ticket_url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.ticket_url)
+        self.assertEqual(first.content, second.content)
+        self.assertContains(second, 'Clear the tray')
+
+    def test_conditional_get_returns_304(self):
+        response = self.client.get(self.client_url)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.client.get(self.client_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_task_change_invalidates_ticket_and_client_pages(self):
+        ticket_etag = self.client.get(self.ticket_url)['ETag']
+        client_etag = self.client.get(self.client_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(ticket=self.ticket, Work_Summary='Replace the roller')
+
+        response = self.client.get(self.ticket_url, HTTP_IF_NONE_MATCH=ticket_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Replace the roller')
+        response = self.client.get(self.client_url, HTTP_IF_NONE_MATCH=client_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '(2 open)')
+
+    def test_client_change_invalidates_its_ticket_pages(self):
+        self.client.get(self.ticket_url)
+        self.test_client.company_name = 'Initech'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_client.save()
+        self.assertContains(self.client.get(self.ticket_url), 'Initech')
+
+    def test_client_change_leaves_ticket_stamps_alone(self):
+        version = get_version(TICKET, self.ticket.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                self.test_client.save()
+        self.assertEqual(get_version(TICKET, self.ticket.pk), version)
+        self.assertFalse([query for query in queries if 'FROM "catalog_ticket"' in query['sql']])
+
+    def test_new_ticket_does_not_read_its_previous_state(self):
+        with CaptureQueriesContext(connection) as queries:
+            ticket = Ticket.objects.create(title='Scanner offline', summary=' ', client=None, status=None)
+        self.assertFalse([query for query in queries
+                          if query['sql'].startswith('SELECT') and str(ticket.pk).replace('-', '') in query['sql']])
+
+    def test_moving_ticket_invalidates_previous_client(self):
+        self.assertContains(self.client.get(self.client_url), 'Printer jammed')
+        self.ticket.client = Client.objects.create(company_name='Initech')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ticket.save()
+        self.assertNotContains(self.client.get(self.client_url), 'Printer jammed')
+
+    def test_client_tickets_are_paginated_and_cached_per_page(self):
+        for number in range(20):
+            Ticket.objects.create(title='Scanner {0:02}'.format(number), summary=' ', client=self.test_client,
+                                  status=None)
+        first = self.client.get(self.client_url)
+        self.assertContains(first, 'Page 1 of 2.')
+        self.assertNotContains(first, 'Scanner 19')
+        second = self.client.get(self.client_url, {'page': 2})
+        self.assertContains(second, 'Scanner 19')
+        self.assertNotContains(second, 'Printer jammed')
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_pages_vary_per_user_but_share_fragments(self):
+        self.client.get(self.ticket_url)
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        # Session, user and ticket; the task list comes from the shared fragment.
+        with self.assertNumQueries(3):
+            response = self.client.get(self.ticket_url)
+        self.assertContains(response, 'testuser1')
+        self.assertContains(response, 'Clear the tray')
+
+    def test_versions_are_bumped_on_commit(self):
+        etag = self.client.get(self.ticket_url)['ETag']
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.ticket.title = 'Printer on fire'
+            self.ticket.save()
+            # Until the write commits, other requests may still read the old row.
+            self.assertEqual(self.client.get(self.ticket_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        for callback in callbacks:
+            callback()
+        self.assertContains(self.client.get(self.ticket_url, HTTP_IF_NONE_MATCH=etag), 'Printer on fire')
+
+    def test_missing_objects_are_not_stamped(self):
+        pk = uuid.uuid4()
+        self.assertEqual(self.client.get(reverse('ticket-detail', args=[pk])).status_code, 404)
+        self.assertIsNone(get_version(TICKET, pk))
+        self.assertIsNone(cache.get('catalog:version:ticket:{0}'.format(pk)))
@@ -0,0 +1,164 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import Permission, User
+from django.core.management import call_command
+from django.db.models.functions import Now
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.changelog import changes_since, latest_seq, settle_window
+from catalog.models import ChangeLogEntry, Client, Status, Task, Ticket
+from catalog.scheduling import apply_task_changes, auto_schedule
+
+
+def last_seq():
+    return ChangeLogEntry.objects.latest('seq').seq
+
+
+def logged(since=0):
+    return [(entry.model, entry.object_pk, entry.action, entry.data)
+            for entry in ChangeLogEntry.objects.filter(seq__gt=since)]
+
+
+class ChangeLogTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = Status.objects.create(name='Open')
+        cls.client_record = Client.objects.create(company_name='Acme')
+        cls.ticket = Ticket.objects.create(title='Outage', summary=' ', status=cls.status,
+                                           client=cls.client_record, severity='h')
+        cls.employee = User.objects.create_user(username='tech1', password='1X<ISRUkw+tuK')
+
+    def setUp(self):
+        self.start = last_seq()
+
+    def test_saves_log_every_field_but_the_counters(self):
+        task = Task.objects.create(ticket=self.ticket, Work_Summary='Replace router',
+                                   scheduled_day=datetime.date(2030, 1, 7))
+        (model, pk, action, data), = logged(self.start)
+        self.assertEqual((model, pk, action), ('task', str(task.pk), ChangeLogEntry.CREATED))
+        self.assertEqual(data['scheduled_day'], '2030-01-07')
+        self.assertEqual(data['ticket_id'], str(self.ticket.pk))
+
+        since = last_seq()
+        self.ticket.title = 'Major outage'
+        self.ticket.save()
+        (model, pk, action, data), = logged(since)
+        self.assertEqual((model, pk, action), ('ticket', str(self.ticket.pk), ChangeLogEntry.UPDATED))
+        self.assertEqual(data['title'], 'Major outage')
+        self.assertNotIn('open_task_count', data)
+
+    def test_update_fields_are_logged_alone(self):
+        self.client_record.city = 'Austin'
+        self.client_record.save(update_fields=['city'])
+        self.assertEqual(logged(self.start),
+                         [('client', str(self.client_record.pk), ChangeLogEntry.UPDATED, {'city': 'Austin'})])
+
+    def test_deletes_log_the_rows_they_detach_first(self):
+        task = Task.objects.create(ticket=self.ticket, Work_Summary='Replace router')
+        ticket_pk = str(self.ticket.pk)
+        since = last_seq()
+        self.ticket.delete()
+        self.assertEqual(logged(since), [
+            ('task', str(task.pk), ChangeLogEntry.UPDATED, {'ticket_id': None}),
+            ('ticket', ticket_pk, ChangeLogEntry.DELETED, None),
+        ])
+
+    def test_bulk_writes_are_logged(self):
+        task = Task.objects.create(ticket=self.ticket, Work_Summary='Replace router')
+        since = last_seq()
+        apply_task_changes([{'id': task.pk, 'employee': self.employee.pk}])
+        self.assertEqual(logged(since), [('task', str(task.pk), ChangeLogEntry.UPDATED,
+                                          {'employee_id': self.employee.pk})])
+
+        since = last_seq()
+        auto_schedule(employees=User.objects.filter(pk=self.employee.pk), start=datetime.date(2030, 1, 7))
+        self.assertEqual(logged(since), [('task', str(task.pk), ChangeLogEntry.UPDATED,
+                                          {'employee_id': self.employee.pk, 'scheduled_day': '2030-01-07'})])
+
+    def test_imports_are_logged(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'tickets.jsonl')
+        with open(path, 'w') as handle:
+            handle.write(json.dumps({'title': 'Printer', 'work_summary': 'Clear jam'}))
+        self.addCleanup(os.remove, path)
+        call_command('import_tickets', path, stdout=StringIO())
+        task = Task.objects.get(Work_Summary='Clear jam')
+        entries = logged(self.start)
+        self.assertIn(('ticket', str(task.ticket_id), ChangeLogEntry.CREATED), [entry[:3] for entry in entries])
+        self.assertIn(('task', str(task.pk), ChangeLogEntry.CREATED), [entry[:3] for entry in entries])
+
+    def test_changes_since_resumes_after_a_seq(self):
+        Status.objects.create(name='Closed')
+        Status.objects.create(name='Waiting')
+        first, second = changes_since(self.start)
+        self.assertEqual((first['model'], first['action'], first['data']['name']), ('status', 'create', 'Closed'))
+        self.assertEqual(second['seq'], latest_seq())
+        self.assertEqual([change['seq'] for change in changes_since(first['seq'])], [second['seq']])
+        self.assertEqual(len(list(changes_since(self.start, limit=1))), 1)
+
+    def test_entries_are_stamped_by_the_database(self):
+        Status.objects.create(name='Closed')
+        entry = ChangeLogEntry.objects.get(seq=last_seq())
+        self.assertLess(abs(entry.changed_at - timezone.now()), datetime.timedelta(minutes=1))
+
+        # The settle window used on other databases compares with the database clock too.
+        ChangeLogEntry.objects.filter(seq__lte=self.start).update(changed_at=Now() - datetime.timedelta(minutes=5))
+        settled = dict(ChangeLogEntry.objects.annotate(settled=settle_window()).values_list('seq', 'settled'))
+        self.assertTrue(settled[self.start])
+        self.assertFalse(settled[entry.seq])
+
+
+@override_settings(CATALOG_CHANGES_SETTLE_SECONDS=0, CATALOG_CHANGES_TOKEN='secret')
+class ChangeFeedTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        cls.reader.user_permissions.add(Permission.objects.get(codename='view_changelogentry'))
+        User.objects.create_user(username='other', password='2HJ1vRV0Z&3iD')
+        Status.objects.create(name='Open')
+        Status.objects.create(name='Closed')
+
+    def read(self, response):
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_streams_changes_as_ndjson(self):
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        changes = self.read(self.client.get(reverse('changes')))
+        self.assertEqual([change['data']['name'] for change in changes if change['model'] == 'status'],
+                         ['Open', 'Closed'])
+        rest = self.read(self.client.get(reverse('changes'), {'since': changes[-2]['seq']}))
+        self.assertEqual(rest, changes[-1:])
+
+    def test_bearer_token_or_permission_required(self):
+        self.assertEqual(self.client.get(reverse('changes')).status_code, 403)
+        response = self.client.get(reverse('changes'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.client.login(username='other', password='2HJ1vRV0Z&3iD')
+        self.assertEqual(self.client.get(reverse('changes')).status_code, 403)
+
+    def test_bad_query_is_rejected(self):
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        self.assertEqual(self.client.get(reverse('changes'), {'since': '-1'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('changes'), {'limit': '1000000'}).status_code, 400)
+
+    def test_command_writes_changes_after_a_sequence_number(self):
+        out = StringIO()
+        call_command('changes_since', '--latest', stdout=out)
+        latest = int(out.getvalue())
+        out = StringIO()
+        call_command('changes_since', str(latest - 1), stdout=out)
+        change, = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual((change['seq'], change['data']['name']), (latest, 'Closed'))
@@ -0,0 +1,176 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+from io import StringIO
+
+from django.core.management import call_command
+
+from catalog.models import Ticket
+
+
+class ExplainHotQueriesCommandTest(TestCase):
+
+    def test_explains_each_query_and_rolls_back_seed(self):
+        out = StringIO()
+        call_command('explain_hot_queries', seed=40, repeat=1, stdout=out)
+        output = out.getvalue()
+        for label in ('all-borrowed', 'my-borrowed', 'authors', 'tickets'):
+            self.assertIn(label, output)
+        self.assertEqual(Ticket.objects.count(), 0)
+
+
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+
+from catalog.management.commands.benchmark_urls import BENCHMARK_USERNAME
+from catalog.models import Client, Status, Task
+
+
+class ImportTicketsCommandTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        User.objects.create_user(username='tech1', password='1X<ISRUkw+tuK')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as handle:
+            handle.write(content)
+        return path
+
+    def test_imports_csv_with_tasks_and_cached_lookups(self):
+        path = self.write('tickets.csv', (
+            'title,summary,client,status,severity,work_summary,scheduled_day,employee,task_checker\n'
+            'Printer,Jammed,Acme,New,High,Clear jam,2019-01-02,tech1,yes\n'
+            'Router,Down,Acme,New,l,,,,\n'
+            'Server,Slow,Initech,Resolved,,Tune,,,\n'))
+        call_command('import_tickets', path, batch_size=2, stdout=StringIO())
+
+        self.assertEqual(Ticket.objects.count(), 3)
+        self.assertEqual(Client.objects.count(), 2)
+        self.assertEqual(Status.objects.count(), 2)
+        printer = Ticket.objects.get(title='Printer')
+        self.assertEqual((printer.client.company_name, printer.status.name, printer.severity),
+                         ('Acme', 'New', 'h'))
+        self.assertEqual(Ticket.objects.get(title='Server').severity, 'm')
+        task = Task.objects.get(ticket=printer)
+        self.assertEqual(task.employee.username, 'tech1')
+        self.assertTrue(task.task_checker)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_imports_jsonl(self):
+        path = self.write('tickets.jsonl', '\n'.join(
+            json.dumps({'title': 'Ticket {0}'.format(i), 'client': 'Acme'}) for i in range(5)))
+        call_command('import_tickets', path, stdout=StringIO())
+        self.assertEqual(Ticket.objects.filter(client__company_name='Acme').count(), 5)
+
+    def test_resume_skips_committed_batches(self):
+        rows = ['{"title": "Ticket 1"}', '{"title": "Ticket 2"}', '{"title": ""}', '{"title": "Ticket 4"}']
+        path = self.write('tickets.jsonl', '\n'.join(rows))
+        with self.assertRaisesMessage(CommandError, 'Row 3'):
+            call_command('import_tickets', path, batch_size=2, stdout=StringIO())
+        self.assertEqual(Ticket.objects.count(), 2)
+
+        rows[2] = '{"title": "Ticket 3"}'
+        self.write('tickets.jsonl', '\n'.join(rows))
+        call_command('import_tickets', path, batch_size=2, resume=True, stdout=StringIO())
+        self.assertEqual(sorted(Ticket.objects.values_list('title', flat=True)),
+                         ['Ticket 1', 'Ticket 2', 'Ticket 3', 'Ticket 4'])
+
+    def test_unknown_employee_is_an_error(self):
+        path = self.write('tickets.csv', 'title,work_summary,employee\nPrinter,Fix,nobody\n')
+        with self.assertRaisesMessage(CommandError, 'unknown user "nobody"'):
+            call_command('import_tickets', path, stdout=StringIO())
+
+    def test_failed_batches_create_no_clients_or_statuses(self):
+        path = self.write('tickets.csv', (
+            'title,client,status,work_summary,employee\n'
+            'Printer,Acme,Waiting,,\n'
+            'Router,Initech,New,Fix,nobody\n'))
+        with self.assertRaisesMessage(CommandError, 'Row 2'):
+            call_command('import_tickets', path, stdout=StringIO())
+        self.assertFalse(Client.objects.exists())
+        self.assertFalse(Status.objects.filter(name='Waiting').exists())
+
+    def test_unreadable_jsonl_rows_are_errors(self):
+        for line, message in (('{"title": "Printer"', 'Row 2: invalid JSON'),
+                              ('["Printer"]', 'Row 2: expected a JSON object'),
+                              ('{"title": 5}', 'Row 2: ')):
+            path = self.write('tickets.jsonl', '{"title": "Router"}\n\n' + line + '\n')
+            with self.subTest(line=line), self.assertRaisesMessage(CommandError, message):
+                call_command('import_tickets', path, stdout=StringIO())
+
+
+from django.db.models import Count
+from django.test import override_settings
+
+
+class SeedBenchmarkCommandTest(TestCase):
+
+    def seed(self, **options):
+        options.setdefault('stdout', StringIO())
+        call_command('seed_benchmark', clients=20, tickets=200, tasks=600, employees=5, batch_size=64, **options)
+
+    def test_seeds_requested_volumes(self):
+        self.seed()
+        self.assertEqual(Client.objects.count(), 20)
+        self.assertEqual(Ticket.objects.count(), 200)
+        self.assertEqual(Task.objects.count(), 600)
+        self.assertEqual(User.objects.filter(username__startswith='bench-employee-').count(), 5)
+        # Every task points at a seeded ticket.
+        self.assertFalse(Task.objects.filter(ticket__isnull=True).exists())
+
+    def test_is_reproducible_and_skewed(self):
+        self.seed()
+        counts = sorted(Task.objects.values('employee').annotate(n=Count('id')).values_list('n', flat=True))
+        self.assertGreater(counts[-1], 2 * counts[0])
+        first = list(Ticket.objects.order_by('pk').values_list('title', 'severity')[:20])
+        Task.objects.all().delete()
+        Ticket.objects.all().delete()
+        Client.objects.all().delete()
+        self.seed()
+        self.assertEqual(list(Ticket.objects.order_by('pk').values_list('title', 'severity')[:20]), first)
+
+    def test_refuses_to_seed_twice(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class BenchmarkUrlsCommandTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        call_command('seed_benchmark', clients=5, tickets=20, tasks=40, employees=2, stdout=StringIO())
+
+    def test_measures_every_catalog_url(self):
+        output = os.path.join(self.directory, 'baseline.json')
+        call_command('benchmark_urls', requests=2, output=output, stdout=StringIO())
+        with open(output) as handle:
+            results = json.load(handle)
+        for name in ('index', 'tickets', 'ticket-detail', 'authors', 'client-detail', 'all-borrowed',
+                     'renew-ticket-librarian', 'export-tickets', 'author_update', 'ticket_delete'):
+            self.assertIn(name, results)
+        self.assertEqual(results['tickets']['status'], [200])
+        self.assertGreater(results['tickets']['queries'], 0)
+        # The superuser the pages were fetched as is gone.
+        self.assertFalse(User.objects.filter(username=BENCHMARK_USERNAME).exists())
+
+    def test_fails_on_query_regression(self):
+        baseline = os.path.join(self.directory, 'baseline.json')
+        with open(baseline, 'w') as handle:
+            json.dump({'tickets': {'queries': 0, 'p99_ms': 1e9}}, handle)
+        with self.assertRaisesMessage(CommandError, 'tickets:'):
+            call_command('benchmark_urls', requests=1, baseline=baseline, skip=['export-tickets', 'export-tasks'],
+                         stdout=StringIO())
@@ -0,0 +1,122 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.counters import reconcile
+from catalog.models import Client, EmployeeWorkload, Task, Ticket
+
+
+class CounterTest(TestCase):
+
+    def setUp(self):
+        self.today = datetime.date.today()
+        self.alice = User.objects.create_user(username='alice', password='1X<ISRUkw+tuK')
+        self.bob = User.objects.create_user(username='bob', password='2HJ1vRV0Z&3iD')
+        self.acme = Client.objects.create(company_name='Acme')
+        self.initech = Client.objects.create(company_name='Initech')
+        self.ticket = Ticket.objects.create(title='Outage', summary=' ', client=self.acme, status=None)
+        self.other = Ticket.objects.create(title='Printer', summary=' ', client=self.acme, status=None)
+
+    def counts(self):
+        """Returns the stored counters as a comparable tuple."""
+        workloads = dict(EmployeeWorkload.objects.values_list('employee__username', 'open_tasks'))
+        return (dict(Ticket.objects.values_list('title', 'open_task_count')),
+                dict(Client.objects.values_list('company_name', 'ticket_count')),
+                workloads)
+
+    def add_task(self, **kwargs):
+        kwargs.setdefault('ticket', self.ticket)
+        kwargs.setdefault('employee', self.alice)
+        kwargs.setdefault('scheduled_day', self.today)
+        return Task.objects.create(Work_Summary=' ', **kwargs)
+
+    def test_ticket_counts_follow_client(self):
+        self.assertEqual(self.counts()[1], {'Acme': 2, 'Initech': 0})
+        self.ticket.client = self.initech
+        self.ticket.save()
+        self.assertEqual(self.counts()[1], {'Acme': 1, 'Initech': 1})
+        self.ticket.delete()
+        self.assertEqual(self.counts()[1], {'Acme': 1, 'Initech': 0})
+
+    def test_task_counts_follow_saves_and_deletes(self):
+        task = self.add_task()
+        self.add_task(scheduled_day=self.today - datetime.timedelta(days=3))
+        self.assertEqual(self.counts()[0], {'Outage': 2, 'Printer': 0})
+        self.assertEqual(self.counts()[2], {'alice': 2})
+
+        task.ticket = self.other
+        task.employee = self.bob
+        task.scheduled_day = self.today - datetime.timedelta(days=1)
+        task.save()
+        self.assertEqual(self.counts()[0], {'Outage': 1, 'Printer': 1})
+        self.assertEqual(self.counts()[2], {'alice': 1, 'bob': 1})
+
+        task.task_checker = True
+        task.save()
+        self.assertEqual(self.counts()[0], {'Outage': 1, 'Printer': 0})
+        self.assertEqual(self.counts()[2], {'alice': 1, 'bob': 0})
+
+        Task.objects.filter(employee=self.alice).get().delete()
+        self.assertEqual(self.counts()[0], {'Outage': 0, 'Printer': 0})
+        self.assertEqual(self.counts()[2], {'alice': 0, 'bob': 0})
+
+    def test_saving_stale_instance_keeps_counter(self):
+        stale = Ticket.objects.get(pk=self.ticket.pk)
+        self.add_task()
+        stale.title = 'Outage (renamed)'
+        stale.save()
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).open_task_count, 1)
+
+    def test_saving_deleted_instance_inserts_it_again(self):
+        self.add_task()
+        Ticket.objects.filter(pk=self.ticket.pk).delete()
+        self.ticket.title = 'Outage (restored)'
+        self.ticket.save()
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).title, 'Outage (restored)')
+
+    def test_explicit_update_fields_may_write_counter(self):
+        self.ticket.open_task_count = 5
+        self.ticket.save(update_fields=['open_task_count'])
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).open_task_count, 5)
+
+    def test_reconcile_fixes_drift(self):
+        self.add_task()
+        self.add_task(employee=self.bob, scheduled_day=self.today + datetime.timedelta(days=1))
+        expected = self.counts()
+        Ticket.objects.update(open_task_count=7)
+        Client.objects.update(ticket_count=0)
+        EmployeeWorkload.objects.filter(employee=self.alice).delete()
+        EmployeeWorkload.objects.filter(employee=self.bob).update(open_tasks=9)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('Corrected 2 ticket, 1 client and 2 employee counters.', out.getvalue())
+        self.assertEqual(self.counts(), expected)
+        self.assertEqual(reconcile(), {'tickets': 0, 'clients': 0, 'employees': 0})
+
+    def test_my_tasks_page_reads_open_counter_and_counts_overdue(self):
+        for day in range(12):
+            self.add_task(scheduled_day=self.today + datetime.timedelta(days=day - 2))
+        self.client.login(username='alice', password='1X<ISRUkw+tuK')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('my-borrowed'))
+        self.assertContains(response, '12 open, 2 overdue.')
+        self.assertContains(response, '12 in total.')
+        # Only the overdue tasks are counted; the open total is the stored counter.
+        counts = [query['sql'] for query in queries if 'COUNT(' in query['sql']]
+        self.assertEqual(len(counts), 1)
+        self.assertIn('scheduled_day', counts[0])
+
+    def test_overdue_count_follows_the_date_without_saves(self):
+        self.add_task(scheduled_day=self.today + datetime.timedelta(days=1))
+        self.assertFalse(Task.objects.filter(employee=self.alice).overdue().exists())
+        overdue = Task.objects.filter(employee=self.alice).overdue(today=self.today + datetime.timedelta(days=2))
+        self.assertEqual(overdue.count(), 1)
@@ -0,0 +1,143 @@
+from django.test import TestCase, override_settings
+
+# Create your tests here.
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.dashboard import get_dashboard_counts, invalidate_dashboard_counts
+from catalog.models import Client, Task, Ticket, VisitCount
+from catalog.visits import visit_counter
+
+
+class DashboardCountsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        test_client = Client.objects.create(first_name='John', last_name='Smith')
+        test_ticket = Ticket.objects.create(title='Ticket Title', summary='My ticket summary',
+                                            client=test_client, status=None)
+        Task.objects.create(ticket=test_ticket, Work_Summary='Open task')
+        Task.objects.create(ticket=test_ticket, Work_Summary='Done task', task_checker=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_computed_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = get_dashboard_counts()
+        self.assertEqual(counts, {'num_tickets': 1, 'num_instances': 2,
+                                  'num_tasks_done': 1, 'num_authors': 1, 'num_overdue': None,
+                                  'overdue_day': None})
+
+    def test_counts_served_from_cache(self):
+        get_dashboard_counts()
+        with self.assertNumQueries(0):
+            get_dashboard_counts()
+
+    def test_single_writes_keep_cache_until_timeout(self):
+        get_dashboard_counts()
+        Client.objects.create(first_name='Big', last_name='Bob')
+        Task.objects.filter(task_checker=True).get().delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_dashboard_counts()['num_authors'], 1)
+
+    def test_invalidate_recomputes(self):
+        get_dashboard_counts()
+        Task.objects.filter(task_checker=True).get().delete()
+        invalidate_dashboard_counts()
+        self.assertEqual(get_dashboard_counts()['num_tasks_done'], 0)
+
+    def test_index_counts_visits(self):
+        visit_counter.reset()
+        User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['total_visits'], 0)
+        self.assertNotIn('num_visits', response.context)
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['num_visits'], 0)
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['num_visits'], 1)
+        self.assertEqual(response.context['total_visits'], 2)
+        self.assertContains(response, 'You have visited this page 1 times.')
+
+    @override_settings(SESSION_ENGINE='locallibrary.sessions')
+    def test_anonymous_visits_are_counted_in_a_cookie_session(self):
+        visit_counter.reset()
+        self.client.get(reverse('index'))
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['num_visits'], 1)
+        self.assertEqual(response.context['total_visits'], 1)
+        self.assertEqual(len(captured), 0)
+
+    def test_index_makes_no_writes(self):
+        visit_counter.reset()
+        User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        self.client.get(reverse('index'))
+        with CaptureQueriesContext(connection) as captured:
+            for _ in range(3):
+                self.client.get(reverse('index'))
+        # The session and the user, nothing else: the counts are already in memory.
+        self.assertEqual(len(captured), 6)
+        self.assertTrue(all(query['sql'].startswith('SELECT') for query in captured))
+        self.assertFalse(VisitCount.objects.exists())
+
+    @override_settings(CATALOG_DASHBOARD_TRACK_VISITS=False)
+    def test_index_without_visit_tracking_hits_no_database(self):
+        get_dashboard_counts()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('num_visits', response.context)
+
+
+class VisitCounterTest(TestCase):
+
+    def setUp(self):
+        visit_counter.reset()
+        self.addCleanup(visit_counter.reset)
+
+    def test_flush_saves_pending_visits(self):
+        self.assertEqual(visit_counter.add('index', 'index:user:1'), [0, 0])
+        self.assertEqual(visit_counter.add('index'), [1])
+        with self.assertNumQueries(0):
+            self.assertEqual(visit_counter.add('index'), [2])
+        visit_counter.flush()
+        self.assertEqual(dict(VisitCount.objects.values_list('name', 'visits')), {'index': 3, 'index:user:1': 1})
+
+        # Counts flushed by another process are picked up at the next flush.
+        VisitCount.objects.filter(name='index').update(visits=10)
+        self.assertEqual(visit_counter.add('index'), [3])
+        visit_counter.flush()
+        self.assertEqual(visit_counter.add('index'), [11])
+        self.assertEqual(VisitCount.objects.get(name='index').visits, 11)
+
+    def test_names_not_visited_since_the_last_flush_are_dropped(self):
+        visit_counter.add('index', 'index:user:1')
+        visit_counter.flush()
+        visit_counter.add('index')
+        visit_counter.flush()
+        # Read from the database again on the next visit.
+        with self.assertNumQueries(1):
+            self.assertEqual(visit_counter.add('index', 'index:user:1'), [2, 1])
+        with self.assertNumQueries(0):
+            self.assertEqual(visit_counter.add('index:user:1'), [2])
+
+    def test_counts_resume_from_the_database(self):
+        VisitCount.objects.create(name='index', visits=41)
+        self.assertEqual(visit_counter.add('index'), [41])
+
+    @override_settings(CATALOG_VISITS_FLUSH_INTERVAL=0)
+    def test_flushed_after_the_response_once_due(self):
+        self.client.get(reverse('index'))
+        self.assertEqual(VisitCount.objects.get(name='index').visits, 1)
+
+    def test_not_flushed_before_the_interval(self):
+        self.client.get(reverse('index'))
+        self.assertFalse(VisitCount.objects.exists())
@@ -0,0 +1,134 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import os
+import sqlite3
+import tempfile
+import threading
+
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from locallibrary import dbpool
+from locallibrary.dbpool.pool import ConnectionPool
+from locallibrary.dbpool.sqlite3.base import DatabaseWrapper
+
+
+class ConnectionPoolTest(SimpleTestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def connect(self):
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def test_reuses_released_connection(self):
+        pool = ConnectionPool(size=2, max_overflow=0)
+        first = pool.checkout(self.connect)
+        pool.release(first)
+        self.assertIs(pool.checkout(self.connect), first)
+        stats = pool.stats()
+        self.assertEqual(stats['connections_opened'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['in_use'], 1)
+        self.assertEqual(stats['saturation'], 0.5)
+
+    def test_overflow_connections_are_closed_on_release(self):
+        pool = ConnectionPool(size=1, max_overflow=1)
+        first, second = pool.checkout(self.connect), pool.checkout(self.connect)
+        pool.release(first)
+        pool.release(second)
+        self.assertEqual(pool.stats()['idle'], 1)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            second.execute('SELECT 1')
+
+    def test_exhausted_pool_times_out(self):
+        pool = ConnectionPool(size=1, max_overflow=0, timeout=0.05, error_class=OperationalError)
+        pool.checkout(self.connect)
+        with self.assertRaises(OperationalError):
+            pool.checkout(self.connect)
+        stats = pool.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['saturation'], 1.0)
+
+    def test_waiter_gets_released_connection(self):
+        pool = ConnectionPool(size=1, max_overflow=0, timeout=5)
+        held = pool.checkout(self.connect)
+        timer = threading.Timer(0.05, pool.release, [held])
+        timer.start()
+        self.assertIs(pool.checkout(self.connect), held)
+        timer.join()
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['wait_seconds_max'], 0)
+
+    def test_broken_idle_connection_is_replaced(self):
+        pool = ConnectionPool(size=1, max_overflow=0)
+        first = pool.checkout(self.connect)
+        pool.release(first)
+        first.close()
+        second = pool.checkout(self.connect)
+        self.assertIsNot(second, first)
+        self.assertEqual(pool.stats()['health_check_failures'], 1)
+
+    def test_idle_connection_is_recycled(self):
+        pool = ConnectionPool(size=1, max_overflow=0, recycle=0)
+        first = pool.checkout(self.connect)
+        pool.release(first)
+        self.assertIsNot(pool.checkout(self.connect), first)
+        self.assertEqual(pool.stats()['recycled'], 1)
+
+    def test_release_rolls_back_open_transaction(self):
+        pool = ConnectionPool(size=1, max_overflow=0)
+        connection = pool.checkout(self.connect)
+        connection.execute('CREATE TABLE t (x integer)')
+        connection.commit()
+        connection.execute('INSERT INTO t VALUES (1)')
+        pool.release(connection)
+        connection = pool.checkout(self.connect)
+        self.assertEqual(connection.execute('SELECT COUNT(*) FROM t').fetchone(), (0,))
+
+
+class PooledBackendTest(SimpleTestCase):
+
+    def test_wrapper_returns_connection_to_pool(self):
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        settings_dict = {
+            'ENGINE': 'locallibrary.dbpool.sqlite3', 'NAME': path, 'ATOMIC_REQUESTS': False,
+            'AUTOCOMMIT': True, 'CONN_MAX_AGE': 0, 'OPTIONS': {}, 'TIME_ZONE': None,
+            'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '', 'TEST': {},
+            'POOL': {'SIZE': 1, 'MAX_OVERFLOW': 0},
+        }
+        wrapper = DatabaseWrapper(settings_dict, alias='pooltest')
+        self.addCleanup(dbpool._pools.pop, 'pooltest', None)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+        self.assertIsNone(wrapper.connection)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertIs(wrapper.connection, raw)
+        wrapper.close()
+        stats = dbpool.pool_stats()['pooltest']
+        self.assertEqual(stats['connections_opened'], 1)
+        self.assertEqual(stats['in_use'], 0)
+        wrapper.pool.close_all()
+
+
+class PoolStatsViewTest(TestCase):
+
+    def test_staff_only(self):
+        User.objects.create_user(username='staff', password='1X<ISRUkw+tuK', is_staff=True)
+        response = self.client.get(reverse('dbpool-stats'))
+        self.assertEqual(response.status_code, 302)
+        self.client.login(username='staff', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('dbpool-stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
@@ -0,0 +1,85 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import csv
+import datetime
+import json
+
+from django.contrib.auth.models import Permission, User
+from django.urls import reverse
+
+from catalog.models import Client, Status, Task, Ticket
+
+
+class ExportViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        cls.user.user_permissions.add(Permission.objects.get(name='Set ticket as returned'))
+        User.objects.create_user(username='testuser2', password='2HJ1vRV0Z&3iD')
+        cls.acme = Client.objects.create(company_name='Acme')
+        other = Client.objects.create(company_name='Initech')
+        new = Status.objects.create(name='New')
+        resolved = Status.objects.create(name='Resolved')
+        cls.today = datetime.date.today()
+        for number in range(6):
+            ticket = Ticket.objects.create(title='Ticket {0}'.format(number), summary=' ',
+                                           client=cls.acme if number % 2 else other,
+                                           status=new if number < 3 else resolved,
+                                           severity='h' if number % 3 == 0 else 'l')
+            for day in (0, 10):
+                Task.objects.create(ticket=ticket, Work_Summary='Task, "quoted"', employee=cls.user,
+                                    scheduled_day=cls.today + datetime.timedelta(days=day + number))
+
+    def export(self, name, fmt, **filters):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse(name, args=[fmt]), filters)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_requires_permission(self):
+        self.client.login(username='testuser2', password='2HJ1vRV0Z&3iD')
+        response = self.client.get(reverse('export-tickets', args=['csv']))
+        self.assertEqual(response.status_code, 302)
+
+    def test_ticket_csv(self):
+        rows = list(csv.reader(self.export('export-tickets', 'csv').splitlines()))
+        self.assertEqual(rows[0][:2], ['ticket_id', 'title'])
+        self.assertEqual(len(rows), 7)
+
+    def test_ticket_filters(self):
+        rows = json.loads(self.export('export-tickets', 'json', client=self.acme.pk, status='Resolved'))
+        self.assertEqual(sorted(row['title'] for row in rows), ['Ticket 3', 'Ticket 5'])
+        rows = json.loads(self.export('export-tickets', 'json', severity='h'))
+        self.assertEqual(sorted(row['title'] for row in rows), ['Ticket 0', 'Ticket 3'])
+
+    def test_ticket_scheduled_range_lists_each_ticket_once(self):
+        end = self.today + datetime.timedelta(days=10)
+        rows = json.loads(self.export('export-tickets', 'json', scheduled_from=self.today, scheduled_to=end))
+        self.assertEqual(len(rows), 6)
+        rows = json.loads(self.export('export-tickets', 'json',
+                                      scheduled_from=self.today + datetime.timedelta(days=15)))
+        self.assertEqual([row['title'] for row in rows], ['Ticket 5'])
+
+    def test_task_csv_quotes_values(self):
+        rows = list(csv.reader(self.export('export-tasks', 'csv', client=self.acme.pk).splitlines()))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[1][rows[0].index('Work_Summary')], 'Task, "quoted"')
+
+    def test_task_json_range(self):
+        rows = json.loads(self.export('export-tasks', 'json', scheduled_to=self.today + datetime.timedelta(days=1)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['employee__username'], 'testuser1')
+
+    def test_invalid_filter_is_bad_request(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('export-tasks', args=['csv']), {'severity': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_format_is_404(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('export-tasks', args=['xml']))
+        self.assertEqual(response.status_code, 404)
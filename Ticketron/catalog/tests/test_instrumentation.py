@@ -0,0 +1,97 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import resolve, reverse
+
+from catalog.instrumentation import RequestMetricsMiddleware, registry
+from catalog.models import Client, Ticket
+
+
+class RequestMetricsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username='staff', password='1X<ISRUkw+tuK', is_staff=True)
+        User.objects.create_user(username='testuser', password='2HJ1vRV0Z&3iD')
+        client = Client.objects.create(company_name='Acme')
+        for number in range(3):
+            Ticket.objects.create(title='Ticket {0}'.format(number), summary=' ', client=client, status=None)
+
+    def setUp(self):
+        registry.reset()
+
+    def test_records_per_url_name(self):
+        self.client.get(reverse('tickets'))
+        self.client.get(reverse('tickets'))
+        self.client.get(reverse('authors'))
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot['tickets'].requests, 2)
+        self.assertEqual(snapshot['authors'].requests, 1)
+        self.assertGreater(snapshot['tickets'].queries, 0)
+        self.assertGreater(snapshot['tickets'].template_seconds, 0)
+        self.assertGreaterEqual(snapshot['tickets'].view_seconds, snapshot['tickets'].template_seconds)
+
+    # The committed staticfiles manifest predates the admin's current assets.
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_plain_render_views_and_namespaces_are_kept_apart(self):
+        self.client.login(username='staff', password='1X<ISRUkw+tuK')
+        self.client.get(reverse('index'))
+        self.client.get(reverse('admin:index'))
+        snapshot = registry.snapshot()
+        self.assertEqual((snapshot['index'].requests, snapshot['admin:index'].requests), (1, 1))
+        # index uses render(), which is timed by the template backend.
+        self.assertGreater(snapshot['index'].template_seconds, 0)
+
+    def test_counts_queries_on_every_database_alias(self):
+        connections.settings['replica'] = dict(connections.settings['default'], NAME=':memory:')
+        self.addCleanup(connections.settings.pop, 'replica')
+        self.addCleanup(connections['replica'].close)
+
+        def view(request):
+            request.resolver_match = resolve(reverse('tickets'))
+            with connections['replica'].cursor() as cursor:
+                cursor.execute('SELECT 1')
+            Ticket.objects.count()
+            return HttpResponse()
+
+        RequestMetricsMiddleware(view)(RequestFactory().get(reverse('tickets')))
+        self.assertEqual(registry.snapshot()['tickets'].queries, 2)
+
+    def test_unresolved_requests_are_not_recorded(self):
+        self.client.get('/no-such-page/')
+        self.assertEqual(registry.snapshot(), {})
+
+    @override_settings(CATALOG_SLOW_REQUEST_QUERIES=0)
+    def test_logs_requests_over_query_budget(self):
+        with self.assertLogs('catalog.performance', 'WARNING') as logs:
+            self.client.get(reverse('tickets'))
+        self.assertIn('(tickets)', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+        self.assertEqual(registry.snapshot()['tickets'].slow_requests, 1)
+
+    def test_prometheus_endpoint(self):
+        self.client.get(reverse('tickets'))
+        self.client.login(username='staff', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('catalog_requests_total{view="tickets"} 1', body)
+        self.assertIn('catalog_request_duration_seconds_bucket{view="tickets",le="+Inf"} 1', body)
+        self.assertIn('# TYPE catalog_request_duration_seconds histogram', body)
+
+    def test_endpoint_requires_staff_or_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.login(username='testuser', password='2HJ1vRV0Z&3iD')
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.logout()
+        with override_settings(CATALOG_METRICS_TOKEN='s3cret'):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(response.status_code, 403)
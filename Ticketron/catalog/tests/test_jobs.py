@@ -0,0 +1,183 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import datetime
+import smtplib
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from catalog import jobs
+from catalog.models import Job, Task, Ticket
+from catalog.notifications import ASSIGNMENT_JOB, OVERDUE_JOB, mail_pool
+
+calls = []
+
+
+@jobs.register('tests.record')
+def record(payloads):
+    calls.append(sorted(payload['n'] for payload in payloads))
+
+
+@jobs.register('tests.fail')
+def fail(payloads):
+    raise RuntimeError('boom')
+
+
+@jobs.register('tests.partial')
+def partial(payloads):
+    try:
+        raise RuntimeError('connection lost')
+    except RuntimeError as error:
+        raise jobs.PartialBatchFailure([0]) from error
+
+
+class RefusingBobBackend(locmem.EmailBackend):
+    """Sends like the test backend, except to bob."""
+
+    def send_messages(self, messages):
+        if any('bob@example.com' in message.to for message in messages):
+            raise smtplib.SMTPRecipientsRefused({'bob@example.com': (550, b'No such user')})
+        return super().send_messages(messages)
+
+
+class JobQueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_due_jobs_in_batches(self):
+        for n in range(5):
+            jobs.enqueue('tests.record', {'n': n})
+        jobs.enqueue('tests.record', {'n': 99}, delay=3600)
+        self.assertEqual(jobs.run_pending(batch_size=2), 2)
+        self.assertEqual(jobs.run_pending(batch_size=2), 2)
+        self.assertEqual(jobs.run_pending(batch_size=2), 1)
+        self.assertEqual(calls, [[0, 1], [2, 3], [4]])
+        self.assertEqual(jobs.run_pending(), 0)
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 5)
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+    def test_failures_back_off_then_fail(self):
+        job = jobs.enqueue('tests.fail', max_attempts=2)
+        started = timezone.now()
+        jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreater(job.run_at, started + datetime.timedelta(seconds=20))
+
+        # Not due yet; then due again after the backoff.
+        self.assertEqual(jobs.run_pending(), 0)
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('catalog.jobs', 'ERROR'):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_a_failing_payload_fails_only_its_job(self):
+        for n in range(3):
+            jobs.enqueue('tests.record', {'n': n} if n != 1 else {})
+        jobs.run_pending()
+        # The batch failed, so each job was run on its own.
+        self.assertEqual(calls, [[0], [2]])
+        self.assertEqual(sorted(Job.objects.filter(status=Job.DONE).values_list('payload__n', flat=True)), [0, 2])
+        self.assertIn('KeyError', Job.objects.get(status=Job.QUEUED).last_error)
+
+    def test_partial_failures_finish_the_reported_jobs(self):
+        first = jobs.enqueue('tests.partial')
+        second = jobs.enqueue('tests.partial')
+        jobs.run_pending()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.status, second.status), (Job.DONE, Job.QUEUED))
+        self.assertIn('connection lost', second.last_error)
+
+    def test_old_done_jobs_are_pruned(self):
+        old = jobs.enqueue('tests.record', {'n': 1})
+        jobs.enqueue('tests.record', {'n': 2})
+        queued = jobs.enqueue('tests.record', {'n': 3}, delay=3600)
+        Job.objects.exclude(pk=queued.pk).update(status=Job.DONE)
+        Job.objects.filter(pk__in=[old.pk, queued.pk]).update(run_at=timezone.now() - datetime.timedelta(days=30))
+        self.assertEqual(jobs.prune_done(), 1)
+        self.assertFalse(Job.objects.filter(pk=old.pk).exists())
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = jobs.enqueue('tests.record', {'n': 1})
+        Job.objects.update(status=Job.RUNNING, locked_by='dead-worker',
+                           locked_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+
+    def test_claimed_jobs_are_not_claimed_twice(self):
+        jobs.enqueue('tests.record', {'n': 1})
+        self.assertEqual(len(jobs.claim('worker-1', 10)), 1)
+        self.assertEqual(jobs.claim('worker-2', 10), [])
+
+    def test_unknown_job_name(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue('tests.nope')
+
+
+class NotificationTest(TransactionTestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='x')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='y')
+        self.ticket = Ticket.objects.create(title='Outage', summary=' ', status=None)
+
+    def test_assignments_are_batched_per_employee(self):
+        today = datetime.date.today()
+        for number in range(3):
+            Task.objects.create(ticket=self.ticket, Work_Summary='Fix {0}'.format(number), employee=self.alice,
+                                scheduled_day=today)
+        task = Task.objects.create(ticket=self.ticket, Work_Summary='Check', employee=self.bob)
+        task.Work_Summary = 'Check again'
+        task.save()
+        self.assertEqual(Job.objects.filter(name=ASSIGNMENT_JOB).count(), 4)
+        self.assertEqual(mail.outbox, [])
+
+        out = StringIO()
+        call_command('run_jobs', once=True, concurrency=2, stdout=out)
+        self.assertIn('ran 4 jobs', out.getvalue())
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['alice@example.com', 'bob@example.com'])
+        alice_mail = [message for message in mail.outbox if message.to == ['alice@example.com']][0]
+        self.assertIn('3 tasks have been assigned', alice_mail.body)
+
+    @override_settings(EMAIL_BACKEND='catalog.tests.test_jobs.RefusingBobBackend', CATALOG_EMAIL_BATCH_SIZE=1)
+    def test_sent_emails_are_not_sent_again(self):
+        mail_pool.close_all()
+        self.addCleanup(mail_pool.close_all)
+        Task.objects.create(ticket=self.ticket, Work_Summary='Fix', employee=self.alice)
+        Task.objects.create(ticket=self.ticket, Work_Summary='Check', employee=self.bob)
+        jobs.run_pending()
+        self.assertEqual([message.to for message in mail.outbox], [['alice@example.com']])
+        failed = Job.objects.get(status=Job.QUEUED)
+        self.assertEqual(failed.payload['task_ids'], list(Task.objects.filter(employee=self.bob)
+                                                          .values_list('pk', flat=True)))
+        self.assertIn('SMTPRecipientsRefused', failed.last_error)
+
+        Job.objects.update(run_at=timezone.now())
+        jobs.run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_overdue_reminders(self):
+        Task.objects.create(ticket=self.ticket, Work_Summary='Late', employee=self.alice,
+                            scheduled_day=datetime.date.today() - datetime.timedelta(days=2))
+        Task.objects.create(ticket=self.ticket, Work_Summary='On time', employee=self.bob,
+                            scheduled_day=datetime.date.today())
+        Job.objects.all().delete()
+        call_command('snapshot_overdue', notify=True, stdout=StringIO())
+        call_command('snapshot_overdue', notify=True, stdout=StringIO())
+        self.assertEqual(Job.objects.filter(name=OVERDUE_JOB).count(), 2)
+        call_command('run_jobs', once=True, stdout=StringIO())
+        self.assertEqual([message.to for message in mail.outbox], [['alice@example.com']])
+        self.assertIn('1 overdue task:', mail.outbox[0].body)
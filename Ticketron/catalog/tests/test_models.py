@@ -47,3 +47,45 @@ class ClientModelTest(TestCase):
         client = Client.objects.get(id=1)
         # This will also fail if the urlconf is not defined.
         self.assertEquals(client.get_absolute_url(), '/catalog/client/1')
+
+
+from catalog.models import Status, Ticket
+
+
+class StatusCacheTest(TestCase):
+
+    def setUp(self):
+        Status.objects.clear_cache()
+        self.new = Status.objects.create(name='New')
+        self.resolved = Status.objects.create(name='Resolved')
+
+    def test_lookups_served_from_memory(self):
+        Status.objects.get_cached(self.new.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(Status.objects.get_cached(self.resolved.pk).name, 'Resolved')
+            self.assertEqual(Status.objects.get_by_name('resolved'), self.resolved)
+            self.assertIsNone(Status.objects.get_by_name('Unknown'))
+
+    def test_status_change_invalidates_cache(self):
+        Status.objects.get_cached(self.new.pk)
+        self.resolved.name = 'Closed'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.resolved.save()
+        # Not before the change commits, or other processes could reload the old row.
+        self.assertEqual(Status.objects.get_cached(self.resolved.pk).name, 'Resolved')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(Status.objects.get_cached(self.resolved.pk).name, 'Closed')
+        self.assertIsNone(Status.objects.get_by_name('Resolved'))
+
+    def test_ticket_defaults_to_new_status(self):
+        ticket = Ticket.objects.create(title='Ticket Title', summary='My ticket summary')
+        self.assertEqual(ticket.status, self.new)
+
+    def test_display_status_does_not_query(self):
+        tickets = [Ticket.objects.create(title='Ticket {0}'.format(i), summary=' ', status=self.resolved)
+                   for i in range(3)]
+        tickets = list(Ticket.objects.filter(pk__in=[ticket.pk for ticket in tickets]))
+        Status.objects.get_cached(self.new.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual([ticket.display_status() for ticket in tickets], ['Resolved'] * 3)
@@ -0,0 +1,78 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import datetime
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import dateformat
+
+from catalog.dashboard import get_dashboard_counts
+from catalog.models import OverdueSnapshot, Task, Ticket
+
+
+class OverdueTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = datetime.date.today()
+        cls.alice = User.objects.create_user(username='alice', password='1X<ISRUkw+tuK')
+        cls.alice.user_permissions.add(Permission.objects.get(name='Set ticket as returned'))
+        cls.bob = User.objects.create_user(username='bob', password='2HJ1vRV0Z&3iD')
+        ticket = Ticket.objects.create(title='Outage', summary=' ', status=None)
+        for employee, days_ago, done in ((cls.alice, 3, False), (cls.alice, 1, False), (cls.alice, 5, True),
+                                         (cls.alice, 0, False), (cls.bob, 2, False), (None, 4, False)):
+            Task.objects.create(ticket=ticket, Work_Summary=' ', employee=employee, task_checker=done,
+                                scheduled_day=cls.today - datetime.timedelta(days=days_ago))
+        Task.objects.create(ticket=ticket, Work_Summary='Unscheduled', employee=cls.bob)
+
+    def test_overdue_queryset(self):
+        self.assertEqual(Task.objects.overdue().count(), 4)
+        self.assertEqual(Task.objects.overdue(self.today - datetime.timedelta(days=2)).count(), 2)
+
+    def test_with_overdue_annotation_matches_property(self):
+        tasks = Task.objects.filter(task_checker=False).with_overdue()
+        self.assertEqual(sum(task.is_overdue for task in tasks), 4)
+        for task in tasks:
+            self.assertEqual(task.is_overdue, Task.objects.get(pk=task.pk).is_overdue)
+
+    def test_overdue_by_employee_view(self):
+        OverdueSnapshot.objects.create(day=self.today - datetime.timedelta(days=1), employee=self.alice,
+                                       overdue_tasks=7)
+        self.client.login(username='alice', password='1X<ISRUkw+tuK')
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('overdue-by-employee'))
+        self.assertEqual(response.status_code, 200)
+        rows = response.context['rows']
+        self.assertEqual([(row['employee__username'], row['overdue_tasks']) for row in rows],
+                         [('alice', 2), (None, 1), ('bob', 1)])
+        self.assertEqual(rows[0]['snapshot'], 7)
+        self.assertEqual(rows[0]['oldest'], self.today - datetime.timedelta(days=3))
+        self.assertContains(response, 'Unassigned')
+
+    def test_overdue_view_requires_permission(self):
+        self.client.login(username='bob', password='2HJ1vRV0Z&3iD')
+        self.assertEqual(self.client.get(reverse('overdue-by-employee')).status_code, 302)
+
+    def test_snapshot_command_feeds_dashboard(self):
+        out = StringIO()
+        call_command('snapshot_overdue', stdout=out)
+        self.assertIn('4 overdue tasks', out.getvalue())
+        call_command('snapshot_overdue', stdout=StringIO())
+        self.assertEqual(dict(OverdueSnapshot.objects.values_list('employee__username', 'overdue_tasks')),
+                         {'alice': 2, 'bob': 1, None: 1})
+        earlier = (self.today - datetime.timedelta(days=2)).isoformat()
+        call_command('snapshot_overdue', day=datetime.date.fromisoformat(earlier), stdout=StringIO())
+        self.assertEqual(get_dashboard_counts()['num_overdue'], 4)
+        self.assertEqual(get_dashboard_counts()['overdue_day'], self.today)
+
+    def test_dashboard_shows_the_day_of_the_snapshot(self):
+        yesterday = self.today - datetime.timedelta(days=1)
+        call_command('snapshot_overdue', day=yesterday, stdout=StringIO())
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '<strong>Overdue tasks ({0}):</strong> 3'.format(
+            dateformat.format(yesterday, settings.DATE_FORMAT)), html=True)
@@ -0,0 +1,115 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import datetime
+
+from django.contrib.auth.models import Permission, User
+from django.urls import reverse
+
+from catalog.models import Client, Task, Ticket
+
+
+class ClientCursorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Create 13 clients, two of them sharing a last name.
+        for client_id in range(12):
+            Client.objects.create(first_name='Christian {0}'.format(client_id),
+                                  last_name='Surname {0:02d}'.format(client_id))
+        Client.objects.create(first_name='Another', last_name='Surname 05')
+
+    def walk(self, url):
+        """Follows next cursors from the first page, returning the pages seen."""
+        pages = []
+        response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append(response)
+            page = response.context['page_obj']
+            if not page.has_next():
+                return pages
+            response = self.client.get(url, {'cursor': page.next_cursor})
+
+    def test_first_page_is_ten(self):
+        response = self.client.get(reverse('authors'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_paginated'])
+        self.assertEqual(len(response.context['author_list']), 10)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_cursor_pages_cover_all_clients_in_order(self):
+        pages = self.walk(reverse('authors'))
+        self.assertEqual(len(pages), 2)
+        seen = [client.pk for page in pages for client in page.context['author_list']]
+        expected = list(Client.objects.order_by('last_name', 'first_name', 'company_id')
+                        .values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_first_page(self):
+        first = self.client.get(reverse('authors'))
+        second = self.client.get(reverse('authors'), {'cursor': first.context['page_obj'].next_cursor})
+        back = self.client.get(reverse('authors'), {'cursor': second.context['page_obj'].previous_cursor})
+        self.assertEqual(list(back.context['author_list']), list(first.context['author_list']))
+        self.assertFalse(back.context['page_obj'].has_previous())
+        self.assertTrue(back.context['page_obj'].has_next())
+
+    def test_total_count_included_by_default(self):
+        response = self.client.get(reverse('authors'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse('authors'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_legacy_page_parameter_still_works(self):
+        response = self.client.get(reverse('authors') + '?page=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['author_list']), 3)
+
+
+class TaskCursorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        cls.user.user_permissions.add(Permission.objects.get(name='Set ticket as returned'))
+        test_ticket = Ticket.objects.create(title='Ticket Title', summary='My ticket summary', status=None)
+        # Unscheduled tasks must still be reachable after the scheduled ones.
+        for day in range(23):
+            scheduled_day = None if day % 7 == 0 else datetime.date.today() + datetime.timedelta(days=day % 3)
+            Task.objects.create(ticket=test_ticket, Work_Summary=' ', scheduled_day=scheduled_day,
+                                employee=cls.user)
+        Task.objects.create(ticket=test_ticket, Work_Summary=' ', employee=cls.user, task_checker=True)
+
+    def test_all_open_tasks_listed_once_in_order(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        seen = []
+        response = self.client.get(reverse('all-borrowed'))
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen.extend(response.context['task_list'])
+            page = response.context['page_obj']
+            if not page.has_next():
+                break
+            response = self.client.get(reverse('all-borrowed'), {'cursor': page.next_cursor})
+
+        self.assertEqual(len(seen), 23)
+        self.assertEqual(len({task.pk for task in seen}), 23)
+        days = [task.scheduled_day for task in seen]
+        scheduled = [day for day in days if day is not None]
+        self.assertEqual(scheduled, sorted(scheduled))
+        self.assertEqual(days[len(scheduled):], [None] * 4)
+
+    def test_total_count_skipped(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('all-borrowed'))
+        self.assertIsNone(response.context['page_obj'].paginator.count)
+
+    def test_user_list_is_paginated(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('my-borrowed'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'catalog/task_list_borrowed_user.html')
+        self.assertEqual(len(response.context['task_list']), 10)
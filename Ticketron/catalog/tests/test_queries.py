@@ -0,0 +1,60 @@
+from django.test import TestCase, override_settings
+
+# Create your tests here.
+
+import datetime
+
+from django.contrib.auth.models import Permission, User
+from django.urls import reverse
+
+from catalog.models import Client, Status, Task, Ticket
+from catalog.tests.helpers import QueryCountMixin
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class ViewQueryCountTest(QueryCountMixin, TestCase):
+    """Each page issues a fixed number of queries however many rows it shows (uncached)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        cls.user.user_permissions.add(Permission.objects.get(name='Set ticket as returned'))
+        cls.status = Status.objects.create(name='In Progress')
+        cls.test_client = Client.objects.create(first_name='John', last_name='Smith')
+        cls.ticket = cls.add_ticket()
+
+    @classmethod
+    def add_ticket(cls):
+        test_client = Client.objects.create(first_name='Big', last_name='Bob')
+        for owner in (cls.test_client, test_client):
+            ticket = Ticket.objects.create(title='Ticket Title', summary='My ticket summary',
+                                           client=owner, status=cls.status)
+            for day in range(3):
+                Task.objects.create(ticket=ticket, Work_Summary=' ', employee=cls.user,
+                                    scheduled_day=datetime.date.today() + datetime.timedelta(days=day))
+        return ticket
+
+    def test_ticket_list(self):
+        self.assertConstantQueries(reverse('tickets'), self.add_ticket)
+
+    def test_ticket_detail(self):
+        url = reverse('ticket-detail', args=[self.ticket.pk])
+        Status.objects.all_cached()  # The status table is read once per process.
+        # The ticket, its tasks, and (nothing cached) the check that it exists before stamping it.
+        self.assertViewQueries(url, 3)
+        self.assertConstantQueries(url, lambda: Task.objects.create(ticket=self.ticket, Work_Summary=' '))
+
+    def test_client_detail(self):
+        url = reverse('client-detail', args=[self.test_client.pk])
+        response = self.assertViewQueries(url, 3)
+        self.assertContains(response, '(3 open)')
+        self.assertConstantQueries(url, self.add_ticket)
+
+    def test_all_borrowed_list(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        self.assertConstantQueries(reverse('all-borrowed'), self.add_ticket)
+
+    def test_user_borrowed_list(self):
+        self.add_ticket()  # Enough tasks to paginate, which adds the count query.
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        self.assertConstantQueries(reverse('my-borrowed'), self.add_ticket)
@@ -0,0 +1,133 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import unittest
+
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.contrib.sessions.models import Session
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog import replicas
+from catalog.models import Client, Ticket
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTest(TestCase):
+
+    def setUp(self):
+        self.router = replicas.ReplicaRouter()
+        self.state = replicas.RoutingState(pinned=False)
+        self.state.replica_reads = True
+        token = replicas._state.set(self.state)
+        self.addCleanup(replicas._state.reset, token)
+        replicas.lag_monitor.record('replica1', 0.0)
+        replicas.lag_monitor.record('replica2', 0.5)
+        self.addCleanup(replicas.lag_monitor.reset)
+
+    def test_reads_go_to_one_replica_per_request(self):
+        replica = self.router.db_for_read(Ticket)
+        self.assertIn(replica, ['replica1', 'replica2'])
+        self.assertEqual({self.router.db_for_read(model) for model in (Ticket, Client, User)}, {replica})
+
+    def test_outside_replica_views_reads_use_the_primary(self):
+        self.state.replica_reads = False
+        self.assertIsNone(self.router.db_for_read(Ticket))
+        replicas._state.set(None)
+        self.assertIsNone(self.router.db_for_read(Ticket))
+
+    def test_lagging_and_unavailable_replicas_are_skipped(self):
+        replicas.lag_monitor.record('replica1', 60.0)
+        with self.assertLogs('catalog.replicas', 'INFO'):
+            self.assertEqual(self.router.db_for_read(Ticket), 'replica2')
+
+        self.state.replica = None
+        replicas.lag_monitor.record('replica2', None)
+        with self.assertLogs('catalog.replicas', 'INFO'):
+            self.assertEqual(self.router.db_for_read(Ticket), 'default')
+
+    def test_writes_and_pins_keep_reads_on_the_primary(self):
+        self.assertEqual(self.router.db_for_write(Session), 'default')
+        self.assertFalse(self.state.wrote)
+        self.assertEqual(self.router.db_for_write(Ticket), 'default')
+        self.assertTrue(self.state.wrote)
+        self.assertIsNone(self.router.db_for_read(Ticket))
+
+        pinned = replicas.RoutingState(pinned=True)
+        pinned.replica_reads = True
+        replicas._state.set(pinned)
+        self.assertIsNone(self.router.db_for_read(Ticket))
+
+    def test_replicas_are_not_migrated(self):
+        self.assertIs(self.router.allow_migrate('replica1', 'catalog'), False)
+        self.assertIsNone(self.router.allow_migrate('default', 'catalog'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingMiddlewareTest(TestCase):
+    """Runs against a replica reported far behind, so replica reads show up as a lag log line."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        cls.user.user_permissions.add(Permission.objects.get(name='Set ticket as returned'))
+        cls.client_record = Client.objects.create(first_name='Ada', last_name='Lovelace')
+
+    def setUp(self):
+        replicas.lag_monitor.record('replica1', 3600.0)
+        self.addCleanup(replicas.lag_monitor.reset)
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+
+    def test_list_views_read_from_replicas(self):
+        with self.assertLogs('catalog.replicas', 'INFO'):
+            response = self.client.get(reverse('authors'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+    def test_writes_pin_the_user_to_the_primary(self):
+        response = self.client.post(reverse('author_update', args=[self.client_record.pk]),
+                                    {'first_name': 'Ada', 'last_name': 'King', 'client_since': '2019-03-07'})
+        self.assertEqual(response.status_code, 302)
+        cookie = response.cookies[replicas.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.DATABASE_REPLICA_PIN_SECONDS)
+
+        with self.assertNoLogs('catalog.replicas', 'INFO'):
+            response = self.client.get(reverse('authors'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_views_use_the_primary(self):
+        with self.assertNoLogs('catalog.replicas', 'INFO'):
+            self.client.get(reverse('index'))
+
+    def test_cached_detail_pages_use_the_primary(self):
+        # Their version stamps are bumped on the primary; a replica's rows could be cached as the new version.
+        with self.assertNoLogs('catalog.replicas', 'INFO'):
+            response = self.client.get(reverse('client-detail', args=[self.client_record.pk]))
+        self.assertEqual(response.status_code, 200)
+
+
+@unittest.skipUnless(settings.DATABASE_REPLICAS, 'Set DATABASE_REPLICA_URLS to test against a replica.')
+class ReplicaDatabaseTest(TransactionTestCase):
+    """With e.g. DATABASE_REPLICA_URLS=sqlite:////tmp/replica.sqlite3 (mirrors the test database)."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        self.addCleanup(replicas.lag_monitor.reset)
+        Ticket.objects.create(title='Outage', summary=' ', status=None)
+
+    def test_ticket_list_reads_from_the_replica(self):
+        replica = connections[settings.DATABASE_REPLICAS[0]]
+        with CaptureQueriesContext(replica) as captured:
+            response = self.client.get(reverse('tickets'))
+        self.assertContains(response, 'Outage')
+        self.assertTrue(captured.captured_queries)
+
+        self.client.cookies[replicas.PIN_COOKIE] = '1'
+        with CaptureQueriesContext(replica) as captured:
+            self.client.get(reverse('tickets'))
+        self.assertEqual(captured.captured_queries, [])
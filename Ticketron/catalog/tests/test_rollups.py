@@ -0,0 +1,109 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import Permission, User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import ChangeLogEntry, Client, Status, Ticket, TicketRollup
+from catalog.rollups import throughput
+from catalog.timeline import week_start
+
+
+def counts():
+    return sorted(TicketRollup.objects.values_list('client_key', 'severity', 'status_key', 'opened', 'closed'))
+
+
+class RollupTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.new = Status.objects.create(name='New')
+        cls.resolved = Status.objects.create(name='Resolved')
+        cls.acme = Client.objects.create(company_name='Acme')
+
+    def setUp(self):
+        Status.objects.clear_cache()
+
+    def test_saves_count_opened_and_closed_tickets(self):
+        ticket = Ticket.objects.create(title='Outage', summary=' ', client=self.acme, severity='h', status=self.new)
+        Ticket.objects.create(title='Printer', summary=' ', client=None, severity='l', status=self.new)
+        ticket.title = 'Major outage'
+        ticket.save()
+        self.assertEqual(counts(), [
+            ('', 'l', self.new.pk, 1, 0),
+            (str(self.acme.pk), 'h', self.new.pk, 1, 0),
+        ])
+
+        ticket.status = self.resolved
+        ticket.save()
+        # Saving a closed ticket again does not close it twice.
+        ticket.save()
+        self.assertEqual(TicketRollup.objects.get(status_key=self.resolved.pk).closed, 1)
+        self.assertEqual(set(TicketRollup.objects.values_list('day', flat=True)), {timezone.localdate()})
+
+    def test_rebuild_replays_the_change_log(self):
+        ticket = Ticket.objects.create(title='Outage', summary=' ', client=self.acme, severity='h', status=self.new)
+        ticket.status = self.resolved
+        ticket.save()
+        Ticket.objects.create(title='Printer', summary=' ', client=None, severity='l', status=self.resolved)
+        expected = counts()
+        # A ticket older than the change log: its first entry is an update, which counts nothing.
+        old = Ticket.objects.create(title='Old', summary=' ', client=self.acme, severity='m', status=self.new)
+        ChangeLogEntry.objects.filter(model='ticket', object_pk=str(old.pk)).delete()
+        old.status = self.resolved
+        old.save()
+
+        TicketRollup.objects.update(opened=100)
+        out = StringIO()
+        call_command('rebuild_rollups', stdout=out)
+        self.assertIn('Wrote 3 rollup rows.', out.getvalue())
+        self.assertEqual(counts(), expected)
+
+    def test_throughput_groups_by_week(self):
+        monday = week_start(datetime.date(2030, 1, 9))
+        TicketRollup.objects.bulk_create([
+            TicketRollup(day=monday, client_key=str(self.acme.pk), severity='h', status_key=self.new.pk, opened=2),
+            TicketRollup(day=monday + datetime.timedelta(days=3), client_key=str(self.acme.pk), severity='h',
+                         status_key=self.new.pk, opened=1),
+            TicketRollup(day=monday + datetime.timedelta(days=8), client_key='', severity='l',
+                         status_key=self.resolved.pk, opened=1, closed=1),
+        ])
+        rows = throughput(monday, monday + datetime.timedelta(days=8))
+        self.assertEqual([(row['week'], row['client'], row['severity'], row['status'], row['opened'], row['closed'])
+                          for row in rows], [
+            (monday, 'Acme', 'High', 'New', 3, 0),
+            (monday + datetime.timedelta(weeks=1), None, 'Low', 'Resolved', 1, 1),
+        ])
+        self.assertEqual(len(throughput(monday, monday, client_id=self.acme.pk)), 1)
+
+
+class ThroughputReportViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        user.user_permissions.add(Permission.objects.get(name='Set ticket as returned'))
+        User.objects.create_user(username='testuser2', password='2HJ1vRV0Z&3iD')
+        for number in range(30):
+            Ticket.objects.create(title='Ticket {0}'.format(number), summary=' ', status=None)
+
+    def test_reads_only_the_rollups(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        # Session, user, 2 x permissions, one grouped rollup query (no clients to look up).
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('throughput-report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '30 tickets opened, 0 closed.')
+
+    def test_bad_range_and_permission(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('throughput-report'), {'start': '2030-01-02', 'end': '2030-01-01'})
+        self.assertContains(response, 'Invalid range - start is after end')
+        self.client.login(username='testuser2', password='2HJ1vRV0Z&3iD')
+        self.assertEqual(self.client.get(reverse('throughput-report')).status_code, 302)
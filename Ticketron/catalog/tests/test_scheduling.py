@@ -0,0 +1,182 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import datetime
+import json
+from io import StringIO
+
+from django.contrib.auth.models import Permission, User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+from catalog import caching
+from catalog.counters import reconcile
+from catalog.models import Client, EmployeeWorkload, Job, Task, Ticket
+from catalog.scheduling import auto_schedule, plan_schedule
+
+
+class BulkUpdateTasksViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dispatcher = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        cls.dispatcher.user_permissions.add(Permission.objects.get(name='Set ticket as returned'))
+        User.objects.create_user(username='testuser2', password='2HJ1vRV0Z&3iD')
+        cls.tech = User.objects.create_user(username='tech', password='3HJ1vRV0Z&3iD')
+        cls.ticket = Ticket.objects.create(title='Outage', summary=' ', client=Client.objects.create(), status=None)
+        cls.today = datetime.date.today()
+        cls.tasks = [Task.objects.create(ticket=cls.ticket, Work_Summary='Task {0}'.format(number),
+                                         employee=cls.dispatcher, scheduled_day=cls.today)
+                     for number in range(3)]
+        Task.objects.create(ticket=cls.ticket, Work_Summary='Existing work', employee=cls.tech,
+                            scheduled_day=cls.today)
+
+    def post(self, rows, username='testuser1', password='1X<ISRUkw+tuK'):
+        if username:
+            self.client.login(username=username, password=password)
+        return self.client.post(reverse('tasks-bulk-update'), json.dumps({'tasks': rows}),
+                                content_type='application/json')
+
+    def test_applies_valid_rows_in_one_update(self):
+        day = self.today + datetime.timedelta(weeks=2)
+        rows = [{'id': task.pk, 'scheduled_day': day.isoformat(), 'employee': self.tech.pk} for task in self.tasks]
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        # Session, user, 2 x permissions, employees, savepoint, SELECT ... FOR UPDATE, one UPDATE,
+        # one change log INSERT, the two employees' workload counters, the ticket -> client lookup
+        # for the page cache, the queued assignment email, release.
+        with self.assertNumQueries(14):
+            response = self.post(rows, username=None)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['updated'], 3)
+        self.assertEqual([result['status'] for result in data['results']], ['updated'] * 3)
+        self.assertEqual(Task.objects.filter(scheduled_day=day, employee=self.tech).count(), 3)
+        self.assertEqual(self.tech.workload.open_tasks, 4)
+        self.assertEqual(EmployeeWorkload.objects.get(employee=self.dispatcher).open_tasks, 0)
+        self.assertEqual(Job.objects.latest('pk').payload, {'task_ids': sorted(task.pk for task in self.tasks)})
+
+    def test_reports_invalid_rows_and_keeps_valid_ones(self):
+        version = caching.get_version(caching.TICKET, self.ticket.pk)
+        rows = [
+            {'id': self.tasks[0].pk, 'scheduled_day': (self.today - datetime.timedelta(days=1)).isoformat()},
+            {'id': self.tasks[1].pk, 'scheduled_day': (self.today + datetime.timedelta(weeks=5)).isoformat()},
+            {'id': self.tasks[2].pk, 'employee': self.tech.pk},
+            {'id': self.tasks[2].pk, 'employee': self.tech.pk},
+            {'id': 999999, 'employee': self.tech.pk},
+            {'id': self.tasks[0].pk, 'employee': 999999},
+            {'id': self.tasks[0].pk},
+            'not a row',
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            results = self.post(rows).json()['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['error', 'error', 'updated', 'error', 'error', 'error', 'error', 'error'])
+        self.assertIn('in past', results[0]['errors']['scheduled_day'][0]['message'])
+        self.assertIn('4 weeks ahead', results[1]['errors']['scheduled_day'][0]['message'])
+        self.assertEqual(results[4]['errors']['id'][0]['code'], 'not_found')
+        self.assertEqual(results[5]['errors']['employee'][0]['code'], 'not_found')
+        self.assertEqual(Task.objects.get(pk=self.tasks[2].pk).employee, self.tech)
+        self.assertEqual(Task.objects.get(pk=self.tasks[0].pk).scheduled_day, self.today)
+        self.assertNotEqual(caching.get_version(caching.TICKET, self.ticket.pk), version)
+
+    def test_requires_permission_and_post(self):
+        response = self.post([], username='testuser2', password='2HJ1vRV0Z&3iD')
+        self.assertEqual(response.status_code, 403)
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        self.assertEqual(self.client.get(reverse('tasks-bulk-update')).status_code, 405)
+
+    def test_malformed_body_is_bad_request(self):
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        for body in ('not json', '[]', '{"tasks": 1}'):
+            response = self.client.post(reverse('tasks-bulk-update'), body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+
+class PlanScheduleTest(TestCase):
+
+    def setUp(self):
+        self.today = datetime.date.today()
+        self.days = [self.today + datetime.timedelta(days=offset) for offset in range(3)]
+
+    def test_high_severity_first_and_daily_capacity(self):
+        tasks = [(1, None, 'l'), (2, None, 'm'), (3, None, 'h'), (4, None, 'h'), (5, None, 'm')]
+        plan = plan_schedule(tasks, [7], self.days, capacity=2)
+        self.assertEqual(plan, {3: (7, self.days[0]), 4: (7, self.days[0]), 2: (7, self.days[1]),
+                                5: (7, self.days[1]), 1: (7, self.days[2])})
+
+    def test_balances_employees_by_load(self):
+        tasks = [(number, None, 'm') for number in range(6)]
+        plan = plan_schedule(tasks, [7, 8], self.days, capacity=5,
+                             booked={(7, self.days[0]): 2}, workload={7: 2, 8: 0})
+        day_one = sorted(employee for employee, day in plan.values() if day == self.days[0])
+        # 8 catches up with the 2 tasks 7 already has that day, then they alternate.
+        self.assertEqual(day_one, [7, 7, 8, 8, 8, 8])
+
+    def test_assigned_tasks_keep_their_employee(self):
+        tasks = [(1, 9, 'l'), (2, 9, 'l'), (3, None, 'h')]
+        plan = plan_schedule(tasks, [7], self.days, capacity=1, booked={(9, self.days[0]): 1})
+        self.assertEqual(plan, {3: (7, self.days[0]), 1: (9, self.days[1]), 2: (9, self.days[2])})
+
+    def test_tasks_that_do_not_fit_are_left_out(self):
+        tasks = [(number, None, 'm') for number in range(10)]
+        plan = plan_schedule(tasks, [7, 8], self.days, capacity=1)
+        self.assertEqual(sorted(plan), [0, 1, 2, 3, 4, 5])
+        self.assertEqual(plan_schedule(tasks, [], self.days, capacity=1), {})
+
+
+class AutoScheduleTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice', email='alice@example.com', password='x')
+        cls.bob = User.objects.create_user(username='bob', email='bob@example.com', password='y')
+        cls.today = datetime.date.today()
+        ticket = Ticket.objects.create(title='Existing', summary=' ', status=None)
+        for employee in (cls.alice, cls.bob):
+            # Both have had tasks, so both have a workload row (and are candidates).
+            done = Task.objects.create(ticket=ticket, Work_Summary='Done', employee=employee)
+            done.task_checker = True
+            done.save()
+        cls.urgent = Ticket.objects.create(title='Urgent', summary=' ', status=None, severity='h',
+                                           client=Client.objects.create())
+        cls.routine = Ticket.objects.create(title='Routine', summary=' ', status=None, severity='l')
+        cls.tasks = [Task.objects.create(ticket=ticket, Work_Summary=str(number))
+                     for ticket in (cls.routine, cls.urgent) for number in range(3)]
+        Job.objects.all().delete()
+
+    def test_schedules_and_assigns_open_tasks(self):
+        version = caching.get_version(caching.TICKET, self.urgent.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            result = auto_schedule(capacity=2)
+        self.assertEqual(result, {'scheduled': 6, 'unscheduled': 0})
+        # Two employees with two slots a day: the urgent tasks and one routine task fill today.
+        days = sorted(Task.objects.filter(ticket__in=[self.urgent, self.routine])
+                      .values_list('ticket__severity', 'scheduled_day'))
+        tomorrow = self.today + datetime.timedelta(days=1)
+        self.assertEqual(days, [('h', self.today)] * 3 + [('l', self.today)] + [('l', tomorrow)] * 2)
+        self.assertEqual(Task.objects.filter(employee=self.alice, task_checker=False).count(), 3)
+        self.assertEqual(Task.objects.filter(employee=self.bob, task_checker=False).count(), 3)
+        self.assertEqual(reconcile(), {'tickets': 0, 'clients': 0, 'employees': 0})
+        self.assertNotEqual(caching.get_version(caching.TICKET, self.urgent.pk), version)
+        self.assertEqual(sorted(Job.objects.get().payload['task_ids']), sorted(task.pk for task in self.tasks))
+        self.assertEqual(auto_schedule(), {'scheduled': 0, 'unscheduled': 0})
+
+    def test_leaves_what_does_not_fit(self):
+        result = auto_schedule(employees=User.objects.filter(pk=self.alice.pk), horizon=2, capacity=2)
+        self.assertEqual(result, {'scheduled': 4, 'unscheduled': 2})
+        self.assertEqual(Task.objects.filter(ticket=self.urgent, employee=self.alice).count(), 3)
+        self.assertEqual(Task.objects.filter(scheduled_day__isnull=True, task_checker=False).count(), 2)
+
+    def test_rejects_past_start(self):
+        with self.assertRaises(ValueError):
+            auto_schedule(start=self.today - datetime.timedelta(days=1))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('auto_schedule', '--employee', 'bob', '--capacity', '3', stdout=out)
+        self.assertIn('Scheduled 6 tasks; 0 did not fit.', out.getvalue())
+        self.assertEqual(Task.objects.filter(employee=self.bob, scheduled_day=self.today).count(), 3)
+        with self.assertRaises(CommandError):
+            call_command('auto_schedule', '--employee', 'nobody', stdout=StringIO())
@@ -0,0 +1,106 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from catalog import search
+from catalog.models import Client, Task, Ticket
+
+
+class SearchTest(TestCase):
+
+    def setUp(self):
+        test_client = Client.objects.create(company_name='Acme')
+        self.printer = Ticket.objects.create(title='Printer jammed', summary='Paper stuck in tray two',
+                                            client=test_client, status=None)
+        self.router = Ticket.objects.create(title='Router offline', summary='Office network is down, printer too',
+                                           client=test_client, status=None)
+        self.task = Task.objects.create(ticket=self.router, Work_Summary='Replace the switch firmware')
+
+    def kinds_and_ids(self, query):
+        return [(hit.kind, hit.obj.pk) for hit in search.search(query)]
+
+    def test_title_match_ranks_above_summary_match(self):
+        self.assertEqual(self.kinds_and_ids('printer'),
+                         [('ticket', self.printer.pk), ('ticket', self.router.pk)])
+
+    def test_task_work_summary_is_searchable(self):
+        self.assertEqual(self.kinds_and_ids('firmware'), [('task', self.task.pk)])
+
+    def test_stemmed_terms_match(self):
+        self.assertEqual(self.kinds_and_ids('jam'), [('ticket', self.printer.pk)])
+
+    def test_save_updates_index(self):
+        self.printer.summary = 'Toner cartridge empty'
+        self.printer.save()
+        self.assertEqual(self.kinds_and_ids('toner'), [('ticket', self.printer.pk)])
+        self.assertEqual(self.kinds_and_ids('tray'), [])
+
+    def test_ticket_rename_reindexes_its_tasks(self):
+        self.router.title = 'Gateway offline'
+        self.router.save()
+        self.assertIn(('task', self.task.pk), self.kinds_and_ids('gateway'))
+
+    def test_other_ticket_changes_leave_its_tasks_alone(self):
+        reindexed = []
+        original = search.index_tasks
+        search.index_tasks = lambda tasks: reindexed.extend(tasks)
+        self.addCleanup(setattr, search, 'index_tasks', original)
+        self.router.summary = 'Office network is back, printer still down'
+        self.router.save()
+        self.assertEqual(reindexed, [])
+        self.assertIn(('ticket', self.router.pk), self.kinds_and_ids('back'))
+
+    def test_delete_removes_from_index(self):
+        self.task.delete()
+        self.assertEqual(self.kinds_and_ids('firmware'), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.kinds_and_ids('printer" OR "router'), [])
+        self.assertEqual(search.search('   '), [])
+
+    def test_rebuild_command(self):
+        search.get_backend().clear()
+        self.assertEqual(self.kinds_and_ids('firmware'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 3 documents', out.getvalue())
+        self.assertEqual(self.kinds_and_ids('firmware'), [('task', self.task.pk)])
+
+    def test_search_view_paginates(self):
+        for number in range(11):
+            Ticket.objects.create(title='Laptop {0}'.format(number), summary=' ', status=None)
+        response = self.client.get(reverse('search'), {'q': 'laptop'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'catalog/search_results.html')
+        self.assertEqual(len(response.context['hits']), 10)
+        self.assertTrue(response.context['has_next'])
+        response = self.client.get(reverse('search'), {'q': 'laptop', 'page': 2})
+        self.assertEqual(len(response.context['hits']), 1)
+        self.assertFalse(response.context['has_next'])
+
+    def test_search_view_without_a_backend(self):
+        # As on a database other than SQLite or PostgreSQL.
+        self.addCleanup(search.BACKENDS.__setitem__, 'sqlite', search.BACKENDS.pop('sqlite'))
+        response = self.client.get(reverse('search'), {'q': 'printer'})
+        self.assertContains(response, 'Search is not available on this server.')
+
+    def test_imported_tasks_are_searchable(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'tickets.jsonl')
+        with open(path, 'w') as handle:
+            for title, work_summary in (('Scanner offline', 'Reseat the cable'), ('Monitor flickers', 'Swap the cable')):
+                handle.write(json.dumps({'title': title, 'work_summary': work_summary}) + '\n')
+        self.addCleanup(os.remove, path)
+        self.addCleanup(os.remove, path + '.checkpoint')
+        call_command('import_tickets', path, stdout=StringIO())
+        tasks = Task.objects.filter(Work_Summary__endswith='the cable').values_list('pk', flat=True)
+        self.assertEqual(len(tasks), 2)
+        self.assertEqual(sorted(self.kinds_and_ids('cable')), sorted(('task', pk) for pk in tasks))
@@ -0,0 +1,69 @@
+from django.test import TestCase, override_settings
+
+# Create your tests here.
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from locallibrary.sessions import SessionStore
+
+
+@override_settings(SESSION_HYBRID_COOKIE_LIMIT=200)
+class HybridSessionStoreTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Random text, so it does not compress below the limit.
+        self.notes = get_random_string(1000)
+
+    def test_small_sessions_live_in_the_cookie(self):
+        session = SessionStore()
+        session['visits'] = 3
+        session.save()
+        self.assertIn(':', session.session_key)
+        self.assertEqual(SessionStore(session.session_key)['visits'], 3)
+
+    def test_large_sessions_move_to_the_cache_and_back(self):
+        session = SessionStore()
+        session['notes'] = self.notes
+        session.save()
+        key = session.session_key
+        self.assertNotIn(':', key)
+        self.assertEqual(SessionStore(key)['notes'], self.notes)
+
+        session = SessionStore(key)
+        session['notes'] = 'short'
+        session.save()
+        self.assertIn(':', session.session_key)
+        self.assertFalse(SessionStore().exists(key))
+        self.assertEqual(SessionStore(session.session_key)['notes'], 'short')
+
+    def test_tampered_cookie_starts_a_new_session(self):
+        session = SessionStore()
+        session['is_admin'] = False
+        session.save()
+        tampered = SessionStore(session.session_key[:-1] + ('A' if session.session_key[-1] != 'A' else 'B'))
+        self.assertNotIn('is_admin', tampered)
+        self.assertIsNone(tampered.session_key)
+
+    def test_flush_forgets_the_session(self):
+        session = SessionStore()
+        session['notes'] = self.notes
+        session.save()
+        key = session.session_key
+        session.flush()
+        self.assertFalse(SessionStore().exists(key))
+        self.assertEqual(dict(SessionStore(key).items()), {})
+
+    @override_settings(SESSION_ENGINE='locallibrary.sessions')
+    def test_login_without_the_session_table(self):
+        User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        with CaptureQueriesContext(connection) as captured:
+            self.assertTrue(self.client.login(username='testuser1', password='1X<ISRUkw+tuK'))
+            response = self.client.get(reverse('my-borrowed'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in captured if 'django_session' in query['sql']])
@@ -0,0 +1,142 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import datetime
+
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.urls import reverse
+
+from catalog.models import Task, Ticket
+from catalog.scheduling import apply_task_changes
+from catalog.timeline import calendar, week_cache, week_start
+
+
+class CalendarTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice', password='1X<ISRUkw+tuK')
+        cls.alice.user_permissions.add(Permission.objects.get(name='Set ticket as returned'))
+        cls.bob = User.objects.create_user(username='bob', password='2HJ1vRV0Z&3iD')
+        cls.ticket = Ticket.objects.create(title='Outage', summary=' ', status=None, severity='h')
+        cls.monday = week_start(datetime.date.today()) + datetime.timedelta(weeks=1)
+        cls.tuesday = cls.monday + datetime.timedelta(days=1)
+        cls.next_monday = cls.monday + datetime.timedelta(weeks=1)
+
+        def task(employee, day, summary, done=False):
+            return Task.objects.create(ticket=cls.ticket, Work_Summary=summary, employee=employee,
+                                       scheduled_day=day, task_checker=done)
+
+        cls.tasks = [
+            task(cls.bob, cls.monday, 'Replace router'),
+            task(cls.alice, cls.monday, 'Check cabling'),
+            task(cls.alice, cls.monday, 'Done already', done=True),
+            task(None, cls.tuesday, 'Unassigned'),
+            task(cls.alice, cls.next_monday, 'Next week'),
+            task(cls.alice, cls.monday - datetime.timedelta(days=1), 'Before the range'),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        week_cache.clear()
+
+    def test_groups_by_employee_and_day(self):
+        employees = calendar(self.monday, self.next_monday)
+        self.assertEqual([entry['username'] for entry in employees], ['alice', 'bob', None])
+        alice = employees[0]
+        self.assertEqual(list(alice['days']), [self.monday.isoformat(), self.next_monday.isoformat()])
+        self.assertEqual([(task['summary'], task['done']) for task in alice['days'][self.monday.isoformat()]],
+                         [('Check cabling', False), ('Done already', True)])
+        self.assertEqual(alice['days'][self.monday.isoformat()][0]['title'], 'Outage')
+        self.assertEqual(alice['days'][self.monday.isoformat()][0]['severity'], 'h')
+        self.assertEqual(employees[2]['days'], {self.tuesday.isoformat(): [
+            {'id': self.tasks[3].pk, 'summary': 'Unassigned', 'done': False, 'ticket': str(self.ticket.pk),
+             'title': 'Outage', 'severity': 'h'}]})
+
+        only_bob = calendar(self.monday, self.tuesday, {self.bob.pk})
+        self.assertEqual([entry['username'] for entry in only_bob], ['bob'])
+
+    def test_weeks_are_read_once_and_kept_in_memory(self):
+        with self.assertNumQueries(1):
+            calendar(self.monday, self.next_monday + datetime.timedelta(days=6))
+        with self.assertNumQueries(0):
+            calendar(self.tuesday, self.next_monday)
+
+    def test_task_changes_invalidate_their_weeks(self):
+        calendar(self.monday, self.next_monday)
+        task = self.tasks[4]
+        task.scheduled_day = self.tuesday
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        # Both the old and the new week are read again, in one query.
+        with self.assertNumQueries(1):
+            employees = calendar(self.monday, self.next_monday)
+        self.assertEqual(list(employees[0]['days']), [self.monday.isoformat(), self.tuesday.isoformat()])
+
+        # A task in another week leaves these cached.
+        Task.objects.create(ticket=self.ticket, Work_Summary='Later', employee=self.bob,
+                            scheduled_day=self.next_monday + datetime.timedelta(weeks=2))
+        with self.assertNumQueries(0):
+            calendar(self.monday, self.next_monday)
+
+    def test_bulk_changes_and_ticket_edits_invalidate(self):
+        calendar(self.monday, self.monday)
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_task_changes([{'id': self.tasks[0].pk, 'employee': self.alice.pk}])
+        self.assertEqual([entry['username'] for entry in calendar(self.monday, self.monday)], ['alice'])
+
+        self.ticket.title = 'Outage (resolved)'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ticket.save()
+        employees = calendar(self.monday, self.monday)
+        self.assertEqual(employees[0]['days'][self.monday.isoformat()][0]['title'], 'Outage (resolved)')
+
+    def test_renaming_or_deleting_an_employee_invalidates(self):
+        calendar(self.monday, self.next_monday)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.login(username='alice', password='1X<ISRUkw+tuK')
+        with self.assertNumQueries(0):
+            calendar(self.monday, self.next_monday)
+
+        self.alice.username = 'alice.smith'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.save()
+        self.assertEqual([entry['username'] for entry in calendar(self.monday, self.monday)],
+                         ['alice.smith', 'bob'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.delete()
+        employees = calendar(self.monday, self.monday)
+        self.assertEqual([entry['username'] for entry in employees], ['alice.smith', None])
+        self.assertEqual([task['summary'] for task in employees[1]['days'][self.monday.isoformat()]],
+                         ['Replace router'])
+
+    def test_endpoint(self):
+        self.client.login(username='alice', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('task-calendar'), {
+            'start': self.monday.isoformat(), 'end': self.tuesday.isoformat(),
+            'employee': '{0},{1}'.format(self.alice.pk, self.bob.pk)})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['start'], data['end']), (self.monday.isoformat(), self.tuesday.isoformat()))
+        self.assertEqual([entry['username'] for entry in data['employees']], ['alice', 'bob'])
+
+    def test_endpoint_defaults_to_this_week(self):
+        self.client.login(username='alice', password='1X<ISRUkw+tuK')
+        data = self.client.get(reverse('task-calendar')).json()
+        this_monday = week_start(datetime.date.today())
+        self.assertEqual(data['start'], this_monday.isoformat())
+        self.assertEqual(data['end'], (this_monday + datetime.timedelta(days=6)).isoformat())
+
+    def test_endpoint_rejects_bad_ranges(self):
+        self.client.login(username='alice', password='1X<ISRUkw+tuK')
+        for params in ({'start': '2026-01-10', 'end': '2026-01-01'},
+                       {'start': '2026-01-01', 'end': '2026-06-01'},
+                       {'employee': 'alice'}):
+            self.assertEqual(self.client.get(reverse('task-calendar'), params).status_code, 400)
+
+    def test_endpoint_requires_permission(self):
+        self.client.login(username='bob', password='2HJ1vRV0Z&3iD')
+        self.assertEqual(self.client.get(reverse('task-calendar')).status_code, 403)
@@ -0,0 +1,181 @@
+from django.test import TestCase
+
+# Create your tests here.
+
+import datetime
+import json
+
+from django.contrib.auth.models import Permission, User
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.models import (ChangeLogEntry, Client, EmployeeWorkload, Status, Task, Ticket, TicketRollup,
+                            TicketTransition)
+from catalog import workflow
+from catalog.workflow import allowed_sources, transition
+
+
+class WorkflowTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.new = Status.objects.create(name='New')
+        cls.in_progress = Status.objects.create(name='In Progress')
+        cls.resolved = Status.objects.create(name='Resolved')
+        cls.closed = Status.objects.create(name='Closed')
+        cls.acme = Client.objects.create(company_name='Acme')
+        cls.tech = User.objects.create_user(username='tech1', password='1X<ISRUkw+tuK')
+
+    def setUp(self):
+        Status.objects.clear_cache()
+
+    def ticket(self, status, **kwargs):
+        return Ticket.objects.create(title='Ticket', summary=' ', client=self.acme, status=status, **kwargs)
+
+    def test_allowed_sources_follow_the_workflow(self):
+        self.assertEqual(allowed_sources(self.resolved), {None, self.new.pk, self.in_progress.pk})
+        self.assertEqual(allowed_sources(self.new), {None, self.in_progress.pk})
+
+    def test_transition_moves_tickets_and_closes_their_tasks(self):
+        tickets = [self.ticket(self.new, severity='h'), self.ticket(self.in_progress), self.ticket(None)]
+        closed = self.ticket(self.closed)
+        day = datetime.date.today() + datetime.timedelta(days=3)
+        for ticket in tickets + [closed]:
+            Task.objects.create(ticket=ticket, Work_Summary='Fix', employee=self.tech, scheduled_day=day)
+        done = Task.objects.create(ticket=tickets[0], Work_Summary='Done', task_checker=True)
+        self.assertEqual(EmployeeWorkload.objects.get(employee=self.tech).open_tasks, 4)
+
+        with CaptureQueriesContext(connection) as captured:
+            result = transition(Ticket.objects.filter(client=self.acme), self.resolved, user=self.tech)
+        self.assertEqual(result, {'moved': 3, 'skipped': 1, 'tasks_done': 3})
+        ticket_updates = [query['sql'] for query in captured.captured_queries
+                          if query['sql'].startswith('UPDATE "catalog_ticket" SET "status_id"')]
+        self.assertEqual(len(ticket_updates), 1)
+
+        self.assertEqual(set(Ticket.objects.filter(pk__in=[t.pk for t in tickets]).values_list('status', flat=True)),
+                         {self.resolved.pk})
+        self.assertEqual(Ticket.objects.get(pk=closed.pk).status, self.closed)
+        self.assertEqual(Task.objects.filter(task_checker=False).get().ticket_id, closed.pk)
+        self.assertEqual(EmployeeWorkload.objects.get(employee=self.tech).open_tasks, 1)
+        self.assertEqual(Ticket.objects.get(pk=tickets[0].pk).open_task_count, 0)
+
+        history = TicketTransition.objects.filter(ticket=tickets[0]).get()
+        self.assertEqual((history.from_status, history.to_status, history.user), (self.new, self.resolved, self.tech))
+        self.assertEqual(ChangeLogEntry.objects.filter(model='ticket', data={'status_id': self.resolved.pk}).count(), 3)
+        self.assertEqual(ChangeLogEntry.objects.filter(model='task', data={'task_checker': True}).count(), 3)
+        self.assertFalse(ChangeLogEntry.objects.filter(model='task', object_pk=str(done.pk), action='u').exists())
+        self.assertEqual(TicketRollup.objects.get(status_key=self.resolved.pk, severity='h').closed, 1)
+        self.assertEqual(sum(TicketRollup.objects.filter(status_key=self.resolved.pk).values_list('closed', flat=True)),
+                         3)
+
+    def test_tickets_changed_after_the_read_are_not_recorded(self):
+        moved, raced = self.ticket(self.new), self.ticket(self.new)
+        original = workflow._status_in
+
+        def status_in(sources):
+            # Another writer closes one ticket between the SELECT and the UPDATE.
+            Ticket.objects.filter(pk=raced.pk).update(status=self.closed)
+            return original(sources)
+        workflow._status_in = status_in
+        self.addCleanup(setattr, workflow, '_status_in', original)
+
+        result = transition(Ticket.objects.all(), self.resolved, user=self.tech)
+        self.assertEqual(result, {'moved': 1, 'skipped': 1, 'tasks_done': 0})
+        self.assertEqual(list(TicketTransition.objects.values_list('ticket', flat=True)), [moved.pk])
+        self.assertEqual(list(ChangeLogEntry.objects.filter(model='ticket', data={'status_id': self.resolved.pk})
+                              .values_list('object_pk', flat=True)), [str(moved.pk)])
+        self.assertEqual(Ticket.objects.get(pk=raced.pk).status, self.closed)
+
+    def test_saving_a_new_status_records_a_transition(self):
+        ticket = self.ticket(self.new)
+        ticket.title = 'Renamed'
+        ticket.save()
+        self.assertFalse(TicketTransition.objects.exists())
+        ticket.status = self.in_progress
+        ticket.save()
+        history = TicketTransition.objects.get()
+        self.assertEqual((history.from_status, history.to_status, history.user), (self.new, self.in_progress, None))
+
+    def test_single_status_changes_follow_the_workflow(self):
+        ticket = self.ticket(self.resolved)
+        ticket.full_clean()
+        ticket.status = self.new
+        with self.assertRaisesMessage(ValidationError, 'A ticket cannot move from Resolved to New.'):
+            ticket.full_clean()
+        ticket.status = self.closed
+        ticket.full_clean()
+
+    def test_closing_a_single_ticket_closes_its_tasks(self):
+        ticket = self.ticket(self.in_progress)
+        task = Task.objects.create(ticket=ticket, Work_Summary='Fix', employee=self.tech)
+        ticket.status = self.closed
+        ticket.save()
+        task.refresh_from_db()
+        self.assertTrue(task.task_checker)
+        self.assertEqual(EmployeeWorkload.objects.get(employee=self.tech).open_tasks, 0)
+        self.assertEqual(Ticket.objects.get(pk=ticket.pk).open_task_count, 0)
+        self.assertTrue(ChangeLogEntry.objects.filter(model='task', object_pk=str(task.pk),
+                                                      data={'task_checker': True}).exists())
+
+
+class BulkTransitionViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        cls.user.user_permissions.add(Permission.objects.get(name='Set ticket as returned'))
+        User.objects.create_user(username='testuser2', password='2HJ1vRV0Z&3iD')
+        cls.new = Status.objects.create(name='New')
+        cls.resolved = Status.objects.create(name='Resolved')
+        cls.acme = Client.objects.create(company_name='Acme')
+        cls.tickets = [Ticket.objects.create(title='Ticket', summary=' ', client=cls.acme, status=cls.new)
+                       for number in range(3)]
+
+    def setUp(self):
+        Status.objects.clear_cache()
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+
+    def post(self, data):
+        return self.client.post(reverse('tickets-transition'), json.dumps(data), content_type='application/json')
+
+    def test_moves_listed_or_client_tickets(self):
+        response = self.post({'status': 'resolved', 'tickets': [str(self.tickets[0].pk)]})
+        self.assertEqual(response.json(), {'moved': 1, 'skipped': 0, 'tasks_done': 0})
+        response = self.post({'status': 'Resolved', 'client': str(self.acme.pk)})
+        self.assertEqual(response.json(), {'moved': 2, 'skipped': 1, 'tasks_done': 0})
+        self.assertEqual(TicketTransition.objects.filter(user=self.user).count(), 3)
+
+    def test_ticket_form_rejects_a_disallowed_status(self):
+        closed = Status.objects.create(name='Closed')
+        Status.objects.clear_cache()
+        ticket = self.tickets[0]
+        Ticket.objects.filter(pk=ticket.pk).update(status=closed)
+        response = self.client.post(reverse('ticket_update', args=[ticket.pk]), {
+            'title': ticket.title, 'summary': 'Reopened', 'client': self.acme.pk, 'status': self.new.pk,
+            'severity': 'm'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'A ticket cannot move from Closed to New.')
+        self.assertEqual(Ticket.objects.get(pk=ticket.pk).status, closed)
+
+    def test_invalid_requests_are_rejected(self):
+        self.assertEqual(self.post({'status': 'Shelved', 'client': str(self.acme.pk)}).status_code, 400)
+        self.assertEqual(self.post({'status': 'Resolved'}).status_code, 400)
+        self.assertEqual(self.post({'status': 'Resolved', 'tickets': ['not-a-uuid']}).status_code, 400)
+        self.assertEqual(self.post(['Resolved']).status_code, 400)
+        self.client.login(username='testuser2', password='2HJ1vRV0Z&3iD')
+        self.assertEqual(self.post({'status': 'Resolved', 'client': str(self.acme.pk)}).status_code, 403)
+
+    # The committed staticfiles manifest predates the admin's current assets.
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_action(self):
+        User.objects.create_superuser(username='admin', email='admin@test.com', password='1X<ISRUkw+tuK')
+        self.client.login(username='admin', password='1X<ISRUkw+tuK')
+        response = self.client.post(reverse('admin:catalog_ticket_changelist'), {
+            'action': 'transition_to_{0}'.format(self.resolved.pk),
+            '_selected_action': [str(ticket.pk) for ticket in self.tickets[:2]],
+        }, follow=True)
+        self.assertContains(response, 'Moved 2 tickets to Resolved')
+        self.assertEqual(Ticket.objects.filter(status=self.resolved).count(), 2)
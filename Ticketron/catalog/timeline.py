@@ -0,0 +1,151 @@
+"""Tasks grouped by employee and day for the calendar endpoint, cached per week.
+
+Each week (Monday to Sunday) is read with its tasks already nested by
+employee and day and kept in this process's memory, stamped with the week's
+version from caching.py. Saving or deleting a task bumps the versions of the
+weeks of its old and new scheduled_day, so a change made in any worker makes
+every worker's copy stale. Ticket and user changes bump the weeks of their
+tasks, which show the ticket's title and the employee's username. A request
+reads only the weeks it is missing, with one range query over
+task_day_employee_idx, ordered by employee and day so the nesting is a single
+pass over the rows.
+"""
+
+import collections
+import datetime
+import itertools
+import threading
+
+from django.conf import settings
+
+from . import caching
+from .models import Task
+
+WEEK = 'calendar-week'
+
+
+def week_start(day):
+    return day - datetime.timedelta(days=day.weekday())
+
+
+class WeekCache:
+    """Per-week task groupings held in memory, evicting the least recently used week."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._weeks = collections.OrderedDict()
+
+    def get(self, monday, version):
+        with self._lock:
+            entry = self._weeks.get(monday)
+            if entry is None or entry[0] != version:
+                return None
+            self._weeks.move_to_end(monday)
+            return entry[1]
+
+    def put(self, monday, version, employees):
+        with self._lock:
+            self._weeks[monday] = (version, employees)
+            self._weeks.move_to_end(monday)
+            while len(self._weeks) > settings.CATALOG_CALENDAR_CACHE_WEEKS:
+                self._weeks.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._weeks.clear()
+
+
+week_cache = WeekCache()
+
+
+def load_weeks(mondays):
+    """Reads whole weeks with one range query; returns {monday: [employee entry, ...]}."""
+    weeks = {monday: [] for monday in mondays}
+    if not mondays:
+        return weeks
+    rows = (Task.objects.filter(scheduled_day__range=(min(mondays), max(mondays) + datetime.timedelta(days=6)))
+            .order_by('employee', 'scheduled_day', 'pk')
+            .values_list('employee_id', 'employee__username', 'scheduled_day', 'pk', 'Work_Summary',
+                         'task_checker', 'ticket_id', 'ticket__title', 'ticket__severity'))
+    for (employee_id, username), employee_rows in itertools.groupby(rows, key=lambda row: row[:2]):
+        entries = {}
+        for row in employee_rows:
+            monday = week_start(row[2])
+            if monday not in weeks:
+                continue
+            entry = entries.get(monday)
+            if entry is None:
+                entry = entries[monday] = {'id': employee_id, 'username': username, 'days': {}}
+                weeks[monday].append(entry)
+            entry['days'].setdefault(row[2].isoformat(), []).append({
+                'id': row[3], 'summary': row[4], 'done': row[5],
+                'ticket': str(row[6]) if row[6] else None, 'title': row[7], 'severity': row[8],
+            })
+    return weeks
+
+
+def calendar(start, end, employee_ids=None):
+    """Tasks scheduled from ``start`` to ``end`` (inclusive) as a list of employees with their days.
+
+    Unassigned tasks are listed under an employee with id None. ``employee_ids``
+    limits the employees returned (None: everyone with a task in the range).
+    """
+    mondays = []
+    monday = week_start(start)
+    while monday <= end:
+        mondays.append(monday)
+        monday += datetime.timedelta(weeks=1)
+    versions = caching.get_versions(WEEK, [monday.isoformat() for monday in mondays])
+
+    weeks = {}
+    missing = []
+    for monday in mondays:
+        weeks[monday] = week_cache.get(monday, versions[monday.isoformat()])
+        if weeks[monday] is None:
+            missing.append(monday)
+    for monday, employees in load_weeks(missing).items():
+        week_cache.put(monday, versions[monday.isoformat()], employees)
+        weeks[monday] = employees
+
+    first, last = start.isoformat(), end.isoformat()
+    merged = {}
+    for monday in mondays:
+        for entry in weeks[monday]:
+            if employee_ids is not None and entry['id'] not in employee_ids:
+                continue
+            days = {day: tasks for day, tasks in entry['days'].items() if first <= day <= last}
+            if days:
+                merged.setdefault(entry['id'], {'id': entry['id'], 'username': entry['username'], 'days': {}})
+                merged[entry['id']]['days'].update(days)
+    # Employees by name, unassigned tasks last.
+    return sorted(merged.values(), key=lambda entry: (entry['id'] is None, entry['username'] or ''))
+
+
+def days_changed(days):
+    """Marks the weeks of these days as changed; for writes that send no Task signals."""
+    caching.bump_versions(WEEK, {week_start(day).isoformat() for day in days if day is not None})
+
+
+def task_changed(sender, instance, **kwargs):
+    """Task save/delete: the weeks of its new and old scheduled_day."""
+    previous = caching.previous_state(instance)
+    days_changed({instance.scheduled_day, previous['scheduled_day'] if previous else None})
+
+
+def ticket_changed(sender, instance, created=False, **kwargs):
+    """Ticket save/pre-delete: the weeks of its tasks, which show the ticket's title and severity."""
+    if not created:
+        days_changed(Task.objects.filter(ticket=instance.pk).order_by()
+                     .values_list('scheduled_day', flat=True).distinct())
+
+
+def employee_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    """User save/pre-delete: the weeks of the user's tasks, which show the username.
+
+    Deleting a user sets its tasks' employee to NULL in SQL, without Task signals.
+    Saves that leave the username alone (e.g. last_login on every login) are skipped.
+    """
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    days_changed(Task.objects.filter(employee=instance.pk).order_by()
+                 .values_list('scheduled_day', flat=True).distinct())
@@ -6,9 +6,10 @@ from . import views
 urlpatterns = [
     path('', views.index, name='index'),
     path('tickets/', views.TicketListView.as_view(), name='tickets'),
-    path('ticket/<int:pk>', views.TicketDetailView.as_view(), name='ticket-detail'),
+    path('ticket/<uuid:pk>', views.TicketDetailView.as_view(), name='ticket-detail'),
     path('authors/', views.ClientListView.as_view(), name='authors'),
-    path('client/<int:pk>',
+    path('search/', views.search_view, name='search'),
+    path('client/<uuid:pk>',
          views.ClientDetailView.as_view(), name='client-detail'),
 ]
 
@@ -16,25 +17,37 @@ urlpatterns = [
 urlpatterns += [
     path('mytickets/', views.LoanedTicketsByUserListView.as_view(), name='my-borrowed'),
     path(r'borrowed/', views.LoanedTicketsAllListView.as_view(), name='all-borrowed'),  # Added for challenge
+    path('overdue/', views.overdue_by_employee, name='overdue-by-employee'),
+    path('reports/throughput/', views.throughput_report, name='throughput-report'),
 ]
 
 
 # Add URLConf for librarian to renew a ticket.
 urlpatterns += [
-    path('ticket/<uuid:pk>/renew/', views.renew_ticket_librarian, name='renew-ticket-librarian'),
+    path('ticket/<int:pk>/renew/', views.renew_ticket_librarian, name='renew-ticket-librarian'),
+    path('tasks/bulk-update/', views.bulk_update_tasks, name='tasks-bulk-update'),
+    path('tickets/transition/', views.bulk_transition_tickets, name='tickets-transition'),
+    path('calendar/', views.task_calendar, name='task-calendar'),
 ]
 
 
 # Add URLConf to create, update, and delete authors
 urlpatterns += [
     path('client/create/', views.ClientCreate.as_view(), name='author_create'),
-    path('client/<int:pk>/update/', views.ClientUpdate.as_view(), name='author_update'),
-    path('client/<int:pk>/delete/', views.ClientDelete.as_view(), name='author_delete'),
+    path('client/<uuid:pk>/update/', views.ClientUpdate.as_view(), name='author_update'),
+    path('client/<uuid:pk>/delete/', views.ClientDelete.as_view(), name='author_delete'),
 ]
 
 # Add URLConf to create, update, and delete tickets
 urlpatterns += [
     path('ticket/create/', views.TicketCreate.as_view(), name='ticket_create'),
-    path('ticket/<int:pk>/update/', views.TicketUpdate.as_view(), name='ticket_update'),
-    path('ticket/<int:pk>/delete/', views.TicketDelete.as_view(), name='ticket_delete'),
+    path('ticket/<uuid:pk>/update/', views.TicketUpdate.as_view(), name='ticket_update'),
+    path('ticket/<uuid:pk>/delete/', views.TicketDelete.as_view(), name='ticket_delete'),
+]
+
+# Add URLConf for streaming exports
+urlpatterns += [
+    path('export/tickets.<str:fmt>', views.export_tickets, name='export-tickets'),
+    path('export/tasks.<str:fmt>', views.export_tasks, name='export-tasks'),
+    path('changes/', views.change_feed, name='changes'),
 ]
@@ -2,83 +2,144 @@ from django.shortcuts import render
 
 # Create your views here.
 
-from .models import Ticket, Client, Task, Status
+from django.conf import settings
+from django.core.paginator import Paginator
+
+from .models import Ticket, Client, Task, Status, EmployeeWorkload
+from .dashboard import get_dashboard_counts
+from .pagination import CursorPaginationMixin
+from . import caching, visits
+from .caching import VersionedCacheMixin
 
 
 def index(request):
     """View function for home page of site."""
-    # Generate counts of some of the main objects
-    num_tickets = Ticket.objects.all().count()
-    num_instances = Task.objects.all().count()
-    # Available copies of tickets
-    num_instances_available = Task.objects.filter(status__exact='a').count()
-    num_authors = Client.objects.count()  # The 'all()' is implied by default.
+    # Generate counts of some of the main objects (one cached aggregate query)
+    context = dict(get_dashboard_counts())
 
-    # Number of visits to this view, as counted in the session variable.
-    num_visits = request.session.get('num_visits', 0)
-    request.session['num_visits'] = num_visits+1
+    # Number of visits to this view, in total and by this user (counted in memory, saved in batches).
+    if settings.CATALOG_DASHBOARD_TRACK_VISITS:
+        context.update(visits.record_home_page_visit(request))
 
     # Render the HTML template index.html with the data in the context variable.
     return render(
         request,
         'index.html',
-        context={'num_tickets': num_tickets, 'num_instances': num_instances,
-                 'num_instances_available': num_instances_available, 'num_authors': num_authors,
-                 'num_visits': num_visits},
+        context=context,
     )
 
 
 from django.views import generic
 
 
-class TicketListView(generic.ListView):
+class TicketListView(CursorPaginationMixin, generic.ListView):
     """Generic class-based view for a list of tickets."""
     model = Ticket
     paginate_by = 10
+    cursor_ordering = ('title', 'ticket_id')
+    cursor_count_total = False
+
+    def get_queryset(self):
+        return Ticket.objects.select_related('client')
 
 
-class TicketDetailView(generic.DetailView):
+class TicketDetailView(VersionedCacheMixin, generic.DetailView):
     """Generic class-based detail view for a ticket."""
     model = Ticket
+    cache_kind = caching.TICKET
+
+    def get_cache_version(self, pk):
+        # The page shows the client, so it is keyed on the client's stamp too.
+        return caching.get_ticket_page_version(pk)
+
+    def get_queryset(self):
+        # Tasks are read by the template inside a cached fragment, only on a fragment miss.
+        return Ticket.objects.select_related('client')
 
 
-class ClientListView(generic.ListView):
+class ClientListView(CursorPaginationMixin, generic.ListView):
     """Generic class-based list view for a list of authors."""
     model = Client
+    context_object_name = 'author_list'
     paginate_by = 10
+    cursor_ordering = ('last_name', 'first_name', 'company_id')
 
 
-class ClientDetailView(generic.DetailView):
+class ClientDetailView(VersionedCacheMixin, generic.DetailView):
     """Generic class-based detail view for an client."""
     model = Client
+    cache_kind = caching.CLIENT
+    tickets_paginate_by = 20
+
+    def get_page_number(self):
+        try:
+            return max(1, int(self.request.GET.get('page', 1)))
+        except ValueError:
+            return 1
+
+    def get_cache_variant(self, request):
+        return '{0}-{1}'.format(super().get_cache_variant(request), self.get_page_number())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # One page of the client's tickets (with their open task counters), run lazily
+        # by the template inside a cached fragment, only on a fragment miss.
+        paginator = Paginator(self.object.ticket_set.order_by('title', 'ticket_id'), self.tickets_paginate_by)
+        # The stored counter instead of a COUNT query.
+        paginator.count = self.object.ticket_count
+        page = paginator.get_page(self.get_page_number())
+        context.update(tickets=page.object_list, page_obj=page, paginator=paginator,
+                       is_paginated=page.has_other_pages())
+        return context
 
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 
-class LoanedTicketsByUserListView(LoginRequiredMixin, generic.ListView):
+class LoanedTicketsByUserListView(LoginRequiredMixin, CursorPaginationMixin, generic.ListView):
     """Generic class-based view listing tickets on loan to current user."""
     model = Task
     template_name = 'catalog/task_list_borrowed_user.html'
     paginate_by = 10
+    cursor_ordering = ('scheduled_day', 'id')
 
     def get_queryset(self):
-        return Task.objects.filter(employee=self.request.user).filter(status__exact='o').order_by('scheduled_day')
+        return (Task.objects.filter(employee=self.request.user).filter(task_checker=False)
+                .select_related('ticket').with_overdue())
+
+    def get_workload(self):
+        """The user's open task counter (an unsaved zero if they never had a task)."""
+        if not hasattr(self, '_workload'):
+            self._workload = (EmployeeWorkload.objects.filter(employee=self.request.user).first()
+                              or EmployeeWorkload(employee=self.request.user))
+        return self._workload
+
+    def get_cursor_count(self):
+        return self.get_workload().open_tasks
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['workload'] = self.get_workload()
+        # Not stored: tasks become overdue without being saved.
+        context['overdue_count'] = Task.objects.filter(employee=self.request.user).overdue().count()
+        return context
 
 
 # Added as part of challenge!
 from django.contrib.auth.mixins import PermissionRequiredMixin
 
 
-class LoanedTicketsAllListView(PermissionRequiredMixin, generic.ListView):
+class LoanedTicketsAllListView(PermissionRequiredMixin, CursorPaginationMixin, generic.ListView):
     """Generic class-based view listing all tickets on loan. Only visible to users with can_mark_returned permission."""
     model = Task
     permission_required = 'catalog.can_mark_returned'
     template_name = 'catalog/task_list_borrowed_all.html'
     paginate_by = 10
+    cursor_ordering = ('scheduled_day', 'id')
+    cursor_count_total = False
 
     def get_queryset(self):
-        return Task.objects.filter(status__exact='o').order_by('scheduled_day')
+        return Task.objects.filter(task_checker=False).select_related('ticket', 'employee').with_overdue()
 
 
 from django.shortcuts import get_object_or_404
@@ -124,6 +185,124 @@ def renew_ticket_librarian(request, pk):
     return render(request, 'catalog/ticket_renew_librarian.html', context)
 
 
+from django.db.models import Count, Min
+
+from .models import OverdueSnapshot
+
+
+@permission_required('catalog.can_mark_returned')
+def overdue_by_employee(request):
+    """View function listing overdue task counts per employee, next to the last daily snapshot."""
+    today = datetime.date.today()
+    # One grouped query over the open-task partial index (task_open_day_employee_idx).
+    rows = list(Task.objects.overdue(today).order_by().values('employee', 'employee__username')
+                .annotate(overdue_tasks=Count('pk'), oldest=Min('scheduled_day'))
+                .order_by('-overdue_tasks', 'employee__username'))
+    latest = OverdueSnapshot.objects.order_by('-day').values_list('day', flat=True).first()
+    snapshot = dict(OverdueSnapshot.objects.filter(day=latest).values_list('employee', 'overdue_tasks'))
+    for row in rows:
+        row['snapshot'] = snapshot.get(row['employee'])
+    context = {
+        'rows': rows,
+        'total': sum(row['overdue_tasks'] for row in rows),
+        'snapshot_day': latest,
+    }
+    return render(request, 'catalog/overdue_by_employee.html', context)
+
+
+from .forms import ThroughputReportForm
+from . import rollups
+
+
+@permission_required('catalog.can_mark_returned')
+def throughput_report(request):
+    """View function listing tickets opened and closed per week, read from the rollups only."""
+    form = ThroughputReportForm(request.GET)
+    rows = []
+    if form.is_valid():
+        rows = rollups.throughput(form.cleaned_data['start'], form.cleaned_data['end'], form.cleaned_data['client'])
+    context = {
+        'form': form,
+        'rows': rows,
+        'opened': sum(row['opened'] for row in rows),
+        'closed': sum(row['closed'] for row in rows),
+    }
+    return render(request, 'catalog/throughput_report.html', context)
+
+
+import json
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+
+from .forms import CalendarRangeForm, TicketTransitionForm
+from .scheduling import MAX_BULK_TASK_CHANGES, apply_task_changes
+from .workflow import MAX_BULK_TRANSITION_TICKETS
+from . import timeline, workflow
+
+
+@require_POST
+@permission_required('catalog.can_mark_returned', raise_exception=True)
+def bulk_update_tasks(request):
+    """Reschedules and/or reassigns many tasks in one request.
+
+    Takes a JSON body ``{"tasks": [{"id": 1, "scheduled_day": "YYYY-MM-DD", "employee": 2}, ...]}``
+    and returns the outcome of every row (see scheduling.apply_task_changes).
+    """
+    try:
+        rows = json.loads(request.body)['tasks']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected a JSON object with a "tasks" list.'}, status=400)
+    if not isinstance(rows, list):
+        return JsonResponse({'error': '"tasks" must be a list.'}, status=400)
+    if len(rows) > MAX_BULK_TASK_CHANGES:
+        return JsonResponse({'error': 'At most {0} tasks per request.'.format(MAX_BULK_TASK_CHANGES)}, status=400)
+    results = apply_task_changes(rows)
+    updated = sum(result['status'] == 'updated' for result in results)
+    return JsonResponse({'updated': updated, 'results': results})
+
+
+@require_POST
+@permission_required('catalog.can_mark_returned', raise_exception=True)
+def bulk_transition_tickets(request):
+    """Moves many tickets to one status, along the workflow (see workflow.transition).
+
+    Takes a JSON body ``{"status": "Resolved", "tickets": ["<uuid>", ...]}`` or
+    ``{"status": "Resolved", "client": "<uuid>"}`` (all of the client's tickets)
+    and returns the number of tickets moved and skipped and of tasks marked done.
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Expected a JSON object.'}, status=400)
+    form = TicketTransitionForm(data if isinstance(data, dict) else {})
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+    ticket_ids = form.cleaned_data['tickets']
+    if ticket_ids is None:
+        tickets = Ticket.objects.filter(client=form.cleaned_data['client'])
+    elif len(ticket_ids) > MAX_BULK_TRANSITION_TICKETS:
+        return JsonResponse(
+            {'error': 'At most {0} tickets per request.'.format(MAX_BULK_TRANSITION_TICKETS)}, status=400)
+    else:
+        tickets = Ticket.objects.filter(pk__in=ticket_ids)
+    return JsonResponse(workflow.transition(tickets, form.cleaned_data['status'], user=request.user))
+
+
+@permission_required('catalog.can_mark_returned', raise_exception=True)
+def task_calendar(request):
+    """Tasks by employee and day for ``?start=YYYY-MM-DD&end=YYYY-MM-DD&employee=1,2`` (see timeline.py)."""
+    form = CalendarRangeForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+    start, end = form.cleaned_data['start'], form.cleaned_data['end']
+    return JsonResponse({
+        'start': start,
+        'end': end,
+        'employees': timeline.calendar(start, end, form.cleaned_data['employee']),
+    })
+
+
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from .models import Client
@@ -148,6 +327,94 @@ class ClientDelete(PermissionRequiredMixin, DeleteView):
     permission_required = 'catalog.can_mark_returned'
 
 
+from django.http import HttpResponseBadRequest, Http404, StreamingHttpResponse
+
+from catalog.forms import ExportFilterForm
+from .exports import TICKET_COLUMNS, TASK_COLUMNS, ticket_rows, task_rows, stream_csv, stream_json
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'json': (stream_json, 'application/json'),
+}
+
+
+def _export(request, fmt, name, columns, rows):
+    """Streams the filtered rows as CSV or JSON without building the result in memory."""
+    if fmt not in EXPORT_FORMATS:
+        raise Http404('Unknown export format.')
+    form = ExportFilterForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_json(), content_type='application/json')
+    stream, content_type = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(stream(columns, rows(form.cleaned_data)), content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="{0}.{1}"'.format(name, fmt)
+    return response
+
+
+@permission_required('catalog.can_mark_returned')
+def export_tickets(request, fmt):
+    """View function streaming tickets filtered by client, status, severity and task scheduled_day."""
+    return _export(request, fmt, 'tickets', TICKET_COLUMNS, ticket_rows)
+
+
+@permission_required('catalog.can_mark_returned')
+def export_tasks(request, fmt):
+    """View function streaming tasks filtered by client, status, severity and scheduled_day."""
+    return _export(request, fmt, 'tasks', TASK_COLUMNS, task_rows)
+
+
+from django.http import HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from catalog.forms import ChangeFeedForm
+from .exports import stream_ndjson
+from . import changelog
+
+
+def change_feed(request):
+    """Streams the change log after ``?since=N`` as NDJSON, at most ``limit`` entries (see changelog.py).
+
+    Open to users who may view change log entries, or to the CATALOG_CHANGES_TOKEN bearer token.
+    """
+    token = settings.CATALOG_CHANGES_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    authorized = request.user.has_perm('catalog.view_changelogentry') or (
+        token and constant_time_compare(authorization, 'Bearer {0}'.format(token)))
+    if not authorized:
+        return HttpResponseForbidden()
+    form = ChangeFeedForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_json(), content_type='application/json')
+    changes = changelog.changes_since(form.cleaned_data['since'] or 0,
+                                      form.cleaned_data['limit'] or settings.CATALOG_CHANGES_MAX_LIMIT)
+    return StreamingHttpResponse(stream_ndjson(changes), content_type='application/x-ndjson')
+
+
+from . import search
+
+SEARCH_PAGE_SIZE = 10
+
+
+def search_view(request):
+    """View function for ranked full-text search over tickets and tasks."""
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        raise Http404('Invalid page.')
+    if not search.available():
+        return render(request, 'catalog/search_results.html', {'query': query, 'unavailable': True})
+    # Fetch one extra hit to know whether there is a next page without counting.
+    hits = search.search(query, limit=SEARCH_PAGE_SIZE + 1, offset=(page - 1) * SEARCH_PAGE_SIZE)
+    context = {
+        'query': query,
+        'hits': hits[:SEARCH_PAGE_SIZE],
+        'page': page,
+        'has_next': len(hits) > SEARCH_PAGE_SIZE,
+    }
+    return render(request, 'catalog/search_results.html', context)
+
+
 # Classes created for the forms challenge
 class TicketCreate(PermissionRequiredMixin, CreateView):
     model = Ticket
@@ -0,0 +1,132 @@
+"""Home page visit counts, batched in memory.
+
+Counting visits in the session made every home page hit write the session.
+Visits are added to in-process totals instead and written to the VisitCount
+table at most once per CATALOG_VISITS_FLUSH_INTERVAL seconds, by whichever
+request finishes first after the interval (once its response has been sent).
+The counts shown are the stored totals plus this process's unsaved visits, so
+visits counted by other workers show up after their next flush; visits not yet
+flushed when a worker stops are lost. Only the totals of the names visited
+since the previous flush are kept in memory, so the process does not hold one
+entry for every user that ever visited.
+
+Anonymous visitors have no user to count under. With a session engine that
+does not write the database (signed cookies, the cache, locallibrary.sessions),
+their own visits are counted in the session instead.
+"""
+
+import collections
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from .dbutils import add_grouped
+from .models import VisitCount
+
+logger = logging.getLogger('catalog.visits')
+
+HOME_PAGE = 'index'
+# Session engines that keep sessions out of the database, so counting visits in them is free.
+NON_DB_SESSION_ENGINES = {
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.signed_cookies',
+    'locallibrary.sessions',
+}
+SESSION_VISITS_KEY = 'num_visits'
+
+
+def user_visits_name(user):
+    return 'index:user:{0}'.format(user.pk)
+
+
+class VisitCounter:
+    """Visit counts of this process, flushed to the database in batches."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stored = {}
+        self._flushing = collections.Counter()
+        self._pending = collections.Counter()
+        self._last_flush = time.monotonic()
+
+    def _count(self, name):
+        return self._stored[name] + self._flushing[name] + self._pending[name]
+
+    def add(self, *names):
+        """Counts one visit to each name and returns their counts before this visit."""
+        stored = {}
+        while True:
+            with self._lock:
+                for name, visits in stored.items():
+                    self._stored.setdefault(name, visits)
+                missing = [name for name in names if name not in self._stored]
+                if not missing:
+                    counts = [self._count(name) for name in names]
+                    self._pending.update(names)
+                    return counts
+            # Read outside the lock; a flush may drop other names meanwhile, hence the loop.
+            stored = dict.fromkeys(missing, 0)
+            stored.update(VisitCount.objects.filter(name__in=missing).values_list('name', 'visits'))
+
+    def flush(self):
+        """Adds the unsaved visits to the VisitCount table."""
+        with self._lock:
+            if self._flushing or not self._pending:
+                return
+            flushing = self._flushing = self._pending
+            self._pending = collections.Counter()
+            self._last_flush = time.monotonic()
+        names = list(flushing)
+        try:
+            with transaction.atomic():
+                VisitCount.objects.bulk_create([VisitCount(name=name) for name in names], ignore_conflicts=True)
+                add_grouped(VisitCount, 'visits', flushing)
+                stored = dict(VisitCount.objects.filter(name__in=names).values_list('name', 'visits'))
+        except DatabaseError:
+            logger.warning('Could not save %d visit counts; retrying at the next flush.', len(names), exc_info=True)
+            with self._lock:
+                self._pending.update(flushing)
+                self._flushing = collections.Counter()
+            return
+        with self._lock:
+            # The stored totals now include these visits (and other workers' flushes). Names not
+            # visited since the previous flush are dropped and read again on their next visit.
+            self._stored = stored
+            self._flushing = collections.Counter()
+
+    def flush_if_due(self, **kwargs):
+        """request_finished receiver flushing once CATALOG_VISITS_FLUSH_INTERVAL has passed."""
+        if self._pending and time.monotonic() - self._last_flush >= settings.CATALOG_VISITS_FLUSH_INTERVAL:
+            self.flush()
+
+    def reset(self):
+        """Forgets everything held in memory (unsaved visits included)."""
+        with self._lock:
+            self._stored.clear()
+            self._flushing.clear()
+            self._pending.clear()
+            self._last_flush = time.monotonic()
+
+
+visit_counter = VisitCounter()
+
+
+def record_home_page_visit(request):
+    """Counts a home page visit; returns the counts before it as ``total_visits`` and ``num_visits``.
+
+    ``num_visits`` is left out for anonymous visitors unless the session engine
+    keeps sessions out of the database (see the module docstring).
+    """
+    user = request.user
+    if user.is_authenticated:
+        total, num_visits = visit_counter.add(HOME_PAGE, user_visits_name(user))
+        return {'total_visits': total, 'num_visits': num_visits}
+    total, = visit_counter.add(HOME_PAGE)
+    if settings.SESSION_ENGINE not in NON_DB_SESSION_ENGINES:
+        return {'total_visits': total}
+    num_visits = request.session.get(SESSION_VISITS_KEY, 0)
+    request.session[SESSION_VISITS_KEY] = num_visits + 1
+    return {'total_visits': total, 'num_visits': num_visits}
@@ -0,0 +1,154 @@
+"""Ticket workflow: the allowed status transitions, applied to many tickets at once.
+
+CATALOG_TICKET_WORKFLOW maps each status name to the names of the statuses a
+ticket may move to from it (the key None stands for tickets without a
+status). transition() moves a set of tickets to one status with a single
+``UPDATE ... WHERE status IN (allowed sources)`` per chunk of
+TRANSITION_CHUNK_SIZE tickets. When the target is one of
+CATALOG_CLOSED_STATUSES it also marks their open tasks done. One
+TicketTransition is recorded per ticket, all in the same transaction.
+
+These updates send no signals, so the change log, counters, rollups and
+cached pages are updated here. Ticket forms and the admin check a single
+ticket's status change against the workflow too (Ticket.clean); a saved
+status change is recorded, and closes the ticket's tasks, the same way
+(ticket_saved).
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import caching, changelog, timeline
+from .caching import previous_state
+from .counters import CounterDeltas
+from .dashboard import invalidate_dashboard_counts
+from .models import ChangeLogEntry, Status, Task, Ticket, TicketTransition
+from .rollups import RollupDeltas, closed_status_ids
+
+# Tickets (or tasks) per UPDATE when applying a transition.
+TRANSITION_CHUNK_SIZE = 1000
+# Largest number of ticket ids accepted by one bulk transition request.
+MAX_BULK_TRANSITION_TICKETS = 5000
+
+
+def _lower(names):
+    return {name.lower() for name in names}
+
+
+def allowed_sources(to_status):
+    """Pks of the statuses (None: no status) a ticket may move to ``to_status`` from."""
+    target = to_status.name.lower()
+    from_names = set()
+    sources = set()
+    for from_name, to_names in settings.CATALOG_TICKET_WORKFLOW.items():
+        if target in _lower(to_names):
+            if from_name is None:
+                sources.add(None)
+            else:
+                from_names.add(from_name.lower())
+    sources.update(status.pk for status in Status.objects.all_cached() if status.name.lower() in from_names)
+    sources.discard(to_status.pk)
+    return sources
+
+
+def target_statuses():
+    """The statuses some transition leads to, by name."""
+    names = set()
+    for to_names in settings.CATALOG_TICKET_WORKFLOW.values():
+        names |= _lower(to_names)
+    return sorted((status for status in Status.objects.all_cached() if status.name.lower() in names),
+                  key=lambda status: status.name)
+
+
+def _status_in(sources):
+    condition = Q(status__in=[pk for pk in sources if pk is not None])
+    if None in sources:
+        condition |= Q(status__isnull=True)
+    return condition
+
+
+def close_tasks(ticket_ids):
+    """Marks the open tasks of these tickets done, with the log, counters and cached pages; returns them.
+
+    The ticket pages are left to the caller, which changed the tickets too.
+    """
+    tasks = []
+    with transaction.atomic():
+        for offset in range(0, len(ticket_ids), TRANSITION_CHUNK_SIZE):
+            tasks.extend(Task.objects.filter(ticket__in=ticket_ids[offset:offset + TRANSITION_CHUNK_SIZE],
+                                             task_checker=False).order_by()
+                         .select_for_update().values_list('pk', 'ticket_id', 'employee_id', 'scheduled_day'))
+        task_ids = [task[0] for task in tasks]
+        for offset in range(0, len(task_ids), TRANSITION_CHUNK_SIZE):
+            Task.objects.filter(pk__in=task_ids[offset:offset + TRANSITION_CHUNK_SIZE]).update(task_checker=True)
+        if not tasks:
+            return tasks
+        # The update sends no signals, so log it and update the counters and cached pages here.
+        changelog.log_changes(Task, ChangeLogEntry.UPDATED, ((pk, {'task_checker': True}) for pk in task_ids))
+        deltas = CounterDeltas()
+        for pk, ticket_id, employee_id, scheduled_day in tasks:
+            # Done tasks are not counted, so only the open state is removed.
+            deltas.add_task({'ticket_id': ticket_id, 'employee_id': employee_id, 'task_checker': False}, -1)
+        deltas.apply()
+        timeline.days_changed({task[3] for task in tasks})
+        invalidate_dashboard_counts()
+    return tasks
+
+
+def transition(tickets, to_status, user=None):
+    """Moves the ``tickets`` (a queryset) that may go to ``to_status`` there.
+
+    Tickets already in ``to_status``, or whose status has no transition to it,
+    are left alone. Returns ``{'moved': n, 'skipped': n, 'tasks_done': n}``.
+    """
+    sources = allowed_sources(to_status)
+    closing = to_status.pk in closed_status_ids()
+    with transaction.atomic():
+        rows = list(tickets.order_by().select_for_update(of=('self',))
+                    .values_list('pk', 'status_id', 'client_id', 'severity'))
+        candidates = [row[0] for row in rows if row[1] in sources]
+        moved = set()
+        for offset in range(0, len(candidates), TRANSITION_CHUNK_SIZE):
+            chunk = candidates[offset:offset + TRANSITION_CHUNK_SIZE]
+            updated = Ticket.objects.filter(_status_in(sources), pk__in=chunk).update(status=to_status)
+            if updated == len(chunk):
+                moved.update(chunk)
+            elif updated:
+                # Some changed status after they were read (where the rows are not
+                # locked): keep only the tickets this update moved.
+                moved.update(Ticket.objects.filter(pk__in=chunk, status=to_status).values_list('pk', flat=True))
+        moving = [row for row in rows if row[0] in moved]
+        ticket_ids = [row[0] for row in moving]
+        tasks = close_tasks(ticket_ids) if closing else []
+
+        TicketTransition.objects.bulk_create(
+            [TicketTransition(ticket_id=pk, from_status_id=status_id, to_status=to_status, user=user)
+             for pk, status_id, client_id, severity in moving], batch_size=TRANSITION_CHUNK_SIZE)
+        # The updates send no signals, so log them and update the rollups and cached pages here.
+        changelog.log_changes(Ticket, ChangeLogEntry.UPDATED, ((pk, {'status_id': to_status.pk}) for pk in ticket_ids))
+        today = timezone.localdate()
+        rollups = RollupDeltas()
+        for pk, status_id, client_id, severity in moving:
+            rollups.add(today, {'client_id': client_id, 'severity': severity, 'status_id': to_status.pk},
+                        created=False, previous_status_id=status_id)
+        rollups.apply()
+        caching.bump_versions(caching.TICKET, ticket_ids)
+        caching.bump_versions(caching.CLIENT, {row[2] for row in moving})
+    return {'moved': len(moving), 'skipped': len(rows) - len(moving), 'tasks_done': len(tasks)}
+
+
+def ticket_saved(sender, instance, created, raw=False, **kwargs):
+    """post_save receiver for Ticket recording a status change made by saving the ticket.
+
+    Moving the ticket into one of CATALOG_CLOSED_STATUSES closes its tasks, as transition() does.
+    """
+    previous = previous_state(instance)
+    if raw or created or previous is None or previous['status_id'] == instance.status_id:
+        return
+    TicketTransition.objects.create(ticket=instance, from_status_id=previous['status_id'],
+                                    to_status_id=instance.status_id)
+    closed_ids = closed_status_ids()
+    if instance.status_id in closed_ids and previous['status_id'] not in closed_ids:
+        close_tasks([instance.pk])
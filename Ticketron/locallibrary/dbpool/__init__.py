@@ -0,0 +1,55 @@
+"""Connection pooling for the project's databases.
+
+Point a database at ``locallibrary.dbpool.postgresql`` or
+``locallibrary.dbpool.sqlite3`` instead of the stock Django backend and add
+a ``POOL`` dict to its settings (size, max_overflow, timeout, recycle). Django
+hands the connection back at the end of every request (CONN_MAX_AGE = 0) and
+the pool keeps it open for the next one. See settings.DB_POOL.
+"""
+
+import threading
+
+from .pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict, error_class):
+    """Returns the process-wide pool for a database alias, creating it on first use."""
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                options = settings_dict.get('POOL', {})
+                pool = ConnectionPool(
+                    size=options.get('SIZE', 5),
+                    max_overflow=options.get('MAX_OVERFLOW', 10),
+                    timeout=options.get('TIMEOUT', 30.0),
+                    recycle=options.get('RECYCLE', 3600.0),
+                    error_class=error_class,
+                )
+                _pools[alias] = pool
+    return pool
+
+
+def pool_stats():
+    """Returns {alias: stats} for every pool created in this process."""
+    return {alias: pool.stats() for alias, pool in list(_pools.items())}
+
+
+class PooledDatabaseWrapperMixin:
+    """DatabaseWrapper mixin taking connections from, and returning them to, a ConnectionPool."""
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict, self.Database.OperationalError)
+
+    def get_new_connection(self, conn_params):
+        return self.pool.checkout(lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
@@ -0,0 +1,146 @@
+"""A thread-safe pool of raw DB-API connections with health checks and metrics."""
+
+import threading
+import time
+
+
+class ConnectionPool:
+    """Keeps up to ``size`` idle connections and lends out up to ``size + max_overflow``.
+
+    Connections idle longer than ``recycle`` seconds are closed instead of
+    reused, and every checkout runs ``health_check_sql`` first so a connection
+    the server dropped is replaced rather than handed to a request. A checkout
+    waits up to ``timeout`` seconds for a free slot before raising
+    ``error_class``.
+    """
+
+    def __init__(self, size=5, max_overflow=10, timeout=30.0, recycle=3600.0,
+                 health_check_sql='SELECT 1', error_class=RuntimeError):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.health_check_sql = health_check_sql
+        self.error_class = error_class
+        self._idle = []  # (connection, returned_at), most recently returned last.
+        self._in_use = 0
+        self._lock = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'timeouts': 0,
+            'connections_opened': 0,
+            'health_check_failures': 0,
+            'recycled': 0,
+            'peak_in_use': 0,
+        }
+
+    @property
+    def capacity(self):
+        return self.size + self.max_overflow
+
+    def checkout(self, connect):
+        """Returns a healthy idle connection, or a new one from ``connect()`` if there is none."""
+        started = time.monotonic()
+        with self._lock:
+            waited = False
+            while not self._idle and self._in_use >= self.capacity:
+                waited = True
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise self.error_class(
+                        'Connection pool exhausted: {0} connections in use for {1:.1f}s.'.format(
+                            self._in_use, self.timeout))
+                self._lock.wait(remaining)
+            candidate = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            self._stats['checkouts'] += 1
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], self._in_use)
+            if waited:
+                wait = time.monotonic() - started
+                self._stats['waits'] += 1
+                self._stats['wait_seconds_total'] += wait
+                self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], wait)
+
+        # Connect and health-check outside the lock.
+        try:
+            if candidate is not None:
+                connection = self._revive(*candidate)
+                if connection is not None:
+                    return connection
+            connection = connect()
+            with self._lock:
+                self._stats['connections_opened'] += 1
+            return connection
+        except Exception:
+            self._free_slot()
+            raise
+
+    def release(self, connection):
+        """Returns a connection to the pool, closing it if the pool is full or it is broken."""
+        try:
+            # Never hand the next request a transaction left open by this one.
+            connection.rollback()
+        except Exception:
+            self._discard(connection)
+            self._free_slot()
+            return
+        with self._lock:
+            self._in_use -= 1
+            if len(self._idle) < self.size:
+                self._idle.append((connection, time.monotonic()))
+                connection = None
+            self._lock.notify()
+        if connection is not None:
+            self._discard(connection)
+
+    def close_all(self):
+        """Closes every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, returned_at in idle:
+            self._discard(connection)
+
+    def stats(self):
+        """Returns a snapshot of the pool's counters and gauges."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(size=self.size, max_overflow=self.max_overflow, idle=len(self._idle),
+                         in_use=self._in_use, saturation=self._in_use / self.capacity if self.capacity else 1.0)
+        return stats
+
+    def _revive(self, connection, returned_at):
+        """Returns the idle connection if it is fresh and healthy, else closes it and returns None."""
+        if self.recycle is not None and time.monotonic() - returned_at > self.recycle:
+            with self._lock:
+                self._stats['recycled'] += 1
+            self._discard(connection)
+            return None
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(self.health_check_sql)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception:
+            with self._lock:
+                self._stats['health_check_failures'] += 1
+            self._discard(connection)
+            return None
+        return connection
+
+    def _free_slot(self):
+        with self._lock:
+            self._in_use -= 1
+            self._lock.notify()
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
@@ -0,0 +1,7 @@
+from django.db.backends.sqlite3 import base
+
+from locallibrary.dbpool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """SQLite backend drawing its connections from a pool (a stand-in for local testing)."""
@@ -0,0 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from . import pool_stats
+
+
+@staff_member_required
+def pool_stats_view(request):
+    """Connection pool counters for this worker process, as JSON."""
+    return JsonResponse(pool_stats())
@@ -0,0 +1,62 @@
+"""A session engine keeping sessions out of the database.
+
+Set ``SESSION_ENGINE = 'locallibrary.sessions'``. Sessions whose signed,
+compressed data fits in SESSION_HYBRID_COOKIE_LIMIT bytes live entirely in the
+cookie, like ``django.contrib.sessions.backends.signed_cookies``; larger ones
+are kept in the cache under a random key, like the ``cache`` engine, and the
+cookie holds only that key. Neither reads nor writes the database.
+
+Cookie sessions are signed, not encrypted (keep secrets out of the session),
+and cannot be revoked on the server before they expire. With several worker
+processes, point SESSION_CACHE_ALIAS at a shared cache (Redis, memcached).
+"""
+
+from django.conf import settings
+from django.contrib.sessions.backends.cache import SessionStore as CacheSessionStore
+from django.core import signing
+
+SALT = 'locallibrary.sessions'
+
+
+def _in_cookie(session_key):
+    # signing.dumps() output contains ':' separators; cache keys are [a-z0-9] only.
+    return bool(session_key) and ':' in session_key
+
+
+class SessionStore(CacheSessionStore):
+    cache_key_prefix = 'locallibrary.sessions'
+
+    def load(self):
+        if not _in_cookie(self.session_key):
+            return super().load()
+        try:
+            return signing.loads(self.session_key, salt=SALT, serializer=self.serializer,
+                                 max_age=self.get_session_cookie_age())
+        except Exception:
+            # A bad signature, expired or unreadable data: start a new session.
+            self._session_key = None
+            return {}
+
+    def save(self, must_create=False):
+        data = signing.dumps(self._get_session(no_load=must_create), salt=SALT, compress=True,
+                             serializer=self.serializer)
+        if len(data) <= settings.SESSION_HYBRID_COOKIE_LIMIT:
+            if self.session_key and not _in_cookie(self.session_key):
+                # Shrunk below the limit: move it back into the cookie.
+                self._cache.delete(self.cache_key)
+            self._session_key = data
+            self.modified = True
+            return
+        if self.session_key is None or _in_cookie(self.session_key):
+            # Grown over the limit: give it a cache key (create() calls save() again).
+            return self.create()
+        return super().save(must_create)
+
+    def exists(self, session_key):
+        return not _in_cookie(session_key) and super().exists(session_key)
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        if not _in_cookie(session_key):
+            super().delete(session_key)
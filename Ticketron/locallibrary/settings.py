@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'catalog.instrumentation.RequestMetricsMiddleware',
+    'catalog.replicas.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -59,7 +61,8 @@ ROOT_URLCONF = 'locallibrary.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing each render for the request metrics (catalog/instrumentation.py).
+        'BACKEND': 'catalog.instrumentation.TimedDjangoTemplates',
         'DIRS': ['./templates',],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -86,6 +89,8 @@ DATABASES = {
     }
 }
 
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -127,6 +132,79 @@ LOGIN_REDIRECT_URL = '/'
 # Add to test email:
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Sessions are stored in the database by default. SESSION_ENGINE=locallibrary.sessions keeps
+# sessions of up to SESSION_HYBRID_COOKIE_LIMIT bytes in a signed cookie and larger ones in the
+# cache, so no request touches the session table (use a shared cache with several workers).
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+SESSION_HYBRID_COOKIE_LIMIT = 2048
+
+# Background jobs (manage.py run_jobs): retries back off from CATALOG_JOBS_BACKOFF_SECONDS,
+# doubling up to CATALOG_JOBS_BACKOFF_MAX; jobs held longer than CATALOG_JOBS_LOCK_TIMEOUT
+# by a worker are assumed lost and requeued.
+CATALOG_JOBS_CONCURRENCY = int(os.environ.get('CATALOG_JOBS_CONCURRENCY', 4))
+CATALOG_JOBS_MAX_ATTEMPTS = int(os.environ.get('CATALOG_JOBS_MAX_ATTEMPTS', 5))
+CATALOG_JOBS_BACKOFF_SECONDS = 30
+CATALOG_JOBS_BACKOFF_MAX = 3600
+CATALOG_JOBS_LOCK_TIMEOUT = 600
+# Done jobs are deleted after this many days (checked by run_jobs at most once per interval).
+CATALOG_JOBS_KEEP_DONE_DAYS = int(os.environ.get('CATALOG_JOBS_KEEP_DONE_DAYS', 7))
+CATALOG_JOBS_PRUNE_INTERVAL = 3600
+
+# Automatic scheduling (manage.py auto_schedule): days ahead to fill, and tasks per employee per day.
+CATALOG_SCHEDULE_HORIZON_DAYS = int(os.environ.get('CATALOG_SCHEDULE_HORIZON_DAYS', 28))
+CATALOG_SCHEDULE_DAILY_CAPACITY = int(os.environ.get('CATALOG_SCHEDULE_DAILY_CAPACITY', 8))
+
+# Task calendar (/catalog/calendar/): longest range served, and weeks kept in memory per worker.
+CATALOG_CALENDAR_MAX_DAYS = 62
+CATALOG_CALENDAR_CACHE_WEEKS = int(os.environ.get('CATALOG_CALENDAR_CACHE_WEEKS', 26))
+
+# Change log (/catalog/changes/, manage.py changes_since): at most CATALOG_CHANGES_MAX_LIMIT
+# entries per request. On databases other than PostgreSQL and SQLite, entries are served once
+# they are CATALOG_CHANGES_SETTLE_SECONDS old, which must exceed the longest write transaction.
+# The bearer token lets consumers read without a login.
+CATALOG_CHANGES_SETTLE_SECONDS = int(os.environ.get('CATALOG_CHANGES_SETTLE_SECONDS', 60))
+CATALOG_CHANGES_MAX_LIMIT = 10000
+CATALOG_CHANGES_TOKEN = os.environ.get('CATALOG_CHANGES_TOKEN', '')
+
+# Throughput report (/catalog/reports/throughput/): statuses counted as closing a ticket, and the
+# longest range served. manage.py rebuild_rollups recomputes the rollups from the change log.
+CATALOG_CLOSED_STATUSES = ['Resolved', 'Closed']
+CATALOG_REPORT_MAX_WEEKS = 53
+
+# Ticket workflow (catalog/workflow.py): the statuses a ticket may move to from each status, by
+# name (None: tickets without a status). Bulk transitions into a CATALOG_CLOSED_STATUSES status
+# also mark the tickets' tasks done.
+CATALOG_TICKET_WORKFLOW = {
+    None: ['New', 'In Progress', 'Resolved', 'Closed'],
+    'New': ['In Progress', 'Resolved', 'Closed'],
+    'In Progress': ['New', 'Resolved', 'Closed'],
+    'Resolved': ['In Progress', 'Closed'],
+    'Closed': ['In Progress'],
+}
+
+# Task assignment and overdue emails, queued as jobs and sent this many per SMTP batch.
+CATALOG_NOTIFICATIONS = os.environ.get('CATALOG_NOTIFICATIONS', 'True') == 'True'
+CATALOG_EMAIL_BATCH_SIZE = 100
+
+
+# Home page dashboard: seconds to cache the record counters (they lag writes by up to
+# this long), and whether to count visits.
+# Visits are counted in memory and saved at most every CATALOG_VISITS_FLUSH_INTERVAL seconds
+# (catalog/visits.py), so the home page itself never writes.
+CATALOG_DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('CATALOG_DASHBOARD_CACHE_TIMEOUT', 60))
+CATALOG_DASHBOARD_TRACK_VISITS = os.environ.get('CATALOG_DASHBOARD_TRACK_VISITS', 'True') == 'True'
+CATALOG_VISITS_FLUSH_INTERVAL = int(os.environ.get('CATALOG_VISITS_FLUSH_INTERVAL', 60))
+
+# Seconds to cache rendered ticket/client detail pages and their fragments.
+# Entries are keyed on a version stamp bumped on every change, so this only bounds memory use.
+CATALOG_DETAIL_CACHE_TIMEOUT = int(os.environ.get('CATALOG_DETAIL_CACHE_TIMEOUT', 300))
+
+# Requests over either budget are logged to 'catalog.performance' with their SQL.
+CATALOG_SLOW_REQUEST_QUERIES = int(os.environ.get('CATALOG_SLOW_REQUEST_QUERIES', 50))
+CATALOG_SLOW_REQUEST_SECONDS = float(os.environ.get('CATALOG_SLOW_REQUEST_SECONDS', 0.5))
+# Bearer token for scraping /internal/metrics/ (staff users can always read it).
+CATALOG_METRICS_TOKEN = os.environ.get('CATALOG_METRICS_TOKEN', '')
+
 
 
 # Heroku: Update database configuration from $DATABASE_URL.
@@ -134,6 +212,44 @@ import dj_database_url
 db_from_env = dj_database_url.config(conn_max_age=500)
 DATABASES['default'].update(db_from_env)
 
+# Connection pooling for the default database (see locallibrary/dbpool).
+# Django returns the connection at the end of every request and the pool keeps
+# it open; idle connections are health-checked on checkout and recycled after
+# DB_POOL_RECYCLE seconds. Pool metrics are served at /internal/dbpool/.
+DB_POOL = os.environ.get('DB_POOL', 'False') == 'True'
+POOLED_ENGINES = {
+    'django.db.backends.postgresql': 'locallibrary.dbpool.postgresql',
+    'django.db.backends.postgresql_psycopg2': 'locallibrary.dbpool.postgresql',
+    'django.db.backends.sqlite3': 'locallibrary.dbpool.sqlite3',
+}
+if DB_POOL and DATABASES['default']['ENGINE'] in POOLED_ENGINES:
+    DATABASES['default']['ENGINE'] = POOLED_ENGINES[DATABASES['default']['ENGINE']]
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['POOL'] = {
+        'SIZE': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'MAX_OVERFLOW': int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10)),
+        'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'RECYCLE': float(os.environ.get('DB_POOL_RECYCLE', 3600)),
+    }
+
+# Read replicas (see catalog/replicas.py): DATABASE_REPLICA_URLS is a comma-separated list of
+# database URLs, added as replica1, replica2, ... Only the views in CATALOG_REPLICA_VIEWS read
+# from them; users who just wrote stay on the primary for DATABASE_REPLICA_PIN_SECONDS, and
+# replicas over DATABASE_REPLICA_MAX_LAG seconds behind are skipped. The cached detail pages
+# (ticket-detail, client-detail) stay on the primary: a page rendered from a lagging replica would be
+# cached and served under the new version stamp until the next change.
+DATABASE_REPLICAS = []
+for number, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    alias = 'replica{0}'.format(number)
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=500)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['catalog.replicas.ReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DATABASE_REPLICA_PIN_SECONDS', 15))
+DATABASE_REPLICA_MAX_LAG = float(os.environ.get('DATABASE_REPLICA_MAX_LAG', 5))
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = 5
+CATALOG_REPLICA_VIEWS = ['tickets', 'authors', 'all-borrowed', 'export-tickets', 'export-tasks']
+
 
 
 # Static files (CSS, JavaScript, Images)
@@ -58,3 +58,12 @@ urlpatterns += [
 urlpatterns += [
     path('accounts/', include('django.contrib.auth.urls')),
 ]
+
+
+#Connection pool and per-view request metrics (per worker process)
+from locallibrary.dbpool.views import pool_stats_view
+from catalog.instrumentation import metrics_view
+urlpatterns += [
+    path('internal/dbpool/', pool_stats_view, name='dbpool-stats'),
+    path('internal/metrics/', metrics_view, name='metrics'),
+]